@@ -1,131 +1,153 @@
-from datetime import datetime, timedelta
 from typing import Optional, Dict
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import Depends, Header, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-import os
+from sqlalchemy import select, update
 import logging
 
-from database import get_db
-from models import User, Session as DBSession
+from database import get_async_db
+from models import Parent
+from services.password_hasher import password_hasher
+from services.principal_cache import principal_cache
+from services.token_service import token_service
 
 logger = logging.getLogger(__name__)
 
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-REFRESH_TOKEN_EXPIRE_DAYS = 7
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-security = HTTPBearer()
 
 class AuthService:
-    """Authentication service for user management"""
-    
+    """
+    Password checks for user management. Tokens are issued and verified
+    only by services.token_service, with settings.secret_key.
+    """
+
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
+    async def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
-    
+        return await password_hasher.verify(plain_password, hashed_password)
+
     @staticmethod
-    def get_password_hash(password: str) -> str:
+    async def get_password_hash(password: str) -> str:
         """Hash a password"""
-        return pwd_context.hash(password)
-    
-    @staticmethod
-    def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-        """Create JWT access token"""
-        to_encode = data.copy()
-        
-        if expires_delta:
-            expire = datetime.utcnow() + expires_delta
-        else:
-            expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-        return encoded_jwt
-    
-    @staticmethod
-    def decode_token(token: str) -> Dict:
-        """Decode JWT token"""
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            return payload
-        except JWTError as e:
-            logger.error(f"Token decode error: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-    
+        return await password_hasher.hash(password)
+
     @staticmethod
-    async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
-        """Authenticate user with email and password"""
-        result = await db.execute(select(User).where(User.email == email))
+    async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[Parent]:
+        """Authenticate user with email and password, upgrading an outdated hash"""
+        result = await db.execute(select(Parent).where(Parent.email == email))
         user = result.scalar_one_or_none()
-        
+
         if not user:
             return None
-        
-        if not AuthService.verify_password(password, user.password_hash):
+
+        valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+        if not valid:
             return None
-        
+
+        if new_hash:
+            user.hashed_password = new_hash
+            await db.commit()
+
         return user
 
+def _principal(parent) -> Dict:
+    """The fields of a parent that authorization needs"""
+    return {
+        "id": parent.id,
+        "email": parent.email,
+        "is_active": parent.is_active,
+        "role": "parent",
+    }
+
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    """Get current authenticated user from token"""
-    
-    token = credentials.credentials
-    
-    try:
-        payload = AuthService.decode_token(token)
-        email: str = payload.get("sub")
-        
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-            )
-    except JWTError:
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+) -> Dict:
+    """
+    The principal of the request's bearer access token.
+
+    Resolved principals are cached briefly per parent and token version, so
+    most requests skip the parents lookup; a token minted before the
+    parent's token_version was bumped is refused.
+    """
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    claims = token_service.decode_access_token(authorization.replace("Bearer ", ""))
+    if claims is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    parent_id, token_version = claims
+
+    principal = principal_cache.get(parent_id, token_version)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(
+        select(Parent.id, Parent.email, Parent.is_active, Parent.token_version).where(Parent.id == parent_id)
+    )
+    parent = result.one_or_none()
+
+    if parent is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
+            detail="User not found",
         )
-    
-    result = await db.execute(select(User).where(User.email == email))
-    user = result.scalar_one_or_none()
-    
-    if user is None:
+
+    # Token issued before a deactivation or credential change
+    if parent.token_version != token_version:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
+            detail="Token has been revoked",
         )
-    
-    return user
+
+    principal = _principal(parent)
+    principal_cache.put(parent_id, token_version, principal)
+    return principal
 
 async def get_current_active_parent(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Dict = Depends(get_current_user)
+) -> Dict:
     """Get current active parent user"""
-    if not current_user.is_active:
+    if not current_user["is_active"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Inactive user"
         )
     return current_user
 
-def hash_pin(pin: str) -> str:
+async def get_current_parent_id(current_user: Dict = Depends(get_current_active_parent)) -> int:
+    """The id of the request's authenticated, active parent"""
+    return current_user["id"]
+
+async def revoke_parent_tokens(db: AsyncSession, parent_id: int, **changes) -> int:
+    """
+    Apply changes to a parent and bump their token_version, so tokens issued
+    earlier stop resolving, then drop the cached principal and revoke every
+    refresh token so no new access tokens can be minted. Returns the new
+    token version.
+    """
+    result = await db.execute(
+        update(Parent)
+        .where(Parent.id == parent_id)
+        .values(token_version=Parent.token_version + 1, **changes)
+        .returning(Parent.token_version)
+    )
+    token_version = result.scalar_one()
+    await db.commit()
+    principal_cache.invalidate(parent_id)
+    await token_service.revoke_all(db, parent_id)
+    return token_version
+
+async def change_password(db: AsyncSession, parent_id: int, new_password: str) -> int:
+    """Set a new password and revoke the parent's existing tokens; returns the new token version"""
+    hashed = await password_hasher.hash(new_password)
+    return await revoke_parent_tokens(db, parent_id, hashed_password=hashed)
+
+async def set_parent_active(db: AsyncSession, parent_id: int, is_active: bool) -> int:
+    """Activate or deactivate a parent account"""
+    return await revoke_parent_tokens(db, parent_id, is_active=is_active)
+
+async def hash_pin(pin: str) -> str:
     """Hash a PIN for child authentication"""
-    return pwd_context.hash(pin)
+    return await password_hasher.hash(pin)
 
-def verify_pin(plain_pin: str, hashed_pin: str) -> bool:
+async def verify_pin(plain_pin: str, hashed_pin: str) -> bool:
     """Verify a PIN against its hash"""
-    return pwd_context.verify(plain_pin, hashed_pin)
+    return await password_hasher.verify(plain_pin, hashed_pin)
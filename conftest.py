@@ -0,0 +1,28 @@
+"""
+Pytest setup: without DATABASE_URL, tests run on a throwaway SQLite file
+(never the development nia_dev.db), and `async def` tests run to completion
+on a fresh event loop (the repo has no async test plugin)
+"""
+import asyncio
+import atexit
+import inspect
+import os
+import shutil
+import tempfile
+
+import pytest
+
+os.environ.setdefault("ENVIRONMENT", "test")
+if not os.getenv("DATABASE_URL"):
+    _database_dir = tempfile.mkdtemp(prefix="nia-test-")
+    atexit.register(shutil.rmtree, _database_dir, ignore_errors=True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{_database_dir}/nia_test.db"
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.run(pyfuncitem.obj(**arguments))
+    return True
@@ -1,33 +1,275 @@
 """Database configuration and session management"""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc, make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, StaticPool
+from fastapi import Request
+from typing import Dict
+import hashlib
+import logging
 import os
+import time
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Used when DATABASE_URL is unset and ENVIRONMENT is explicitly one of these
+DEFAULT_SQLITE_URL = "sqlite:///./nia_dev.db"
+SQLITE_FALLBACK_ENVIRONMENTS = ("development", "test")
 
 # Get database URL from environment
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is not set")
+    # Not settings.environment: it defaults to development, and a deployment
+    # that forgot both variables must fail rather than write to a local file
+    if os.getenv("ENVIRONMENT") not in SQLITE_FALLBACK_ENVIRONMENTS:
+        raise ValueError(
+            "DATABASE_URL environment variable is not set "
+            f"(set ENVIRONMENT to one of {', '.join(SQLITE_FALLBACK_ENVIRONMENTS)} to use local SQLite)"
+        )
+    logger.warning(f"DATABASE_URL is not set; using SQLite at {DEFAULT_SQLITE_URL}")
+    DATABASE_URL = DEFAULT_SQLITE_URL
+
+
+def normalize_url(url: str) -> str:
+    """Convert postgres:// to postgresql:// and drop async drivers, giving a sync URL"""
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1).replace("sqlite+aiosqlite://", "sqlite://", 1)
+
+
+def to_async_url(url: str) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1).replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+
+def is_sqlite_url(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+DATABASE_URL = normalize_url(DATABASE_URL)
+
+# SQLite mode: schema comes from models.Base and Postgres-only features fall back
+IS_SQLITE = is_sqlite_url(DATABASE_URL)
+
+
+class PoolStats:
+    """Checkout wait times and timeouts of one engine's pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record(self, wait_ms: float):
+        self.checkouts += 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+
+def _timed_pool_class(base, stats: PoolStats):
+    """
+    A subclass of `base` that times every checkout.
+
+    The stats live on the class, so they survive the pool being recreated
+    (e.g. after engine.dispose()).
+    """
+    class TimedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                stats.timeouts += 1
+                raise
+            stats.record((time.perf_counter() - start) * 1000)
+            return connection
+
+    TimedPool.stats = stats
+    return TimedPool
+
+
+def _sqlite_pragmas(read_only: bool):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Needed for the ON DELETE CASCADE foreign keys
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        if not read_only:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+    return set_pragmas
+
+
+def build_sqlite_engine(url: str, is_async: bool = False):
+    """
+    SQLite engine. An in-memory database lives on a single shared
+    connection (StaticPool); a file database uses the timed pool.
+    """
+    parsed = make_url(url)
+    in_memory = parsed.database in (None, "", ":memory:")
+    read_only = parsed.query.get("mode") == "ro"
+    options = {"connect_args": {"check_same_thread": False}}
+    if in_memory:
+        options["poolclass"] = StaticPool
+    else:
+        base = AsyncAdaptedQueuePool if is_async else QueuePool
+        options["poolclass"] = _timed_pool_class(base, PoolStats())
+
+    engine = create_async_engine(url, **options) if is_async else create_engine(url, **options)
+    event.listen(engine.sync_engine if is_async else engine, "connect", _sqlite_pragmas(read_only))
+    return engine
+
+
+def build_engine(url: str, is_async: bool = False):
+    """Create an engine with the pool settings from config and checkout timing"""
+    if is_sqlite_url(url):
+        return build_sqlite_engine(url, is_async)
+
+    stats = PoolStats()
+    options = dict(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    if is_async:
+        return create_async_engine(
+            url, echo=False, poolclass=_timed_pool_class(AsyncAdaptedQueuePool, stats), **options
+        )
+    return create_engine(url, poolclass=_timed_pool_class(QueuePool, stats), **options)
+
+
+def pool_metrics(engine) -> Dict:
+    """In-use/idle gauges and checkout wait figures for an engine's pool"""
+    pool = engine.pool
+    stats = getattr(type(pool), "stats", None)
+    if stats is None:
+        return {'pool': type(pool).__name__}
+    return {
+        'size': pool.size(),
+        'in_use': pool.checkedout(),
+        'idle': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': pool._max_overflow,
+        'checkouts': stats.checkouts,
+        'timeouts': stats.timeouts,
+        'avg_wait_ms': round(stats.total_wait_ms / stats.checkouts, 3) if stats.checkouts else 0.0,
+        'max_wait_ms': round(stats.max_wait_ms, 3),
+    }
 
-# Convert postgres:// to postgresql:// for SQLAlchemy
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 # Create sync engine for migrations and table creation
-sync_engine = create_engine(DATABASE_URL)
+sync_engine = build_engine(DATABASE_URL)
 
 # Create async engine for FastAPI operations
-async_database_url = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
-async_engine = create_async_engine(async_database_url, echo=False)
+async_database_url = to_async_url(DATABASE_URL)
+async_engine = build_engine(async_database_url, is_async=True)
+
+# Optional read replica for read-only endpoints
+replica_engine = (
+    build_engine(to_async_url(normalize_url(settings.database_replica_url)), is_async=True)
+    if settings.database_replica_url else None
+)
 
 # Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
 AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+ReplicaSessionLocal = (
+    async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+    if replica_engine else AsyncSessionLocal
+)
 
 # For backwards compatibility
 engine = sync_engine
 
+
+class ReadRouter:
+    """
+    Chooses primary or replica for read-only request sessions.
+
+    Commits made through a request session mark its client (bearer token, or
+    address when anonymous) as having written; that client's reads then go
+    to the primary for the sticky window so it sees its own writes despite
+    replica lag. The marks are per worker process. Writes committed outside
+    a request session (the write-behind message writer) are marked by the
+    endpoint that submits them.
+    """
+
+    def __init__(self, sticky_seconds: float = 5, has_replica: bool = False):
+        self.sticky_seconds = sticky_seconds
+        self.has_replica = has_replica
+        self.sticky_until: Dict[str, float] = {}
+        self.stats = {'replica_reads': 0, 'primary_reads': 0, 'sticky_reads': 0}
+
+    @staticmethod
+    def client_key(request: Request) -> str:
+        identity = request.headers.get("authorization") or (request.client.host if request.client else "")
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def mark_write(self, client_key: str):
+        now = time.monotonic()
+        self.sticky_until[client_key] = now + self.sticky_seconds
+        if len(self.sticky_until) > 10000:
+            self.sticky_until = {k: t for k, t in self.sticky_until.items() if t > now}
+
+    def use_replica(self, client_key: str) -> bool:
+        if not self.has_replica:
+            self.stats['primary_reads'] += 1
+            return False
+        until = self.sticky_until.get(client_key)
+        if until is not None and until > time.monotonic():
+            self.stats['sticky_reads'] += 1
+            return False
+        self.stats['replica_reads'] += 1
+        return True
+
+    def get_stats(self) -> Dict:
+        return {'replica_configured': self.has_replica, **self.stats}
+
+
+read_router = ReadRouter(sticky_seconds=settings.replica_sticky_seconds, has_replica=replica_engine is not None)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_client_write(session):
+    client_key = session.info.get("client_key")
+    if client_key:
+        read_router.mark_write(client_key)
+
+
+def get_pool_metrics() -> Dict:
+    metrics = {
+        'async': pool_metrics(async_engine.sync_engine),
+        'sync': pool_metrics(sync_engine),
+    }
+    if replica_engine is not None:
+        metrics['replica'] = pool_metrics(replica_engine.sync_engine)
+    metrics['read_routing'] = read_router.get_stats()
+    return metrics
+
+async def create_schema(engine=None):
+    """Create all tables from models.Base (SQLite mode and throwaway databases)"""
+    from models import Base
+
+    async with (engine or async_engine).begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def create_sqlite_database(path: str = ":memory:"):
+    """
+    A fresh, isolated SQLite database with the full schema, returning
+    (engine, session factory). In-memory databases are cheap enough to
+    create one per test or benchmark run.
+    """
+    engine = build_sqlite_engine(f"sqlite+aiosqlite:///{path}", is_async=True)
+    await create_schema(engine)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
 def get_db():
     """Dependency for getting sync database session"""
     db = SessionLocal()
@@ -36,7 +278,14 @@ def get_db():
     finally:
         db.close()
 
-async def get_async_db():
+async def get_async_db(request: Request):
     """Dependency for getting async database session"""
     async with AsyncSessionLocal() as session:
+        session.info["client_key"] = ReadRouter.client_key(request)
+        yield session
+
+async def get_read_db(request: Request):
+    """Dependency for read-only endpoints: the replica unless the client just wrote"""
+    factory = ReplicaSessionLocal if read_router.use_replica(ReadRouter.client_key(request)) else AsyncSessionLocal
+    async with factory() as session:
         yield session
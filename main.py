@@ -1,28 +1,24 @@
-from fastapi import FastAPI, Depends, HTTPException, Header
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from passlib.context import CryptContext
-from jose import jwt
+from sqlalchemy import select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-import os
 
-# Database
-DATABASE_URL = os.getenv("DATABASE_URL")
-if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from auth import get_current_parent_id, change_password
+from config import settings
+from database import get_async_db, get_read_db, get_pool_metrics, create_schema, IS_SQLITE
+from models import Parent, Child
+from routers import content, conversation
+from services.message_writer import message_writer
+from services.history_cache import history_cache
+from services.password_hasher import password_hasher
+from services.principal_cache import principal_cache
+from services.token_service import token_service
+from services.content_watcher import content_watcher
+from services.rag_service import rag_service
+from services.export_service import export_service, MEDIA_TYPES, NDJSON, CSV
 
 # App
 app = FastAPI()
@@ -35,9 +31,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
-ALGORITHM = "HS256"
+app.include_router(conversation.router, prefix="/api/v1/conversation", tags=["conversation"])
+app.include_router(content.router, prefix="/api/v1/content", tags=["content"])
+
+@app.on_event("startup")
+async def startup_event():
+    if IS_SQLITE:
+        # No migrations in SQLite mode; the schema comes straight from the models
+        await create_schema()
+    password_hasher.start()
+    if settings.message_write_behind:
+        message_writer.start()
+    if settings.content_watcher_enabled:
+        content_watcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await content_watcher.stop()
+    await message_writer.stop()
+    password_hasher.stop()
 
 # Schemas
 class ParentCreate(BaseModel):
@@ -49,6 +61,13 @@ class ParentLogin(BaseModel):
     email: EmailStr
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
 class ChildCreate(BaseModel):
     first_name: str
     nickname: Optional[str] = None
@@ -57,100 +76,143 @@ class ChildCreate(BaseModel):
     pin: str
     preferred_language: Optional[str] = "en"
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password[:72])
-
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain[:72], hashed)
-
-def create_token(parent_id: int) -> str:
-    return jwt.encode({"sub": str(parent_id)}, SECRET_KEY, algorithm=ALGORITHM)
-
-def get_current_parent_id(authorization: Optional[str] = Header(None)) -> int:
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401)
-    token = authorization.replace("Bearer ", "")
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return int(payload.get("sub"))
-    except:
-        raise HTTPException(status_code=401)
-
 # Routes
 @app.get("/")
 def root():
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "message_writer": message_writer.get_metrics(),
+        "history_cache": history_cache.get_stats(),
+        "password_hasher": password_hasher.get_metrics(),
+        "principal_cache": principal_cache.get_stats(),
+        "db_pools": get_pool_metrics(),
+        "content_watcher": content_watcher.get_metrics(),
+        "model_router": rag_service.router.get_stats(),
+    }
+
+# Columns returned for a child by the children endpoints
+CHILD_COLUMNS = (Child.id, Child.parent_id, Child.first_name, Child.nickname, Child.grade_level, Child.created_at)
+
 @app.post("/api/v1/auth/parent/register")
-def register(parent: ParentCreate, db: Session = Depends(get_db)):
-    existing = db.execute(f"SELECT id FROM parents WHERE email='{parent.email}'").fetchone()
+async def register(parent: ParentCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = (await db.execute(select(Parent.id).where(Parent.email == parent.email))).first()
     if existing:
         raise HTTPException(status_code=400, detail="Email exists")
 
-    hashed = get_password_hash(parent.password)
-    result = db.execute(
-        f"INSERT INTO parents (email, full_name, hashed_password) VALUES ('{parent.email}', '{parent.full_name}', '{hashed}') RETURNING id"
+    hashed = await password_hasher.hash(parent.password)
+    result = await db.execute(
+        insert(Parent)
+        .values(email=parent.email, full_name=parent.full_name, hashed_password=hashed)
+        .returning(Parent.id, Parent.token_version)
     )
-    db.commit()
-    parent_id = result.fetchone()[0]
+    parent_id, token_version = result.one()
+    tokens = await token_service.issue_tokens(db, parent_id, token_version)
 
     return {
-        "access_token": create_token(parent_id),
-        "token_type": "bearer",
+        **tokens,
         "parent_id": parent_id,
         "email": parent.email,
         "full_name": parent.full_name
     }
 
 @app.post("/api/v1/auth/parent/login")
-def login(creds: ParentLogin, db: Session = Depends(get_db)):
-    result = db.execute(f"SELECT id, hashed_password, full_name FROM parents WHERE email='{creds.email}'").fetchone()
-    if not result or not verify_password(creds.password, result[1]):
+async def login(creds: ParentLogin, db: AsyncSession = Depends(get_async_db)):
+    result = (await db.execute(
+        select(
+            Parent.id, Parent.hashed_password, Parent.full_name, Parent.is_active, Parent.token_version
+        ).where(Parent.email == creds.email)
+    )).first()
+    if not result or not result.is_active:
         raise HTTPException(status_code=401)
 
+    valid, new_hash = await password_hasher.verify_and_update(creds.password, result.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401)
+    if new_hash:
+        await db.execute(update(Parent).where(Parent.id == result.id).values(hashed_password=new_hash))
+    tokens = await token_service.issue_tokens(db, result.id, result.token_version)
+
     return {
-        "access_token": create_token(result[0]),
-        "token_type": "bearer",
-        "parent_id": result[0],
+        **tokens,
+        "parent_id": result.id,
         "email": creds.email,
-        "full_name": result[2]
+        "full_name": result.full_name
     }
 
+@app.post("/api/v1/auth/refresh")
+async def refresh(body: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    rotated = await token_service.rotate(db, body.refresh_token)
+    if rotated is None:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    parent_id, tokens = rotated
+    return {**tokens, "parent_id": parent_id}
+
+@app.post("/api/v1/auth/logout")
+async def logout(body: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    await token_service.revoke(db, body.refresh_token)
+    return {"status": "ok"}
+
+@app.post("/api/v1/auth/change-password")
+async def change_parent_password(
+    body: PasswordChange,
+    db: AsyncSession = Depends(get_async_db),
+    parent_id: int = Depends(get_current_parent_id)
+):
+    hashed_password = (await db.execute(select(Parent.hashed_password).where(Parent.id == parent_id))).scalar_one()
+    if not await password_hasher.verify(body.current_password, hashed_password):
+        raise HTTPException(status_code=401)
+
+    # Every other session is logged out; this one gets a fresh pair
+    token_version = await change_password(db, parent_id, body.new_password)
+    tokens = await token_service.issue_tokens(db, parent_id, token_version)
+    return {**tokens, "parent_id": parent_id}
+
 @app.post("/api/v1/children/")
-def create_child(
+async def create_child(
     child: ChildCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     parent_id: int = Depends(get_current_parent_id)
 ):
-    hashed_pin = get_password_hash(child.pin)
-    result = db.execute(f"""
-        INSERT INTO children (parent_id, first_name, nickname, date_of_birth, grade_level, hashed_pin, preferred_language)
-        VALUES ({parent_id}, '{child.first_name}', '{child.nickname}', '{child.date_of_birth}', '{child.grade_level}', '{hashed_pin}', '{child.preferred_language}')
-        RETURNING id, parent_id, first_name, nickname, grade_level, created_at
-    """)
-    db.commit()
-    row = result.fetchone()
+    hashed_pin = await password_hasher.hash(child.pin)
+    result = await db.execute(
+        insert(Child)
+        .values(
+            parent_id=parent_id,
+            first_name=child.first_name,
+            nickname=child.nickname,
+            date_of_birth=child.date_of_birth,
+            grade_level=child.grade_level,
+            hashed_pin=hashed_pin,
+            preferred_language=child.preferred_language
+        )
+        .returning(*CHILD_COLUMNS)
+    )
+    row = result.mappings().one()
+    await db.commit()
 
-    return {
-        "id": row[0],
-        "parent_id": row[1],
-        "first_name": row[2],
-        "nickname": row[3],
-        "grade_level": row[4],
-        "created_at": row[5]
-    }
+    return dict(row)
 
 @app.get("/api/v1/children/")
-def get_children(db: Session = Depends(get_db), parent_id: int = Depends(get_current_parent_id)):
-    result = db.execute(f"SELECT id, parent_id, first_name, nickname, grade_level, created_at FROM children WHERE parent_id={parent_id}")
-    children = []
-    for row in result:
-        children.append({
-            "id": row[0],
-            "parent_id": row[1],
-            "first_name": row[2],
-            "nickname": row[3],
-            "grade_level": row[4],
-            "created_at": row[5]
-        })
-    return children
+async def get_children(db: AsyncSession = Depends(get_read_db), parent_id: int = Depends(get_current_parent_id)):
+    result = await db.execute(select(*CHILD_COLUMNS).where(Child.parent_id == parent_id))
+    return [dict(row) for row in result.mappings()]
+
+@app.get("/api/v1/children/{child_id}/export")
+async def export_child_history(
+    child_id: int,
+    format: str = Query(NDJSON, pattern=f"^({NDJSON}|{CSV})$"),
+    gzip: bool = True,
+    parent_id: int = Depends(get_current_parent_id)
+):
+    if not await export_service.child_belongs_to_parent(child_id, parent_id):
+        raise HTTPException(status_code=404, detail="Child not found")
+
+    filename = export_service.filename(child_id, format, gzip)
+    return StreamingResponse(
+        export_service.stream_history(child_id, fmt=format, gzip=gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
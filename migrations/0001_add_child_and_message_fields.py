@@ -0,0 +1,19 @@
+"""Add language/learning fields to children and metadata columns to conversations/messages"""
+from sqlalchemy import text
+
+transactional = True
+
+STATEMENTS = [
+    "ALTER TABLE children ADD COLUMN IF NOT EXISTS preferred_language VARCHAR DEFAULT 'en' NOT NULL",
+    "ALTER TABLE children ADD COLUMN IF NOT EXISTS reading_level VARCHAR DEFAULT 'at grade level'",
+    "ALTER TABLE children ADD COLUMN IF NOT EXISTS learning_accommodations TEXT DEFAULT '[]'",
+    "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS total_depth_reached INTEGER DEFAULT 1",
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS source_type VARCHAR",
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS depth_level INTEGER DEFAULT 1",
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS model_used VARCHAR",
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
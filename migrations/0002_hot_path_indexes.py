@@ -0,0 +1,38 @@
+"""Composite indexes for chat and dashboard queries, built without blocking writes"""
+from migrations import create_index_concurrently
+
+transactional = False
+
+# Names match the Index definitions in models.py
+INDEXES = [
+    (
+        "ix_messages_conversation_created",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_conversation_created "
+        "ON messages (conversation_id, created_at, id)",
+    ),
+    (
+        "ix_conversations_child_folder_updated",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversations_child_folder_updated "
+        "ON conversations (child_id, folder, updated_at DESC, id DESC)",
+    ),
+    (
+        "ix_conversations_child_updated",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversations_child_updated "
+        "ON conversations (child_id, updated_at DESC, id DESC)",
+    ),
+    (
+        "ix_children_parent_id",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_children_parent_id ON children (parent_id)",
+    ),
+    (
+        # Fails if duplicate file_path rows exist; remove them and re-run
+        "ix_educational_content_file_path",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_educational_content_file_path "
+        "ON educational_content (file_path)",
+    ),
+]
+
+
+async def upgrade(conn):
+    for name, ddl in INDEXES:
+        await create_index_concurrently(conn, name, ddl)
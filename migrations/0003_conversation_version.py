@@ -0,0 +1,10 @@
+"""Add a version counter to conversations for history cache coherence"""
+from sqlalchemy import text
+
+transactional = True
+
+
+async def upgrade(conn):
+    await conn.execute(text(
+        "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0"
+    ))
@@ -0,0 +1,174 @@
+"""Convert messages into a table range-partitioned by month on created_at"""
+from datetime import datetime
+from sqlalchemy import text
+from services.message_archive import add_months, create_month_partition, month_start
+
+transactional = False
+
+COPY_BATCH_SIZE = 50000
+
+# Ids below the backfill's high-water mark re-checked under the swap lock.
+# A writer can take an id from the sequence before a batch is copied and
+# commit after it, leaving a gap that max(id) alone never revisits
+RECOPY_WINDOW = 100000
+
+# Postgres truncates identifiers longer than this
+MAX_IDENTIFIER_LENGTH = 63
+
+
+def copy_ranges(copied: int, target: int, batch_size: int = COPY_BATCH_SIZE):
+    """
+    (after_id, up_to_id] id ranges covering (copied, target] in batches.
+    The last range stops at target, so the catch-up resumes exactly there.
+    """
+    while copied < target:
+        up_to = min(copied + batch_size, target)
+        yield copied, up_to
+        copied = up_to
+
+
+def legacy_name(name: str) -> str:
+    """The name an index or constraint of messages takes once it is messages_legacy's"""
+    if "messages" in name:
+        renamed = name.replace("messages", "messages_legacy", 1)
+    else:
+        renamed = f"{name}_legacy"
+    return renamed[:MAX_IDENTIFIER_LENGTH]
+
+
+async def _copy_rows(conn, columns, after_id: int, up_to_id: int):
+    """Copy the messages in (after_id, up_to_id] not copied yet; safe to repeat"""
+    select_list = ", ".join(
+        "COALESCE(m.created_at, :now)" if column == "created_at" else f"m.{column}"
+        for column in columns
+    )
+    await conn.execute(text(
+        f"INSERT INTO messages_partitioned ({', '.join(columns)}) "
+        f"SELECT {select_list} FROM messages m WHERE m.id > :after_id AND m.id <= :up_to_id "
+        "AND NOT EXISTS (SELECT 1 FROM messages_partitioned p WHERE p.id = m.id)"
+    ), {"after_id": after_id, "up_to_id": up_to_id, "now": datetime.utcnow()})
+
+
+async def backfill(conn, columns, batch_size: int = COPY_BATCH_SIZE) -> int:
+    """
+    Copy messages in id batches while writes continue, resuming after a
+    restart. Returns the high-water mark reached.
+    """
+    result = await conn.execute(text("SELECT coalesce(max(id), 0) FROM messages_partitioned"))
+    copied = result.scalar_one()
+    # A restart resumes below the mark too, for the same out-of-order commits
+    # the catch-up re-checks
+    start = max(copied - RECOPY_WINDOW, 0)
+    result = await conn.execute(text("SELECT coalesce(max(id), 0) FROM messages"))
+    target = result.scalar_one()
+    for after_id, up_to_id in copy_ranges(start, target, batch_size):
+        await _copy_rows(conn, columns, after_id, up_to_id)
+    return max(copied, target)
+
+
+async def catch_up(conn, columns, copied: int, window: int = RECOPY_WINDOW):
+    """
+    Copy rows written since the backfill, plus any committed late inside
+    the window below it. Run with writes to messages locked out.
+    """
+    result = await conn.execute(text("SELECT coalesce(max(id), 0) FROM messages"))
+    await _copy_rows(conn, columns, max(copied - window, 0), result.scalar_one())
+
+
+async def _rename_legacy_objects(conn):
+    """
+    Move every index and constraint name off messages_legacy, so the new
+    messages table (and later migrations) can use them. Renaming an index
+    also renames the primary key or unique constraint it backs.
+    """
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = 'messages_legacy'::regclass"
+    ))
+    for (name,) in result.all():
+        await conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{legacy_name(name)}"'))
+
+    result = await conn.execute(text(
+        "SELECT conname FROM pg_constraint "
+        "WHERE conrelid = 'messages_legacy'::regclass AND conindid = 0"
+    ))
+    for (name,) in result.all():
+        await conn.execute(text(
+            f'ALTER TABLE messages_legacy RENAME CONSTRAINT "{name}" TO "{legacy_name(name)}"'
+        ))
+
+
+async def upgrade(conn):
+    result = await conn.execute(text(
+        "SELECT relkind FROM pg_class WHERE relname = 'messages' "
+        "AND relnamespace = 'public'::regnamespace"
+    ))
+    if result.scalar_one() == "p":
+        return
+
+    # New table shares the id sequence; created_at becomes part of the key
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS messages_partitioned (LIKE messages INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    ))
+    await conn.execute(text("ALTER TABLE messages_partitioned ALTER COLUMN created_at SET NOT NULL"))
+    await conn.execute(text(
+        "ALTER TABLE messages_partitioned ALTER COLUMN created_at SET DEFAULT (now() AT TIME ZONE 'utc')"
+    ))
+    await conn.execute(text(
+        "DO $$ BEGIN "
+        "ALTER TABLE messages_partitioned ADD CONSTRAINT messages_partitioned_pkey PRIMARY KEY (id, created_at); "
+        "EXCEPTION WHEN invalid_table_definition OR duplicate_table OR duplicate_object THEN NULL; END $$"
+    ))
+    # Cascading, so conversations deleted during the backfill take their
+    # already-copied rows with them
+    await conn.execute(text(
+        "DO $$ BEGIN "
+        "ALTER TABLE messages_partitioned ADD CONSTRAINT messages_partitioned_conversation_id_fkey "
+        "FOREIGN KEY (conversation_id) REFERENCES conversations (id) ON DELETE CASCADE; "
+        "EXCEPTION WHEN duplicate_object THEN NULL; END $$"
+    ))
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_messages_part_conversation_created "
+        "ON messages_partitioned (conversation_id, created_at, id)"
+    ))
+
+    result = await conn.execute(text("SELECT min(created_at) FROM messages"))
+    first = month_start(result.scalar_one() or datetime.utcnow())
+    last = add_months(month_start(datetime.utcnow()), 2)
+    current = first
+    while current <= last:
+        await create_month_partition(conn, current, parent="messages_partitioned")
+        current = add_months(current, 1)
+    await conn.execute(text("CREATE TABLE IF NOT EXISTS messages_default PARTITION OF messages_partitioned DEFAULT"))
+
+    result = await conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = 'messages' AND table_schema = 'public' ORDER BY ordinal_position"
+    ))
+    columns = [row[0] for row in result]
+
+    copied = await backfill(conn, columns)
+
+    # Catch up on rows written during the backfill and swap, blocking writes briefly
+    async with conn.engine.begin() as swap:
+        await swap.execute(text("LOCK TABLE messages IN EXCLUSIVE MODE"))
+        await catch_up(swap, columns, copied)
+
+        await swap.execute(text("ALTER TABLE messages RENAME TO messages_legacy"))
+        await swap.execute(text(
+            "ALTER TABLE messages_legacy DROP CONSTRAINT IF EXISTS messages_conversation_id_fkey"
+        ))
+        await _rename_legacy_objects(swap)
+        await swap.execute(text("ALTER TABLE messages_partitioned RENAME TO messages"))
+        await swap.execute(text("ALTER INDEX messages_partitioned_pkey RENAME TO messages_pkey"))
+        await swap.execute(text(
+            "ALTER INDEX ix_messages_part_conversation_created RENAME TO ix_messages_conversation_created"
+        ))
+        await swap.execute(text(
+            "ALTER TABLE messages RENAME CONSTRAINT messages_partitioned_conversation_id_fkey "
+            "TO messages_conversation_id_fkey"
+        ))
+        await swap.execute(text("ALTER SEQUENCE messages_id_seq OWNED BY messages.id"))
+
+    # messages_legacy is kept for verification; drop it by hand afterwards
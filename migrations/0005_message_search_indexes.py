@@ -0,0 +1,21 @@
+"""Full-text GIN indexes over message content, English and Spanish"""
+from migrations import create_partitioned_index_concurrently
+
+transactional = False
+
+# Names and expressions match the Index definitions in models.py
+INDEXES = [
+    ("ix_messages_content_fts_en", "content_fts_en", "english"),
+    ("ix_messages_content_fts_es", "content_fts_es", "spanish"),
+]
+
+
+async def upgrade(conn):
+    for name, suffix, config in INDEXES:
+        await create_partitioned_index_concurrently(
+            conn,
+            "messages",
+            name,
+            suffix,
+            f"USING gin (to_tsvector('{config}'::regconfig, content))"
+        )
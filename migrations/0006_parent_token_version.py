@@ -0,0 +1,13 @@
+"""Add is_active and token_version to parents for principal cache invalidation"""
+from sqlalchemy import text
+
+transactional = True
+
+
+async def upgrade(conn):
+    await conn.execute(text(
+        "ALTER TABLE parents ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE"
+    ))
+    await conn.execute(text(
+        "ALTER TABLE parents ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0"
+    ))
@@ -0,0 +1,10 @@
+"""Add deleted_at to educational_content to tombstone removed source files"""
+from sqlalchemy import text
+
+transactional = True
+
+
+async def upgrade(conn):
+    await conn.execute(text(
+        "ALTER TABLE educational_content ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP"
+    ))
@@ -0,0 +1,20 @@
+"""Add frontmatter and readability columns to educational_content"""
+from sqlalchemy import text
+
+transactional = True
+
+COLUMNS = [
+    "grade_min INTEGER",
+    "grade_max INTEGER",
+    "language VARCHAR NOT NULL DEFAULT 'en'",
+    "standards JSON",
+    "keywords JSON",
+    "reading_grade DOUBLE PRECISION",
+    "avg_sentence_length DOUBLE PRECISION",
+    "rare_word_ratio DOUBLE PRECISION",
+]
+
+
+async def upgrade(conn):
+    for column in COLUMNS:
+        await conn.execute(text(f"ALTER TABLE educational_content ADD COLUMN IF NOT EXISTS {column}"))
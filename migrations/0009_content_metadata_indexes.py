@@ -0,0 +1,32 @@
+"""
+Indexes for filtering and ranking content by grade range, language and
+readability. Existing rows get the new columns filled on the next
+`scripts/ingest_content.py --force` run.
+"""
+from migrations import create_index_concurrently
+
+transactional = False
+
+# Names match the Index definitions in models.py
+INDEXES = [
+    (
+        "ix_educational_content_grade_range",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_educational_content_grade_range "
+        "ON educational_content (grade_min, grade_max)",
+    ),
+    (
+        "ix_educational_content_language",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_educational_content_language "
+        "ON educational_content (language)",
+    ),
+    (
+        "ix_educational_content_reading_grade",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_educational_content_reading_grade "
+        "ON educational_content (reading_grade)",
+    ),
+]
+
+
+async def upgrade(conn):
+    for name, ddl in INDEXES:
+        await create_index_concurrently(conn, name, ddl)
@@ -0,0 +1,12 @@
+"""
+Content bodies move to the compressed educational_content_bodies table
+(created from models by scripts/migrate.py). The legacy column becomes
+nullable; scripts/compress_content.py moves existing bodies over.
+"""
+from sqlalchemy import text
+
+transactional = True
+
+
+async def upgrade(conn):
+    await conn.execute(text("ALTER TABLE educational_content ALTER COLUMN content DROP NOT NULL"))
@@ -0,0 +1,13 @@
+"""
+Add educational_content.search_text, the body's distinct words, so content
+search matches lesson text while bodies stay compressed. Existing rows are
+filled by the next `scripts/compress_content.py` run (or
+`scripts/ingest_content.py --force`).
+"""
+from sqlalchemy import text
+
+transactional = True
+
+
+async def upgrade(conn):
+    await conn.execute(text("ALTER TABLE educational_content ADD COLUMN IF NOT EXISTS search_text TEXT"))
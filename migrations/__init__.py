@@ -0,0 +1,100 @@
+"""
+Schema migrations
+Each module named NNNN_description.py defines an async upgrade(conn) and a
+`transactional` flag. Non-transactional migrations run on an AUTOCOMMIT
+connection so they can use CREATE INDEX CONCURRENTLY. Applied versions are
+recorded in schema_migrations by scripts/migrate.py.
+"""
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+
+async def create_index_concurrently(conn: AsyncConnection, name: str, ddl: str):
+    """
+    Build an index without blocking writes.
+
+    A CONCURRENTLY build that fails (or is interrupted) leaves an INVALID
+    index behind that IF NOT EXISTS would happily skip, so drop it first.
+    """
+    result = await conn.execute(
+        text(
+            "SELECT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+        ),
+        {"name": name}
+    )
+    valid = result.scalar_one_or_none()
+
+    if valid is False:
+        logger.warning(f"Dropping invalid index {name} left by an earlier build")
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    elif valid:
+        logger.info(f"Index {name} already exists")
+        return
+
+    await conn.execute(text(ddl))
+    logger.info(f"✅ Created index {name}")
+
+
+async def create_partitioned_index_concurrently(
+    conn: AsyncConnection,
+    table: str,
+    name: str,
+    partition_suffix: str,
+    definition: str
+):
+    """
+    Build an index on a partitioned table without blocking writes.
+
+    Postgres cannot build a partitioned index CONCURRENTLY, so the parent
+    index is created ON ONLY the parent (instant, initially invalid), each
+    partition's index is built concurrently and attached, and the parent
+    becomes valid once every partition is attached. Partitions created
+    later get the index automatically. `definition` is the part after
+    ON <table>, e.g. "USING gin (to_tsvector('english'::regconfig, content))".
+    """
+    result = await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :table"),
+        {"table": table}
+    )
+    if result.scalar_one() != "p":
+        await create_index_concurrently(
+            conn, name, f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}"
+        )
+        return
+
+    await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {definition}"))
+
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table"
+        ),
+        {"table": table}
+    )
+    partitions = sorted(row[0] for row in result)
+
+    for partition in partitions:
+        partition_index = f"{partition}_{partition_suffix}"
+        await create_index_concurrently(
+            conn,
+            partition_index,
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} {definition}"
+        )
+        attached = await conn.execute(
+            text(
+                "SELECT 1 FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE c.relname = :index AND p.relname = :parent"
+            ),
+            {"index": partition_index, "parent": name}
+        )
+        if attached.scalar_one_or_none() is None:
+            await conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}"))
+
+    logger.info(f"✅ Index {name} built on {len(partitions)} partition(s)")
@@ -0,0 +1,122 @@
+"""
+Document metadata for educational content
+Optional YAML frontmatter (grade range, standards codes, language, keywords)
+plus readability scores, shared by markdown ingestion and corpus imports
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+import yaml
+from model.readability import COMMON_WORDS, readability
+
+_FRONTMATTER = re.compile(r"\A---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|\Z)", re.S)
+_GRADE_RANGE = re.compile(r"\b(K|\d{1,2})(?:\s*(?:-|–|to)\s*(K|\d{1,2}))?\b", re.I)
+_HEADING_GRADES = re.compile(r"\(\s*grades?\s+([^)]*)\)", re.I)
+_TERM = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+# Grade span of each content directory level, kindergarten as 0
+GRADE_BANDS = {
+    'elementary': (0, 5),
+    'middle': (6, 8),
+    'high': (9, 12),
+}
+
+DEFAULT_LANGUAGE = "en"
+
+# Shorter words are left out of the search terms
+MIN_TERM_LENGTH = 3
+
+
+def split_frontmatter(text: str) -> Tuple[Dict, str]:
+    """
+    The YAML frontmatter mapping and the body after it. Text without
+    frontmatter, or with frontmatter that is not a YAML mapping, comes back
+    whole with an empty mapping.
+    """
+    match = _FRONTMATTER.match(text)
+    if not match:
+        return {}, text
+    try:
+        meta = yaml.safe_load(match.group(1))
+    except yaml.YAMLError:
+        return {}, text
+    if not isinstance(meta, dict):
+        return {}, text
+    return meta, text[match.end():].lstrip("\n")
+
+
+def _grade(value: str) -> int:
+    return 0 if value.upper() == "K" else int(value)
+
+
+def parse_grade_range(value) -> Optional[Tuple[int, int]]:
+    """(min, max) from "3-5", "K-2", "K to 2", 4, [3, 5], or None"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value, value
+    if isinstance(value, (list, tuple)):
+        grades = [parse_grade_range(item) for item in value]
+        grades = [grade for grade in grades if grade]
+        if not grades:
+            return None
+        return min(low for low, _ in grades), max(high for _, high in grades)
+    match = _GRADE_RANGE.search(str(value))
+    if not match:
+        return None
+    low = _grade(match.group(1))
+    high = _grade(match.group(2)) if match.group(2) else low
+    return min(low, high), max(low, high)
+
+
+def _string_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def search_terms(text: str) -> str:
+    """
+    The distinct words of a text, lowercased, sorted and space-delimited
+    with a space at each end, without common or very short words. Stored
+    per document so search can match lesson text without decompressing it;
+    queries go through the same function.
+    """
+    words = {word.lower() for word in _TERM.findall(text)}
+    kept = sorted(word for word in words if len(word) >= MIN_TERM_LENGTH and word not in COMMON_WORDS)
+    return f" {' '.join(kept)} " if kept else ""
+
+
+def document_metadata(meta: Dict, body: str, grade_level: str, title: str = "") -> Dict:
+    """
+    Indexed metadata columns for one document.
+
+    The grade range comes from frontmatter (`grades`, `grade_range` or
+    `grade`), else a "(Grades 3-5)" heading, else the band of the grade
+    level directory.
+    """
+    grades = None
+    for key in ('grades', 'grade_range', 'grade'):
+        grades = parse_grade_range(meta.get(key))
+        if grades:
+            break
+    if not grades:
+        heading = _HEADING_GRADES.search(title)
+        grades = parse_grade_range(heading.group(1)) if heading else None
+    if not grades:
+        grades = GRADE_BANDS.get(grade_level.lower(), (None, None))
+
+    language = str(meta.get('language') or meta.get('lang') or DEFAULT_LANGUAGE).strip().lower()
+
+    return {
+        'grade_min': grades[0],
+        'grade_max': grades[1],
+        'language': language or DEFAULT_LANGUAGE,
+        'standards': _string_list(meta.get('standards')),
+        'keywords': [keyword.lower() for keyword in _string_list(meta.get('keywords'))],
+        'search_text': search_terms(body),
+        **readability(body),
+    }
@@ -0,0 +1,249 @@
+"""
+Corpus Reader
+Incremental reader for external document collections: JSONL (one document
+per line) or the {"documents": [...]} shape of data_sources/sample_corpus.json,
+optionally gzipped. Shared by the LSI retriever and the database importer
+"""
+import gzip
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from model.content_metadata import document_metadata
+
+logger = logging.getLogger(__name__)
+
+# Characters read from disk per refill of the JSON buffer
+READ_CHUNK_SIZE = 1 << 20
+
+# Largest single JSON value (one document, in practice) the reader buffers
+MAX_VALUE_SIZE = 64 << 20
+
+# A decode error this close to the end of the buffer may be a literal or
+# number cut short by the chunk boundary rather than bad JSON
+TRUNCATION_MARGIN = 16
+
+# Imported rows are keyed corpus/<source>/<document id> in file_path, so
+# they never collide with files under educational_content/
+CORPUS_PATH_PREFIX = "corpus"
+
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+class CorpusFormatError(ValueError):
+    """The file is not JSONL or a {"documents": [...]} object"""
+
+
+def _open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def _is_jsonl(path: Path) -> bool:
+    suffixes = path.suffixes[-2:] if path.suffix == ".gz" else path.suffixes[-1:]
+    return bool(suffixes) and suffixes[0] in JSONL_SUFFIXES
+
+
+class _JSONStream:
+    """
+    Pull parser over a text file: decodes one JSON value at a time from a
+    buffer that is refilled in READ_CHUNK_SIZE pieces and trimmed as values
+    are consumed, so memory follows the largest single value rather than
+    the file size.
+
+    A value running past the buffer is re-read with the buffer doubled each
+    time, so re-parsing it stays linear, and is capped at max_value_size. A
+    syntax error inside the buffered text is raised at once, not mistaken
+    for a value that continues.
+    """
+
+    def __init__(self, f, chunk_size: int = READ_CHUNK_SIZE, max_value_size: int = MAX_VALUE_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.max_value_size = max_value_size
+        self.buffer = ""
+        self.pos = 0
+        # Characters trimmed off the front of the buffer so far
+        self.offset = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: Optional[int] = None) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _grow(self) -> bool:
+        """Read more of a value that runs past the end of the buffer"""
+        pending = len(self.buffer) - self.pos
+        if pending > self.max_value_size:
+            raise CorpusFormatError(
+                f"Value at character {self.offset + self.pos} is larger than {self.max_value_size} characters"
+            )
+        return self._fill(max(self.chunk_size, pending))
+
+    def _truncated(self, error: json.JSONDecodeError) -> bool:
+        """Whether a decode error may only mean the value continues past the buffer"""
+        return error.msg.startswith("Unterminated string") or error.pos >= len(self.buffer) - TRUNCATION_MARGIN
+
+    def peek(self) -> str:
+        """The next non-whitespace character, or '' at end of input"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise CorpusFormatError(
+                f"Expected {char!r} at character {self.offset + self.pos}, found {found or 'end of file'!r}"
+            )
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self._truncated(e) and self._grow():
+                    continue
+                raise CorpusFormatError(f"Invalid JSON at character {self.offset + e.pos}: {e.msg}") from e
+            # A number ending exactly at the buffer edge may be cut short
+            if end == len(self.buffer) and self._grow():
+                continue
+            self.pos = end
+            return value
+
+
+class CorpusReader:
+    """
+    Re-iterable stream of raw documents from a corpus file.
+
+    Malformed JSONL lines are logged and counted in `malformed` rather than
+    aborting a multi-GB import; a malformed JSON document ends the stream,
+    since there is no reliable place to resume.
+    """
+
+    def __init__(self, path, chunk_size: int = READ_CHUNK_SIZE):
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.malformed = 0
+
+    def __iter__(self) -> Iterator:
+        self.malformed = 0
+        with _open_text(self.path) as f:
+            if _is_jsonl(self.path):
+                yield from self._iter_jsonl(f)
+            else:
+                yield from self._iter_documents_object(f)
+
+    def _iter_jsonl(self, f) -> Iterator:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                self.malformed += 1
+                logger.warning(f"{self.path}:{line_number}: skipping malformed line: {e}")
+
+    def _iter_documents_object(self, f) -> Iterator:
+        stream = _JSONStream(f, self.chunk_size)
+        if stream.peek() == "[":
+            # A bare array of documents
+            yield from self._iter_array(stream)
+            return
+
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key == "documents":
+                yield from self._iter_array(stream)
+            else:
+                stream.value()
+            if stream.peek() == ",":
+                stream.pos += 1
+                continue
+            stream.expect("}")
+            return
+
+    def _iter_array(self, stream: _JSONStream) -> Iterator:
+        stream.expect("[")
+        if stream.peek() == "]":
+            stream.pos += 1
+            return
+        while True:
+            yield stream.value()
+            if stream.peek() == ",":
+                stream.pos += 1
+                continue
+            stream.expect("]")
+            return
+
+
+def _clean(value, default: Optional[str] = None) -> Optional[str]:
+    if value is None:
+        return default
+    text = " ".join(unicodedata.normalize("NFC", str(value)).split())
+    return text or default
+
+
+def normalize_document(raw, source: str) -> Optional[Dict]:
+    """
+    Validate one raw corpus document and map it to an educational_content
+    row, or None when it has no usable content.
+
+    Subject and grade level are lower-cased to match the directory names of
+    curated content, which is what retrieval filters on. Grade range,
+    standards, language and keywords are read from the same keys as
+    markdown frontmatter. Documents without
+    an id are keyed by their content hash, so re-importing the same dump
+    updates rather than duplicates them.
+    """
+    if not isinstance(raw, dict):
+        return None
+    content = raw.get('content')
+    if not isinstance(content, str):
+        return None
+    content = unicodedata.normalize("NFC", content).strip()
+    if not content:
+        return None
+
+    content_hash = hashlib.md5(content.encode()).hexdigest()
+    document_id = _clean(raw.get('id'), content_hash).replace("/", "_")
+    topic = _clean(raw.get('topic'))
+    title = _clean(raw.get('title')) or topic or document_id
+    grade_level = _clean(raw.get('grade_level'), "general").lower()
+
+    return {
+        'title': title,
+        'subject': _clean(raw.get('subject'), "general").lower(),
+        'grade_level': grade_level,
+        'topic': topic,
+        'content': content,
+        'content_hash': content_hash,
+        'file_path': f"{CORPUS_PATH_PREFIX}/{source}/{document_id}",
+        'word_count': len(content.split()),
+        **document_metadata(raw, content, grade_level, title),
+    }
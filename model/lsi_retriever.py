@@ -3,7 +3,6 @@ LSI-based semantic retrieval for educational content
 Uses Gensim for Latent Semantic Indexing
 """
 import os
-import json
 import logging
 from pathlib import Path
 from typing import List, Dict, Tuple
@@ -11,6 +10,8 @@ from gensim import corpora, models, similarities
 import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
+import zstandard
+from model.corpus_reader import CorpusReader
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +21,28 @@ except LookupError:
     nltk.download('punkt', quiet=True)
     nltk.download('stopwords', quiet=True)
 
+# Documents folded into the LSI model per update
+INDEX_BATCH_SIZE = 2000
+
+# Documents buffered uncompressed to train the body dictionary
+DICTIONARY_TRAINING_DOCS = 1000
+DICTIONARY_SIZE = 32 * 1024
+
+
+class _BowCorpus:
+    """Re-iterable bag-of-words view over a retriever's documents"""
+
+    def __init__(self, retriever):
+        self.retriever = retriever
+
+    def __len__(self):
+        return len(self.retriever.documents)
+
+    def __iter__(self):
+        for idx in range(len(self.retriever.documents)):
+            yield self.retriever.dictionary.doc2bow(self.retriever._preprocess(self.retriever._body(idx)))
+
+
 class LSIRetriever:
     """LSI-based document retriever for educational content"""
 
@@ -29,6 +52,9 @@ class LSIRetriever:
         self.dictionary = None
         self.lsi_model = None
         self.index = None
+        self._bodies: List[bytes] = []
+        self._compressor = None
+        self._decompressor = None
         self.stop_words = set(stopwords.words('english'))
 
         self._load_corpus()
@@ -40,18 +66,65 @@ class LSIRetriever:
         return [t for t in tokens if t.isalnum() and t not in self.stop_words]
 
     def _load_corpus(self):
-        """Load educational corpus"""
+        """
+        Load educational corpus, one streamed document at a time.
+
+        Only metadata stays in `documents`; each body is kept zstd-compressed
+        in `_bodies` with a dictionary trained on the first documents read,
+        and decompressed when indexed or returned.
+        """
+        self.documents = []
+        self._bodies = []
+        if not os.path.exists(self.corpus_path):
+            logger.warning(f"Corpus not found: {self.corpus_path}, using empty corpus")
+            return
         try:
-            if os.path.exists(self.corpus_path):
-                with open(self.corpus_path, 'r') as f:
-                    data = json.load(f)
-                    self.documents = data.get('documents', [])
-            else:
-                logger.warning(f"Corpus not found: {self.corpus_path}, using empty corpus")
-                self.documents = []
+            pending = []
+            for doc in CorpusReader(self.corpus_path):
+                if not isinstance(doc, dict) or not isinstance(doc.get('content'), str) or not doc['content'].strip():
+                    continue
+                if self._compressor is None:
+                    pending.append(doc)
+                    if len(pending) >= DICTIONARY_TRAINING_DOCS:
+                        self._start_compression(pending)
+                        pending = []
+                else:
+                    self._add_document(doc)
+            if pending:
+                self._start_compression(pending)
         except Exception as e:
             logger.error(f"Error loading corpus: {e}")
             self.documents = []
+            self._bodies = []
+
+    def _start_compression(self, docs: List[Dict]):
+        """Train the body dictionary on the buffered documents, then store them"""
+        samples = [doc['content'].encode('utf-8') for doc in docs]
+        compression_dict = None
+        if len(samples) >= 10:
+            try:
+                compression_dict = zstandard.train_dictionary(DICTIONARY_SIZE, samples)
+            except zstandard.ZstdError as e:
+                logger.warning(f"Compressing LSI corpus without a dictionary: {e}")
+        if compression_dict is None:
+            self._compressor = zstandard.ZstdCompressor()
+            self._decompressor = zstandard.ZstdDecompressor()
+        else:
+            self._compressor = zstandard.ZstdCompressor(dict_data=compression_dict)
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=compression_dict)
+        for doc in docs:
+            self._add_document(doc)
+
+    def _add_document(self, doc: Dict):
+        doc = dict(doc)
+        compressed = self._compressor.compress(doc.pop('content').encode('utf-8'))
+        # compress() returns bytes allocated for the worst-case size; a copy
+        # keeps only the compressed length alive
+        self._bodies.append(bytes(memoryview(compressed)))
+        self.documents.append(doc)
+
+    def _body(self, idx: int) -> str:
+        return self._decompressor.decompress(self._bodies[idx]).decode('utf-8')
 
     def _build_index(self):
         """Build LSI index from corpus"""
@@ -59,18 +132,18 @@ class LSIRetriever:
             logger.warning("No documents to index")
             return
 
-        # Preprocess documents
-        texts = [self._preprocess(doc['content']) for doc in self.documents]
-
-        # Create dictionary and corpus
-        self.dictionary = corpora.Dictionary(texts)
-        corpus = [self.dictionary.doc2bow(text) for text in texts]
+        # Create dictionary and a streamed corpus; token lists are produced
+        # per document and never held for the whole collection
+        self.dictionary = corpora.Dictionary(self._preprocess(self._body(i)) for i in range(len(self.documents)))
+        corpus = _BowCorpus(self)
 
-        # Build LSI model
-        self.lsi_model = models.LsiModel(corpus, id2word=self.dictionary, num_topics=100)
+        # Build LSI model, INDEX_BATCH_SIZE documents at a time
+        self.lsi_model = models.LsiModel(
+            corpus, id2word=self.dictionary, num_topics=100, chunksize=INDEX_BATCH_SIZE
+        )
 
         # Build similarity index
-        self.index = similarities.MatrixSimilarity(self.lsi_model[corpus])
+        self.index = similarities.MatrixSimilarity(self.lsi_model[corpus], num_features=self.lsi_model.num_topics)
 
         logger.info(f"LSI index built with {len(self.documents)} documents")
 
@@ -103,6 +176,8 @@ class LSIRetriever:
                     if not self._grade_matches(grade_level, doc_grade):
                         continue
 
+                # Only returned documents are decompressed
+                doc['content'] = self._body(idx)
                 results.append(doc)
 
                 if len(results) >= top_k:
@@ -0,0 +1,83 @@
+"""
+Readability metrics for educational content
+Flesch-Kincaid grade, average sentence length and rare-word ratio, computed
+once at ingestion so retrieval can filter and rank without scoring text
+"""
+import re
+from typing import Dict
+
+_SENTENCE_END = re.compile(r"[.!?]+(?:\s|$)|\n\s*\n")
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+
+# Headings and list items end a sentence even without punctuation
+_BLOCK_LINE = re.compile(r"^[ \t]*(?:#+|[-*+]|\d+\.)[ \t]+(.*?)[.!?:]?[ \t]*$", re.M)
+
+# Markdown syntax that would otherwise count as words or sentence breaks
+_MARKDOWN = re.compile(r"```.*?```|`[^`]*`|!\[[^\]]*\]\([^)]*\)|\[([^\]]*)\]\([^)]*\)|[#>*_|~-]+", re.S)
+
+# Dolch sight words plus the most frequent words of Fry's first hundred;
+# anything outside this list (after stripping simple inflections) is "rare"
+COMMON_WORDS = frozenset("""
+a about after again all always am an and any are around as ask at ate away be because been before best
+better big black blue both bring brown but buy by call came can carry clean cold come could cut day did
+do does done don't down draw drink each eat eight every fall far fast find first five fly for found four
+from full funny gave get give go goes going good got green grow had has have he help her here him his
+hold hot how hurt i if in into is it its jump just keep kind know laugh let light like little live long
+look made make many may me much must my myself never new no not now number of off old on once one only
+open or other our out over own part people pick play please pretty pull put ran read red ride right
+round run said saw say see seven shall she show sing sit six sleep small so some soon start stop take
+tell ten than thank that the their them then there these they thing think this those three to today
+together too try two under up upon us use very walk want warm was wash water way we well went were what
+when where which white who why will wish with word work would write yellow yes you your
+apple baby back ball bear bed bell bird birthday boat box boy bread brother cake car cat chair chicken
+children christmas coat corn cow dog doll door duck egg eye farm farmer father feet fire fish floor
+flower game garden girl goodbye grass ground hand head hill home horse house kitty leg letter man men
+milk money morning mother name nest night paper party picture pig rabbit rain ring robin school seed
+sheep shoe sister snow song squirrel stick street sun table time top toy tree watch wind window wood
+""".split())
+
+_SUFFIXES = ("ing", "ed", "es", "s", "er", "est", "ly")
+
+
+def count_syllables(word: str) -> int:
+    """Vowel-group estimate, good to about one syllable per word"""
+    word = word.lower()
+    syllables = len(_VOWEL_GROUPS.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and syllables > 1:
+        syllables -= 1
+    return max(syllables, 1)
+
+
+def _is_common(word: str) -> bool:
+    word = word.lower()
+    if word in COMMON_WORDS or len(word) <= 3:
+        return True
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if stem in COMMON_WORDS or stem + "e" in COMMON_WORDS:
+                return True
+    return False
+
+
+def readability(text: str) -> Dict:
+    """
+    Flesch-Kincaid grade level, words per sentence and share of words
+    outside COMMON_WORDS for a markdown document. Empty text scores zero.
+    """
+    plain = _MARKDOWN.sub(lambda m: m.group(1) or " ", _BLOCK_LINE.sub(r"\1.", text))
+    words = _WORD.findall(plain)
+    if not words:
+        return {'reading_grade': 0.0, 'avg_sentence_length': 0.0, 'rare_word_ratio': 0.0}
+
+    sentences = max(len([s for s in _SENTENCE_END.split(plain) if _WORD.search(s)]), 1)
+    syllables = sum(count_syllables(word) for word in words)
+    words_per_sentence = len(words) / sentences
+    grade = 0.39 * words_per_sentence + 11.8 * syllables / len(words) - 15.59
+
+    return {
+        'reading_grade': round(max(grade, 0.0), 2),
+        'avg_sentence_length': round(words_per_sentence, 2),
+        'rare_word_ratio': round(sum(not _is_common(word) for word in words) / len(words), 4),
+    }
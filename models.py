@@ -1,5 +1,5 @@
 """SQLAlchemy database models"""
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, JSON
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Boolean, JSON, LargeBinary, Index, func, literal_column
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -14,6 +14,8 @@ class Parent(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     full_name = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
+    is_active = Column(Boolean, default=True, nullable=False)
+    token_version = Column(Integer, default=0, nullable=False)  # bumped to revoke issued tokens
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -24,7 +26,7 @@ class Child(Base):
     __tablename__ = "children"
 
     id = Column(Integer, primary_key=True, index=True)
-    parent_id = Column(Integer, ForeignKey("parents.id"), nullable=False)
+    parent_id = Column(Integer, ForeignKey("parents.id"), nullable=False, index=True)
     first_name = Column(String, nullable=False)
     nickname = Column(String, nullable=True)
     date_of_birth = Column(String, nullable=False)
@@ -49,21 +51,133 @@ class Conversation(Base):
     title = Column(String, nullable=False)
     folder = Column(String, default="General")
     message_count = Column(Integer, default=0)
+    total_depth_reached = Column(Integer, default=1)
+    version = Column(Integer, default=0, nullable=False)  # bumped on every message append
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     child = relationship("Child", back_populates="conversations")
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    # Messages are removed by the database's ON DELETE CASCADE, never loaded
+    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan", passive_deletes=True)
 
 class Message(Base):
     """Individual message in conversation"""
     __tablename__ = "messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
     role = Column(String, nullable=False)
     content = Column(Text, nullable=False)
+    source_type = Column(String, nullable=True)
     sources = Column(JSON, nullable=True)
+    depth_level = Column(Integer, default=1)
+    model_used = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     conversation = relationship("Conversation", back_populates="messages")
+
+class EducationalContent(Base):
+    """Curated curriculum document ingested from educational_content/"""
+    __tablename__ = "educational_content"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    grade_level = Column(String, nullable=False)
+    topic = Column(String, nullable=True)
+    # Legacy uncompressed body; new bodies live in educational_content_bodies
+    content = Column(Text, nullable=True)
+    content_hash = Column(String, nullable=False)
+    file_path = Column(String, unique=True, index=True, nullable=False)
+    word_count = Column(Integer, default=0)
+    # From frontmatter, or the grade level directory; kindergarten is 0
+    grade_min = Column(Integer, nullable=True)
+    grade_max = Column(Integer, nullable=True)
+    language = Column(String, nullable=False, default="en", index=True)
+    standards = Column(JSON, nullable=True, default=list)
+    keywords = Column(JSON, nullable=True, default=list)
+    search_text = Column(Text, nullable=True)  # distinct body words, for search without decompressing
+    # Readability, scored once at ingestion (model/readability.py)
+    reading_grade = Column(Float, nullable=True, index=True)
+    avg_sentence_length = Column(Float, nullable=True)
+    rare_word_ratio = Column(Float, nullable=True)
+    deleted_at = Column(DateTime, nullable=True)  # tombstone: source file was removed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ContentDictionary(Base):
+    """A zstd dictionary trained on content bodies; the newest one compresses new bodies"""
+    __tablename__ = "content_dictionaries"
+
+    id = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ContentBody(Base):
+    """zstd-compressed body of an educational_content row, loaded only for prompt context"""
+    __tablename__ = "educational_content_bodies"
+
+    content_id = Column(Integer, ForeignKey("educational_content.id", ondelete="CASCADE"), primary_key=True)
+    dictionary_id = Column(Integer, ForeignKey("content_dictionaries.id"), nullable=True)
+    body = Column(LargeBinary, nullable=False)
+    raw_size = Column(Integer, nullable=False)
+
+class MessageArchive(Base):
+    """A monthly messages partition moved to cold storage"""
+    __tablename__ = "message_archives"
+
+    partition_name = Column(String, primary_key=True)
+    range_start = Column(DateTime, nullable=False)
+    range_end = Column(DateTime, nullable=False)
+    path = Column(String, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class MessageArchiveConversation(Base):
+    """Which archived partitions hold messages of a conversation"""
+    __tablename__ = "message_archive_conversations"
+
+    partition_name = Column(String, ForeignKey("message_archives.partition_name", ondelete="CASCADE"), primary_key=True)
+    conversation_id = Column(Integer, primary_key=True, index=True)
+    message_count = Column(Integer, nullable=False)
+    first_created_at = Column(DateTime, nullable=False)
+    last_created_at = Column(DateTime, nullable=False)
+
+class RefreshToken(Base):
+    """A rotating refresh token; only its SHA-256 digest is stored"""
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    parent_id = Column(Integer, ForeignKey("parents.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String, unique=True, index=True, nullable=False)
+    family_id = Column(String, nullable=False, index=True)  # shared by every rotation of one login
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)  # set when rotated; presenting it again is reuse
+    revoked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Composite indexes for the hot query paths (created online by migrations/0002)
+Index("ix_messages_conversation_created", Message.conversation_id, Message.created_at, Message.id)
+Index(
+    "ix_conversations_child_folder_updated",
+    Conversation.child_id, Conversation.folder, Conversation.updated_at.desc(), Conversation.id.desc()
+)
+Index("ix_conversations_child_updated", Conversation.child_id, Conversation.updated_at.desc(), Conversation.id.desc())
+
+# Readability and grade-range filters for retrieval (migrations/0009)
+Index("ix_educational_content_grade_range", EducationalContent.grade_min, EducationalContent.grade_max)
+
+# Full-text search over message content (migrations/0005); Postgres only.
+# On a fresh database 0004 renames these to ix_messages_legacy_* when it
+# partitions messages, and 0005 rebuilds them on the partitioned table
+Index(
+    "ix_messages_content_fts_en",
+    func.to_tsvector(literal_column("'english'::regconfig"), Message.content),
+    postgresql_using="gin"
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_messages_content_fts_es",
+    func.to_tsvector(literal_column("'spanish'::regconfig"), Message.content),
+    postgresql_using="gin"
+).ddl_if(dialect="postgresql")
@@ -0,0 +1,4 @@
+"""API routers package"""
+from . import content, conversation
+
+__all__ = ['content', 'conversation']
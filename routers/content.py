@@ -0,0 +1,15 @@
+"""Content library endpoints"""
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_read_db
+from services.content_manager import content_manager
+
+router = APIRouter()
+
+
+@router.get("/stats")
+async def content_stats(response: Response, db: AsyncSession = Depends(get_read_db)):
+    """Document and word counts by subject and grade level (cached; cheap to poll)"""
+    response.headers["Cache-Control"] = f"public, max-age={min(int(content_manager.stats_ttl_seconds), 60)}"
+    return await content_manager.get_content_stats(db)
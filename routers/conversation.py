@@ -0,0 +1,298 @@
+"""Conversation endpoints: chat turns and history"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from auth import get_current_parent_id
+from config import settings
+from database import get_async_db, get_read_db, read_router, ReadRouter
+from schemas import MessageCreate
+from services.chat_pipeline import chat_pipeline
+from services.conversation_service import ConversationService, encode_cursor, OLDER, NEWER
+from services.message_writer import message_writer
+from services.rag_service import rag_service
+from services.safety_filter import safety_filter
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _source_summary(search_results):
+    """Keep only the fields of a search hit worth storing with a message"""
+    return [
+        {
+            'id': result['id'],
+            'title': result['title'],
+            'subject': result['subject'],
+            'grade_level': result['grade_level'],
+        }
+        for result in search_results
+    ]
+
+
+def _conversation_to_dict(conversation):
+    return {
+        'id': conversation.id,
+        'child_id': conversation.child_id,
+        'title': conversation.title,
+        'folder': conversation.folder,
+        'message_count': conversation.message_count,
+        'created_at': conversation.created_at,
+        'updated_at': conversation.updated_at,
+    }
+
+
+def _message_to_dict(message):
+    return {
+        'id': message.id,
+        'conversation_id': message.conversation_id,
+        'role': message.role,
+        'content': message.content,
+        'source_type': message.source_type,
+        'sources': message.sources,
+        'depth_level': message.depth_level,
+        'created_at': message.created_at,
+    }
+
+
+def _trim_page(items, limit, far_end_first):
+    """Drop the extra look-ahead row fetched to detect whether more pages exist"""
+    has_more = len(items) > limit
+    if has_more:
+        items = items[1:] if far_end_first else items[:-1]
+    return items, has_more
+
+
+async def _require_child(service, child_id, parent_id):
+    if not await service.child_belongs_to_parent(child_id, parent_id):
+        raise HTTPException(status_code=404, detail="Child not found")
+
+
+async def _require_conversation(service, conversation_id, parent_id):
+    if await service.conversation_child_id(conversation_id, parent_id) is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+
+async def _save_turn(service, conversation_id, user_message, assistant_message, client_key):
+    """
+    Persist a user/assistant pair and return the assistant message id.
+
+    In write-behind mode the pair goes through the message writer; with
+    ack on enqueue the id is not known yet and None is returned. The
+    writer's own session carries no client, so the client is marked as
+    having written here, keeping its next reads off a lagging replica.
+    """
+    messages = [user_message, assistant_message]
+
+    if settings.message_write_behind and message_writer.running:
+        read_router.mark_write(client_key)
+        created = await message_writer.submit(conversation_id, messages)
+    else:
+        created = await service.add_messages(conversation_id, messages)
+
+    return created[-1].id if created else None
+
+
+@router.get("/conversations/{child_id}")
+async def list_conversations(
+    child_id: int,
+    folder: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    direction: str = Query(OLDER, pattern=f"^({OLDER}|{NEWER})$"),
+    db: AsyncSession = Depends(get_read_db),
+    parent_id: int = Depends(get_current_parent_id)
+):
+    """Page through a child's conversations, most recently updated first"""
+    service = ConversationService(db)
+    await _require_child(service, child_id, parent_id)
+    try:
+        conversations = await service.get_child_conversations(
+            child_id, folder=folder, limit=limit + 1, cursor=cursor, direction=direction
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Newest-first list: the look-ahead row is at the end when paging older
+    conversations, has_more = _trim_page(conversations, limit, far_end_first=direction == NEWER)
+
+    return {
+        'conversations': [_conversation_to_dict(c) for c in conversations],
+        'has_more': has_more,
+        'newer_cursor': encode_cursor(conversations[0].updated_at, conversations[0].id) if conversations else None,
+        'older_cursor': encode_cursor(conversations[-1].updated_at, conversations[-1].id) if conversations else None,
+    }
+
+
+@router.delete("/conversations/{child_id}")
+async def delete_child_conversations(
+    child_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    parent_id: int = Depends(get_current_parent_id)
+):
+    """Delete all of a child's conversations and their messages"""
+    service = ConversationService(db)
+    await _require_child(service, child_id, parent_id)
+    deleted = await service.delete_child_conversations(child_id)
+    return {'deleted': deleted}
+
+
+@router.delete("/conversation/{conversation_id}")
+async def delete_conversation(
+    conversation_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    parent_id: int = Depends(get_current_parent_id)
+):
+    """Delete one conversation and its messages"""
+    service = ConversationService(db)
+    await _require_conversation(service, conversation_id, parent_id)
+    if not await service.delete_conversation(conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {'deleted': 1}
+
+
+@router.get("/messages/{conversation_id}")
+async def list_messages(
+    conversation_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    direction: str = Query(OLDER, pattern=f"^({OLDER}|{NEWER})$"),
+    include_archived: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+    parent_id: int = Depends(get_current_parent_id)
+):
+    """Page through a conversation's messages; the first page is the newest window"""
+    service = ConversationService(db)
+    await _require_conversation(service, conversation_id, parent_id)
+    try:
+        messages = await service.get_conversation_messages(
+            conversation_id, limit=limit + 1, cursor=cursor, direction=direction,
+            include_archived=include_archived
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Chronological list: the look-ahead row is at the start when paging older
+    messages, has_more = _trim_page(messages, limit, far_end_first=direction == OLDER)
+
+    return {
+        'messages': [_message_to_dict(m) for m in messages],
+        'has_more': has_more,
+        'older_cursor': encode_cursor(messages[0].created_at, messages[0].id) if messages else None,
+        'newer_cursor': encode_cursor(messages[-1].created_at, messages[-1].id) if messages else None,
+    }
+
+
+@router.get("/search/{child_id}")
+async def search_messages(
+    child_id: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    folder: Optional[str] = None,
+    language: Optional[str] = Query(None, pattern="^(en|es)$"),
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+    parent_id: int = Depends(get_current_parent_id)
+):
+    """Search a child's conversation history; snippets are HTML-escaped and mark matches with <mark>"""
+    service = ConversationService(db)
+    await _require_child(service, child_id, parent_id)
+    results = await service.search_messages(
+        child_id, q, folder=folder, language=language, limit=limit
+    )
+    return {'query': q, 'results': results}
+
+
+@router.post("/message")
+async def send_message(
+    message: MessageCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    parent_id: int = Depends(get_current_parent_id)
+):
+    """Answer a child's question, creating a conversation if needed"""
+    service = ConversationService(db)
+
+    # Ownership of the child and conversation is checked by the profile
+    # stage, concurrently with the others; nothing is returned or written
+    # until it passes
+    prepared = await chat_pipeline.prepare_turn(
+        child_id=message.child_id,
+        question=message.text,
+        conversation_id=message.conversation_id,
+        parent_id=parent_id
+    )
+
+    child_profile = prepared['child_profile']
+    if not child_profile:
+        raise HTTPException(status_code=404, detail="Child not found")
+    if not child_profile['owns_conversation']:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    search_results = prepared['search_results']
+
+    conversation_id = message.conversation_id
+    if not conversation_id:
+        folder = search_results[0]['subject'].title() if search_results else "General"
+        conversation = await service.create_conversation(
+            child_id=message.child_id,
+            title=message.text[:50],
+            folder=folder
+        )
+        conversation_id = conversation.id
+
+    user_message = {
+        'role': "user",
+        'content': message.text,
+        'depth_level': message.current_depth,
+    }
+
+    if not prepared['is_safe']:
+        logger.warning(f"Blocked question from child {message.child_id}: {prepared['safety_reason']}")
+        reply = safety_filter.unsafe_input_response(message.text)
+        message_id = await _save_turn(service, conversation_id, user_message, {
+            'role': "assistant",
+            'content': reply['text'],
+            'source_type': "safety",
+            'depth_level': message.current_depth,
+        }, ReadRouter.client_key(request))
+        return {
+            'text': reply['text'],
+            'conversation_id': conversation_id,
+            'message_id': message_id,
+            'has_curated_content': False,
+            'sources': [],
+            'needs_intervention': reply['needs_intervention'],
+            'timings_ms': prepared['timings'],
+        }
+
+    response = await rag_service.generate_response(
+        db=db,
+        question=message.text,
+        child_profile=child_profile,
+        conversation_history=prepared['history'],
+        current_depth=message.current_depth,
+        search_results=search_results
+    )
+
+    sources = _source_summary(response['sources'])
+    message_id = await _save_turn(service, conversation_id, user_message, {
+        'role': "assistant",
+        'content': response['text'],
+        'source_type': "curriculum" if response['has_curated_content'] else "general",
+        'sources': sources,
+        'depth_level': message.current_depth,
+        'model_used': response['model_used'],
+    }, ReadRouter.client_key(request))
+
+    return {
+        'text': response['text'],
+        'source_label': response['source_label'],
+        'has_curated_content': response['has_curated_content'],
+        'sources': sources,
+        'conversation_id': conversation_id,
+        'message_id': message_id,
+        'current_depth': message.current_depth,
+        'timings_ms': prepared['timings'],
+    }
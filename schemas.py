@@ -50,3 +50,10 @@ class ChildResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+# Conversation schemas
+class MessageCreate(BaseModel):
+    child_id: int
+    text: str
+    current_depth: int = 1
+    conversation_id: Optional[int] = None
@@ -0,0 +1,53 @@
+"""
+Archive old message partitions to cold storage
+Run monthly: creates upcoming partitions, moves partitions older than
+MESSAGE_RETENTION_MONTHS into zstd-compressed NDJSON files, and purges
+archived messages of deleted conversations from the archive files
+
+    python scripts/archive_messages.py [--dry-run]
+    python scripts/archive_messages.py --rehydrate messages_y2024m01
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from database import async_engine, AsyncSessionLocal
+from services.message_archive import message_archive
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(name)s] %(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main(args):
+    if args.rehydrate:
+        count = await message_archive.rehydrate_partition(async_engine, args.rehydrate)
+        logger.info(f"✅ Rehydrated {count} messages into {args.rehydrate}")
+        return
+
+    async with async_engine.begin() as conn:
+        await message_archive.ensure_partitions(conn)
+    logger.info("✅ Upcoming partitions exist")
+
+    archived = await message_archive.archive_expired(async_engine, dry_run=args.dry_run)
+    for name, count in archived.items():
+        logger.info(f"📦 {name}: {count} messages archived")
+    logger.info(f"✅ Archived {len(archived)} partition(s)")
+
+    if not args.dry_run:
+        async with AsyncSessionLocal() as db:
+            rewritten = await message_archive.purge_deleted(db)
+        logger.info(f"✅ Purged deleted conversations from {rewritten} archive file(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="List expired partitions without archiving")
+    parser.add_argument("--rehydrate", metavar="PARTITION", help="Load an archived partition back")
+    asyncio.run(main(parser.parse_args()))
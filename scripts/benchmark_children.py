@@ -0,0 +1,158 @@
+"""
+Throughput comparison for GET /api/v1/children/
+Runs the endpoint's query the old way (sync engine, f-string SQL on a
+40-thread pool like FastAPI's default threadpool) and the new way (async
+engine, bound Core statement) under the same number of concurrent clients.
+With --url, loads a running server over HTTP instead. With --seed, first
+fills a local SQLite database (ENVIRONMENT=development, DATABASE_URL
+unset or sqlite:///...) with a parent and that many children.
+
+    ENVIRONMENT=development DATABASE_URL=sqlite:////tmp/bench.db \
+        python scripts/benchmark_children.py --seed 5
+
+Recorded results are in docs/benchmarks.md.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+# AnyIO's default thread limiter, which sync FastAPI endpoints share
+THREADPOOL_SIZE = 40
+
+
+def summarize(label: str, latencies, elapsed: float):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<28} {len(latencies) / elapsed:>9.0f} req/s   "
+        f"p50 {statistics.median(latencies) * 1000:>7.2f}ms   p95 {p95 * 1000:>7.2f}ms"
+    )
+
+
+async def run_clients(clients: int, requests_per_client: int, call):
+    """Run `clients` concurrent loops of `call()`; returns (latencies, elapsed)"""
+    latencies = []
+
+    async def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+async def seed(parent_id: int, children: int):
+    """Create the SQLite schema and top the parent up to `children` children"""
+    from sqlalchemy import select, insert, func
+    from database import AsyncSessionLocal, create_schema, IS_SQLITE
+    from models import Parent, Child
+
+    if not IS_SQLITE:
+        raise SystemExit("--seed only fills a local SQLite database")
+    await create_schema()
+    async with AsyncSessionLocal() as db:
+        if (await db.execute(select(Parent.id).where(Parent.id == parent_id))).scalar_one_or_none() is None:
+            await db.execute(insert(Parent).values(
+                id=parent_id, email=f"bench{parent_id}@example.com", full_name="Benchmark Parent", hashed_password="x"
+            ))
+        existing = (await db.execute(select(func.count()).where(Child.parent_id == parent_id))).scalar_one()
+        if existing < children:
+            await db.execute(insert(Child), [
+                {'parent_id': parent_id, 'first_name': f"Kid {i}", 'date_of_birth': "2015-01-01",
+                 'grade_level': "3rd grade", 'hashed_pin': "x"}
+                for i in range(existing, children)
+            ])
+        await db.commit()
+
+
+async def benchmark_queries(parent_id: int, clients: int, requests_per_client: int):
+    from sqlalchemy import select, text
+    from database import AsyncSessionLocal, SessionLocal
+    from models import Child
+
+    threadpool = ThreadPoolExecutor(max_workers=THREADPOOL_SIZE)
+    loop = asyncio.get_running_loop()
+
+    def sync_query():
+        db = SessionLocal()
+        try:
+            # What main.py used to do: a new SQL string per parent, on a thread
+            result = db.execute(text(
+                "SELECT id, parent_id, first_name, nickname, grade_level, created_at "
+                f"FROM children WHERE parent_id={parent_id}"
+            ))
+            return [tuple(row) for row in result]
+        finally:
+            db.close()
+
+    async def old_call():
+        await loop.run_in_executor(threadpool, sync_query)
+
+    async def new_call():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Child.id, Child.parent_id, Child.first_name, Child.nickname,
+                       Child.grade_level, Child.created_at)
+                .where(Child.parent_id == parent_id)
+            )
+            result.mappings().all()
+
+    # Warm up both pools and statement caches
+    await run_clients(min(clients, 10), 5, old_call)
+    await run_clients(min(clients, 10), 5, new_call)
+
+    summarize("sync engine + f-string SQL", *await run_clients(clients, requests_per_client, old_call))
+    summarize("async engine + bound params", *await run_clients(clients, requests_per_client, new_call))
+    threadpool.shutdown()
+
+
+async def benchmark_http(url: str, token: str, clients: int, requests_per_client: int):
+    import requests
+
+    threadpool = ThreadPoolExecutor(max_workers=clients)
+    loop = asyncio.get_running_loop()
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=clients))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def get():
+        session.get(f"{url}/api/v1/children/", headers=headers).raise_for_status()
+
+    async def call():
+        await loop.run_in_executor(threadpool, get)
+
+    summarize(f"HTTP {url}", *await run_clients(clients, requests_per_client, call))
+    threadpool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parent-id", type=int, default=1)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--url", help="benchmark a running server instead, e.g. http://localhost:8000")
+    parser.add_argument("--token", help="bearer token for --url")
+    parser.add_argument("--seed", type=int, metavar="N", help="seed a local SQLite database with N children first")
+    args = parser.parse_args()
+
+    if args.seed:
+        asyncio.run(seed(args.parent_id, args.seed))
+
+    print(f"🏁 {args.clients} concurrent clients x {args.requests} requests\n")
+    if args.url:
+        asyncio.run(benchmark_http(args.url, args.token, args.clients, args.requests))
+    else:
+        asyncio.run(benchmark_queries(args.parent_id, args.clients, args.requests))
+
+
+if __name__ == "__main__":
+    main()
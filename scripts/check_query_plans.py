@@ -0,0 +1,165 @@
+"""
+Check that the hot service queries are served by their indexes
+Runs each query under EXPLAIN with sequential scans disabled and fails if the
+expected index is not used or the table is scanned sequentially
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import async_engine
+from models import Child, EducationalContent
+from services.conversation_service import ConversationService, encode_cursor, NEWER
+from datetime import datetime
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def plan_nodes(plan):
+    """Yield every node of an EXPLAIN (FORMAT JSON) plan tree"""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+# Postgres names the per-partition copies of a partitioned index itself
+PARTITION_INDEX_SUFFIXES = {
+    "ix_messages_conversation_created": "_conversation_id_created_at_id_idx",
+    "ix_messages_content_fts_en": "_content_fts_en",
+    "ix_messages_content_fts_es": "_content_fts_es",
+}
+
+
+def index_used(plan, table: str, index: str) -> bool:
+    """True if the plan reads `table` through `index` and never seq-scans it"""
+    def is_table(relation):
+        return relation == table or (relation or "").startswith(f"{table}_")
+
+    def is_index(name):
+        suffix = PARTITION_INDEX_SUFFIXES.get(index)
+        return name == index or bool(suffix and name and name.endswith(suffix))
+
+    nodes = list(plan_nodes(plan))
+    seq_scans = [n for n in nodes if n["Node Type"] == "Seq Scan" and is_table(n.get("Relation Name"))]
+    index_scans = [n for n in nodes if is_index(n.get("Index Name"))]
+    return bool(index_scans) and not seq_scans
+
+
+def service_checks():
+    """(description, table, expected index, coroutine factory taking a session)"""
+    cursor = encode_cursor(datetime.utcnow(), 1)
+
+    return [
+        (
+            "ConversationService.get_child_conversations",
+            "conversations", "ix_conversations_child_updated",
+            lambda db: ConversationService(db).get_child_conversations(1, limit=20),
+        ),
+        (
+            "ConversationService.get_child_conversations (folder)",
+            "conversations", "ix_conversations_child_folder_updated",
+            lambda db: ConversationService(db).get_child_conversations(1, folder="Math", limit=20),
+        ),
+        (
+            "ConversationService.get_child_conversations (cursor)",
+            "conversations", "ix_conversations_child_updated",
+            lambda db: ConversationService(db).get_child_conversations(1, limit=20, cursor=cursor),
+        ),
+        (
+            "ConversationService.get_conversation_messages",
+            "messages", "ix_messages_conversation_created",
+            lambda db: ConversationService(db).get_conversation_messages(1, limit=50),
+        ),
+        (
+            "ConversationService.get_conversation_messages (cursor, newer)",
+            "messages", "ix_messages_conversation_created",
+            lambda db: ConversationService(db).get_conversation_messages(
+                1, limit=50, cursor=cursor, direction=NEWER
+            ),
+        ),
+        (
+            "ConversationService.search_messages (en)",
+            "messages", "ix_messages_content_fts_en",
+            lambda db: ConversationService(db).search_messages(1, "volcano", language="en"),
+        ),
+        (
+            "ConversationService.search_messages (es)",
+            "messages", "ix_messages_content_fts_es",
+            lambda db: ConversationService(db).search_messages(1, "volcán", language="es"),
+        ),
+        (
+            "children by parent (GET /api/v1/children/)",
+            "children", "ix_children_parent_id",
+            lambda db: db.execute(select(Child).where(Child.parent_id == 1)),
+        ),
+        (
+            "ContentManager.ingest_content_file lookup by file_path",
+            "educational_content", "ix_educational_content_file_path",
+            lambda db: db.execute(
+                select(EducationalContent).where(EducationalContent.file_path == "math/elementary/x.md")
+            ),
+        ),
+    ]
+
+
+async def explain(conn, statement: str, parameters) -> dict:
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def check_plans() -> bool:
+    """Run every check; returns True when all queries use their index"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(("EXPLAIN", "SET")):
+            captured.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    all_ok = True
+
+    try:
+        async with async_engine.connect() as conn:
+            # Small tables favour seq scans; this checks the index is usable
+            await conn.execute(text("SET enable_seqscan = off"))
+            db = AsyncSession(bind=conn)
+
+            for description, table, index, run_query in service_checks():
+                captured.clear()
+                await run_query(db)
+                queries = list(captured)
+
+                ok = bool(queries)
+                for statement, parameters in queries:
+                    plan = await explain(conn, statement, parameters)
+                    if not index_used(plan, table, index):
+                        ok = False
+                        logger.error(f"Plan for {description}:\n{json.dumps(plan, indent=2)}")
+
+                print(f"{'✅' if ok else '❌'} {description} -> {index}")
+                all_ok = all_ok and ok
+
+            await conn.rollback()
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+    return all_ok
+
+
+if __name__ == "__main__":
+    if asyncio.run(check_plans()):
+        print("\n✅ All hot queries use their indexes!")
+        sys.exit(0)
+    else:
+        print("\n❌ Some queries are not using their indexes.")
+        sys.exit(1)
@@ -0,0 +1,35 @@
+"""
+Train a zstd dictionary on the content library and recompress every body
+with it, moving any legacy uncompressed content into
+educational_content_bodies. Safe to re-run, e.g. after large imports
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from database import AsyncSessionLocal
+from services.content_store import content_store
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(name)s] %(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        # Training samples legacy uncompressed bodies too
+        await content_store.train_dictionary(db)
+        stats = await content_store.recompress(db)
+
+    ratio = stats['raw_bytes'] / stats['stored_bytes'] if stats['stored_bytes'] else 0
+    logger.info(f"📦 {stats['documents']} bodies: {stats['raw_bytes']} bytes -> {stats['stored_bytes']} bytes ({ratio:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""
+Script to import an external document collection into the database
+Accepts JSONL (optionally .gz) or the {"documents": [...]} shape of
+data_sources/sample_corpus.json
+
+    python scripts/import_corpus.py dumps/curriculum.jsonl.gz --batch-size 2000
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from database import AsyncSessionLocal
+from services.corpus_importer import corpus_importer, IMPORT_BATCH_SIZE
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(name)s] %(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main(args):
+    """Stream a corpus file into educational_content"""
+    logger.info(f"🚀 Importing corpus {args.path}...")
+
+    async with AsyncSessionLocal() as db:
+        stats = await corpus_importer.import_corpus(
+            db,
+            args.path,
+            source=args.source,
+            batch_size=args.batch_size,
+            force_update=args.force
+        )
+
+    logger.info("\n" + "="*60)
+    logger.info("📊 CORPUS IMPORT COMPLETE")
+    logger.info("="*60)
+    logger.info(f"Documents read: {stats['total']}")
+    logger.info(f"✅ Added: {stats['added']}")
+    logger.info(f"🔄 Updated: {stats['updated']}")
+    logger.info(f"⏭️  Skipped (unchanged): {stats['skipped']}")
+    logger.info(f"❌ Invalid: {stats['invalid']}")
+    logger.info(f"⚡ Throughput: {stats['documents_per_second']} docs/sec ({stats['elapsed_seconds']}s)")
+    logger.info("="*60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="corpus file (.json, .jsonl, .ndjson, optionally .gz)")
+    parser.add_argument("--source", help="namespace for document ids (default: file name)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="documents per transaction")
+    parser.add_argument("--force", action="store_true", help="rewrite documents even if unchanged")
+    asyncio.run(main(parser.parse_args()))
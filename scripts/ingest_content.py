@@ -1,6 +1,7 @@
 """
 Script to ingest educational content into database
-Run this after adding new content files
+Run this after adding new content files; --force re-parses every file
+(e.g. to backfill columns added by a migration)
 """
 import asyncio
 import sys
@@ -9,7 +10,7 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from database import async_session
+from database import AsyncSessionLocal
 from services.content_manager import content_manager
 import logging
 
@@ -24,8 +25,8 @@ async def main():
     """Ingest all educational content"""
     logger.info("🚀 Starting content ingestion...")
 
-    async with async_session() as db:
-        stats = await content_manager.ingest_all_content(db, force_update=False)
+    async with AsyncSessionLocal() as db:
+        stats = await content_manager.ingest_all_content(db, force_update="--force" in sys.argv)
 
         logger.info("\n" + "="*60)
         logger.info("📊 CONTENT INGESTION COMPLETE")
@@ -34,7 +35,9 @@ async def main():
         logger.info(f"✅ Added: {stats['added']}")
         logger.info(f"🔄 Updated: {stats['updated']}")
         logger.info(f"⏭️  Skipped (unchanged): {stats['skipped']}")
+        logger.info(f"🗑️  Deleted (tombstoned): {stats['deleted']}")
         logger.info(f"❌ Errors: {stats['errors']}")
+        logger.info(f"⚡ Throughput: {stats['files_per_second']} files/sec ({stats['elapsed_seconds']}s)")
         logger.info("="*60)
 
         # Get content stats
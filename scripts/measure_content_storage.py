@@ -0,0 +1,164 @@
+"""
+Measure compressed content storage on a scaled-up corpus
+Replicates educational_content/ (with per-copy variations) and compares:
+  - body bytes: raw, zstd, zstd with a trained dictionary
+  - database file size: bodies inline vs educational_content_bodies
+  - bytes and time read by a metadata-only listing vs full rows
+  - memory held by an in-process corpus of raw vs compressed bodies
+
+    python scripts/measure_content_storage.py --copies 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import zstandard
+from sqlalchemy import select, insert, func
+from database import create_sqlite_database
+from models import EducationalContent
+from services.content_manager import content_manager, parse_content_file
+from services.content_store import COMPRESSION_LEVEL, DICTIONARY_SIZE, content_store
+
+
+def scaled_corpus(copies: int):
+    """Parsed documents, each source file repeated with a numbered variation"""
+    files = content_manager.discover_content_files()
+    base = [parse_content_file(path, content_manager.content_dir) for path in files]
+    base = [doc for doc in base if doc]
+    for copy in range(copies):
+        for doc in base:
+            content = doc['content'].replace("Example", f"Example {copy}", 1) + f"\n\nPractice set {copy}.\n"
+            yield {
+                **doc,
+                'content': content,
+                'file_path': f"scaled/{copy}/{doc['file_path']}",
+                'content_hash': f"{doc['content_hash']}-{copy}",
+            }
+
+
+def measure_compression(bodies):
+    raw = sum(len(body) for body in bodies)
+    plain = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+    plain_size = sum(len(plain.compress(body)) for body in bodies)
+    dictionary = zstandard.train_dictionary(DICTIONARY_SIZE, bodies[:2000], level=COMPRESSION_LEVEL)
+    with_dict = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=dictionary)
+    dict_size = sum(len(with_dict.compress(body)) for body in bodies)
+    print(f"Bodies: {len(bodies)} documents, {raw / 1e6:.1f} MB raw")
+    print(f"  zstd:            {plain_size / 1e6:.2f} MB ({raw / plain_size:.1f}x)")
+    print(f"  zstd+dictionary: {dict_size / 1e6:.2f} MB ({raw / dict_size:.1f}x, dictionary {len(dictionary.as_bytes())} bytes)")
+    return dictionary
+
+
+def measure_memory(bodies, dictionary):
+    compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=dictionary)
+
+    tracemalloc.start()
+    held = [body.decode('utf-8') for body in bodies]
+    raw_peak = tracemalloc.get_traced_memory()[0]
+    del held
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    # Copied as the LSI retriever does: compress() output keeps its
+    # worst-case allocation otherwise
+    held = [bytes(memoryview(compressor.compress(body))) for body in bodies]
+    compressed_peak = tracemalloc.get_traced_memory()[0]
+    del held
+    tracemalloc.stop()
+    print(f"In-process corpus: {raw_peak / 1e6:.1f} MB as str, {compressed_peak / 1e6:.1f} MB compressed")
+
+
+async def build_database(path: str, docs, compressed: bool):
+    engine, Session = await create_sqlite_database(path)
+    async with Session() as db:
+        for offset in range(0, len(docs), 1000):
+            rows = docs[offset:offset + 1000]
+            if compressed:
+                await content_manager.upsert_documents(db, rows)
+            else:
+                await db.execute(insert(EducationalContent), rows)
+                await db.commit()
+        if compressed:
+            await content_store.train_dictionary(db)
+            await content_store.recompress(db)
+    # Reclaim pages freed by recompression, so file sizes compare live data
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("VACUUM")
+    return engine, Session
+
+
+async def largest_tables(engine, top: int = 4) -> str:
+    """The biggest tables and indexes of a SQLite file (needs the dbstat table)"""
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(
+            f"SELECT name, sum(pgsize) FROM dbstat GROUP BY name ORDER BY 2 DESC LIMIT {top}"
+        )
+        return ", ".join(f"{name} {size / 1e6:.1f} MB" for name, size in result.all())
+
+
+async def time_listing(Session, statement, repeat: int = 5):
+    async with Session() as db:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = await db.execute(statement)
+            rows = result.all()
+        elapsed = (time.perf_counter() - start) / repeat
+    return len(rows), elapsed
+
+
+async def main(args):
+    docs = list(scaled_corpus(args.copies))
+    if not docs:
+        print("No content files found")
+        return
+    bodies = [doc['content'].encode('utf-8') for doc in docs]
+    dictionary = measure_compression(bodies)
+    measure_memory(bodies, dictionary)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inline_path = os.path.join(tmp, "inline.db")
+        compressed_path = os.path.join(tmp, "compressed.db")
+        inline_engine, Inline = await build_database(inline_path, docs, compressed=False)
+        compressed_engine, Compressed = await build_database(compressed_path, docs, compressed=True)
+        print(f"Database file: {os.path.getsize(inline_path) / 1e6:.1f} MB inline, "
+              f"{os.path.getsize(compressed_path) / 1e6:.1f} MB with compressed bodies")
+        print(f"  inline:     {await largest_tables(inline_engine)}")
+        print(f"  compressed: {await largest_tables(compressed_engine)}")
+
+        full_rows = select(EducationalContent).limit(args.list_limit)
+        metadata_only = select(
+            EducationalContent.id, EducationalContent.title, EducationalContent.subject,
+            EducationalContent.grade_level, EducationalContent.topic
+        ).limit(args.list_limit)
+        count, full_time = await time_listing(Inline, full_rows)
+        _, metadata_time = await time_listing(Compressed, metadata_only)
+        async with Inline() as db:
+            listed = select(EducationalContent.content).limit(args.list_limit).subquery()
+            full_bytes = (await db.execute(select(func.sum(func.length(listed.c.content))))).scalar() or 0
+        print(f"Listing {count} rows: {full_time * 1000:.1f} ms with bodies ({full_bytes / 1e6:.1f} MB of text), "
+              f"{metadata_time * 1000:.1f} ms metadata-only")
+
+        async with Compressed() as db:
+            ids = (await db.execute(select(EducationalContent.id).limit(3))).scalars().all()
+            start = time.perf_counter()
+            await content_store.load_bodies(db, ids)
+            print(f"Prompt context: {len(ids)} bodies decompressed in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        await inline_engine.dispose()
+        await compressed_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=500, help="times to replicate educational_content/")
+    parser.add_argument("--list-limit", type=int, default=5000, help="rows read by the listing comparison")
+    asyncio.run(main(parser.parse_args()))
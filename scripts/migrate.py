@@ -0,0 +1,90 @@
+"""
+Apply pending schema migrations from migrations/
+Creates any missing tables from models.Base, then runs each migration not yet
+recorded in schema_migrations, in version order
+"""
+import asyncio
+import importlib
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from database import async_engine, IS_SQLITE
+from models import Base
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent.parent / "migrations"
+
+# Arbitrary key so two deploys never migrate at the same time
+MIGRATION_LOCK_ID = 727_001
+
+
+def discover_migrations():
+    """Return (version, module) pairs sorted by version"""
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("[0-9][0-9][0-9][0-9]_*.py")):
+        module = importlib.import_module(f"migrations.{path.stem}")
+        migrations.append((path.stem, module))
+    return migrations
+
+
+async def record_version(conn, version: str):
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version) VALUES (:version)"),
+        {"version": version}
+    )
+
+
+async def migrate():
+    """Create missing tables and apply pending migrations"""
+    logger.info("🔄 Running migrations...")
+
+    if IS_SQLITE:
+        # The migrations are Postgres-specific; a SQLite schema is built from the models
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        logger.info("✅ SQLite schema created from models")
+        return
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR PRIMARY KEY, applied_at TIMESTAMP NOT NULL DEFAULT now())"
+        ))
+
+    async with async_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+        try:
+            result = await conn.execute(text("SELECT version FROM schema_migrations"))
+            applied = {row[0] for row in result}
+
+            for version, module in discover_migrations():
+                if version in applied:
+                    continue
+
+                logger.info(f"▶️  {version}: {module.__doc__}")
+                if module.transactional:
+                    async with async_engine.begin() as tx_conn:
+                        await module.upgrade(tx_conn)
+                        await record_version(tx_conn, version)
+                else:
+                    # Must be idempotent: it is re-run in full if interrupted
+                    await module.upgrade(conn)
+                    await record_version(conn, version)
+                logger.info(f"✅ Applied {version}")
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+    logger.info("✅ Migrations complete!")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,56 @@
+"""
+Replay messages the write-behind writer spilled to its dead-letter file
+after exhausting its retries. Replayed entries are moved aside to
+<file>.replayed so a second run does not append them twice
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import settings
+from database import AsyncSessionLocal
+from services.conversation_service import ConversationService
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(name)s] %(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def read_entries(path: Path):
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            messages = [
+                {**msg, 'created_at': datetime.fromisoformat(msg['created_at'])}
+                for msg in entry['messages']
+            ]
+            yield entry['conversation_id'], messages
+
+
+async def main():
+    path = Path(sys.argv[1] if len(sys.argv) > 1 else settings.message_dead_letter_path)
+    if not path.exists():
+        logger.info(f"No dead-letter file at {path}")
+        return
+
+    entries = list(read_entries(path))
+    async with AsyncSessionLocal() as db:
+        results = await ConversationService(db).append_batch(entries)
+
+    missing = sum(1 for created in results if created is None)
+    path.rename(path.with_name(path.name + ".replayed"))
+    logger.info(f"✅ Replayed {len(entries) - missing} append(s) from {path}; {missing} for deleted conversations skipped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
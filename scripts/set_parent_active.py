@@ -0,0 +1,45 @@
+"""
+Deactivate or reactivate a parent account. Deactivation revokes every token
+the parent holds: access tokens stop resolving and refresh tokens are refused
+
+    python scripts/set_parent_active.py parent@example.com --deactivate
+    python scripts/set_parent_active.py parent@example.com --activate
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+from auth import set_parent_active
+from database import AsyncSessionLocal
+from models import Parent
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(name)s] %(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main(args):
+    async with AsyncSessionLocal() as db:
+        parent_id = (await db.execute(select(Parent.id).where(Parent.email == args.email))).scalar_one_or_none()
+        if parent_id is None:
+            logger.error(f"❌ No parent with email {args.email}")
+            sys.exit(1)
+        await set_parent_active(db, parent_id, args.activate)
+    logger.info(f"✅ {args.email} {'activated' if args.activate else 'deactivated'}; existing tokens revoked")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("email")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--activate", action="store_true")
+    group.add_argument("--deactivate", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,158 @@
+"""
+Chat Pipeline Service
+Runs the pre-LLM stages of a chat turn (profile, history, retrieval, safety)
+concurrently and records how long each stage took
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Dict, List, Optional, Tuple
+from sqlalchemy import select, and_
+from database import AsyncSessionLocal, ReplicaSessionLocal
+from models import Child, Conversation
+from services.conversation_service import ConversationService
+from services.rag_service import rag_service
+from services.safety_filter import safety_filter
+
+logger = logging.getLogger(__name__)
+
+
+class ChatPipeline:
+    """Prepares everything the model call needs for one chat turn"""
+
+    def __init__(self, history_limit: int = 4, search_limit: int = 3):
+        self.history_limit = history_limit
+        self.search_limit = search_limit
+
+    async def _timed(self, name: str, stage: Awaitable, timings: Dict[str, float]):
+        """Await a stage and record its wall-clock duration in milliseconds"""
+        start = time.perf_counter()
+        try:
+            return await stage
+        finally:
+            timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    async def load_child_profile(
+        self,
+        child_id: int,
+        parent_id: Optional[int] = None,
+        conversation_id: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Load the child fields used to build the prompt, or None when the
+        child is not the parent's. The same query checks that
+        `conversation_id`, if given, is the child's ('owns_conversation').
+        """
+        query = select(Child).where(Child.id == child_id)
+        if parent_id is not None:
+            query = query.where(Child.parent_id == parent_id)
+        if conversation_id:
+            query = query.add_columns(Conversation.id.label('conversation_id')).outerjoin(
+                Conversation, and_(Conversation.id == conversation_id, Conversation.child_id == Child.id)
+            )
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(query)
+            row = result.one_or_none()
+
+        if not row:
+            return None
+
+        child = row[0]
+        return {
+            'id': child.id,
+            'first_name': child.first_name,
+            'grade_level': child.grade_level,
+            'preferred_language': child.preferred_language,
+            'reading_level': child.progress_level,
+            'learning_accommodations': child.learning_accommodations or [],
+            'owns_conversation': not conversation_id or row.conversation_id is not None,
+        }
+
+    async def load_history(self, conversation_id: Optional[int]) -> List[Dict]:
+        """Load the most recent messages of a conversation for the prompt"""
+        if not conversation_id:
+            return []
+
+        async with AsyncSessionLocal() as db:
+            return await ConversationService(db).get_recent_history(conversation_id, self.history_limit)
+
+    async def retrieve_content(
+        self,
+        question: str,
+        child_profile_task: "asyncio.Task[Optional[Dict]]"
+    ) -> List[Dict]:
+        """Search curated content once the child's grade level is known"""
+        child_profile = await child_profile_task
+        if not child_profile:
+            return []
+
+        # Curated content only changes on ingestion, so lag is harmless here
+        async with ReplicaSessionLocal() as db:
+            return await rag_service.search_relevant_content(
+                db=db,
+                query=question,
+                child_grade_level=child_profile.get('grade_level'),
+                limit=self.search_limit
+            )
+
+    async def check_safety(self, question: str) -> Tuple[bool, str]:
+        """Run the input safety filter"""
+        return safety_filter.check_input_safety(question)
+
+    async def prepare_turn(
+        self,
+        child_id: int,
+        question: str,
+        conversation_id: Optional[int] = None,
+        parent_id: Optional[int] = None
+    ) -> Dict:
+        """
+        Run the pre-LLM stages concurrently.
+
+        Each stage uses its own session, since an AsyncSession must not be
+        shared between concurrent tasks. Retrieval needs the child's grade,
+        so it waits on the profile task while history and safety proceed.
+        The profile stage also checks ownership against `parent_id`; the
+        caller must reject the turn before using any other stage's result
+        when the profile is None or does not own the conversation.
+
+        If a stage fails, the others are cancelled and awaited before the
+        error propagates, so none outlives the request.
+        """
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        child_task = asyncio.ensure_future(
+            self._timed('child_profile', self.load_child_profile(child_id, parent_id, conversation_id), timings)
+        )
+        tasks = [
+            child_task,
+            asyncio.ensure_future(self._timed('history', self.load_history(conversation_id), timings)),
+            asyncio.ensure_future(self._timed('retrieval', self.retrieve_content(question, child_task), timings)),
+            asyncio.ensure_future(self._timed('safety', self.check_safety(question), timings)),
+        ]
+
+        try:
+            child_profile, history, search_results, (is_safe, safety_reason) = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        timings['total'] = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(f"Pre-LLM stages for child {child_id} (ms): {timings}")
+
+        return {
+            'child_profile': child_profile,
+            'history': history,
+            'search_results': search_results,
+            'is_safe': is_safe,
+            'safety_reason': safety_reason,
+            'timings': timings,
+        }
+
+
+# Singleton instance
+chat_pipeline = ChatPipeline()
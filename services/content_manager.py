@@ -2,68 +2,123 @@
 Content Management Service
 Handles ingestion, storage, and retrieval of educational content
 """
+import asyncio
+import json
+import multiprocessing
 import os
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import List, Dict, Optional
 import hashlib
+import time
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_, or_, func, cast, String
+from sqlalchemy.orm import defer
+from sqlalchemy.dialects import postgresql, sqlite
+from config import settings
 from models import EducationalContent
+from services.content_store import content_store
+from model.content_metadata import document_metadata, search_terms, split_frontmatter
+from model.corpus_reader import CORPUS_PATH_PREFIX
 
 logger = logging.getLogger(__name__)
 
+# Frontmatter and readability columns computed by document_metadata()
+METADATA_COLUMNS = [
+    'grade_min', 'grade_max', 'language', 'standards', 'keywords', 'search_text',
+    'reading_grade', 'avg_sentence_length', 'rare_word_ratio',
+]
+
+# Columns replaced when an ingested file already exists
+UPSERT_COLUMNS = [
+    'title', 'subject', 'grade_level', 'topic', 'content', 'content_hash', 'word_count',
+    *METADATA_COLUMNS, 'deleted_at', 'updated_at',
+]
+
+# Files parsed and written per transaction during bulk ingestion
+INGEST_CHUNK_SIZE = 2000
+
+
+def parse_content_file(file_path: Path, content_dir: Path) -> Optional[Dict]:
+    """
+    Parse a markdown content file and extract metadata.
+
+    Optional YAML frontmatter is stripped from the stored content and
+    supplies the grade range, standards, language and keywords (and may
+    override title and topic); readability is scored on the body.
+    Module-level so ingestion can run it in worker processes.
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        meta, content = split_frontmatter(text)
+
+        # Extract metadata from file path
+        relative_path = file_path.relative_to(content_dir)
+        parts = relative_path.parts
+
+        # Subject is first directory
+        subject = parts[0] if len(parts) > 0 else "general"
+
+        # Grade level is second directory
+        grade_level = parts[1] if len(parts) > 1 else "general"
+
+        # Topic is filename without extension
+        topic = str(meta.get('topic') or file_path.stem.replace('_', ' ').title())
+
+        # Extract title from first line if it's a heading
+        lines = content.split('\n')
+        title = topic
+        for line in lines:
+            if line.startswith('# '):
+                title = line.replace('# ', '').strip()
+                break
+        title = str(meta.get('title') or title)
+
+        # Calculate content hash for change detection, frontmatter included
+        content_hash = hashlib.md5(text.encode()).hexdigest()
+
+        return {
+            'title': title,
+            'subject': subject,
+            'grade_level': grade_level,
+            'topic': topic,
+            'content': content,
+            'content_hash': content_hash,
+            'file_path': str(relative_path),
+            'word_count': len(content.split()),
+            **document_metadata(meta, content, grade_level, title),
+        }
+    except Exception as e:
+        logger.error(f"Error parsing file {file_path}: {e}")
+        return None
+
 
 class ContentManager:
     """Manages educational content ingestion and retrieval"""
 
-    def __init__(self, content_dir: str = "educational_content"):
+    def __init__(
+        self,
+        content_dir: str = "educational_content",
+        stats_ttl_seconds: float = 300,
+        manifest_path: str = "data/content_manifest.json"
+    ):
         self.content_dir = Path(content_dir)
+        self.manifest_path = Path(manifest_path)
+        self.stats_ttl_seconds = stats_ttl_seconds
+        self._stats: Optional[Dict] = None
+        self._stats_expires_at = 0.0
+
+    def invalidate_stats(self):
+        """Drop cached library statistics; called whenever content is written"""
+        self._stats = None
 
-    def parse_content_file(self, file_path: Path) -> Dict:
+    def parse_content_file(self, file_path: Path) -> Optional[Dict]:
         """Parse a markdown content file and extract metadata"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            # Extract metadata from file path
-            relative_path = file_path.relative_to(self.content_dir)
-            parts = relative_path.parts
-
-            # Subject is first directory
-            subject = parts[0] if len(parts) > 0 else "general"
-
-            # Grade level is second directory
-            grade_level = parts[1] if len(parts) > 1 else "general"
-
-            # Topic is filename without extension
-            topic = file_path.stem.replace('_', ' ').title()
-
-            # Extract title from first line if it's a heading
-            lines = content.split('\n')
-            title = topic
-            for line in lines:
-                if line.startswith('# '):
-                    title = line.replace('# ', '').strip()
-                    break
-
-            # Calculate content hash for change detection
-            content_hash = hashlib.md5(content.encode()).hexdigest()
-
-            return {
-                'title': title,
-                'subject': subject,
-                'grade_level': grade_level,
-                'topic': topic,
-                'content': content,
-                'content_hash': content_hash,
-                'file_path': str(relative_path),
-                'word_count': len(content.split()),
-            }
-        except Exception as e:
-            logger.error(f"Error parsing file {file_path}: {e}")
-            return None
+        return parse_content_file(file_path, self.content_dir)
 
     def discover_content_files(self) -> List[Path]:
         """Discover all markdown files in content directory"""
@@ -75,6 +130,25 @@ class ContentManager:
         logger.info(f"Found {len(md_files)} content files")
         return md_files
 
+    def load_manifest(self) -> Dict[str, Dict]:
+        """The path -> {size, mtime_ns, hash} manifest from the last ingestion"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.manifest_path}: {e}")
+            return {}
+
+    def save_manifest(self, manifest: Dict[str, Dict]):
+        """Write the manifest atomically"""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
     async def ingest_content_file(
         self,
         file_path: Path,
@@ -99,7 +173,8 @@ class ContentManager:
 
             if existing_content:
                 # Check if content has changed
-                if existing_content.content_hash == metadata['content_hash'] and not force_update:
+                if (existing_content.content_hash == metadata['content_hash']
+                        and existing_content.deleted_at is None and not force_update):
                     logger.info(f"Content unchanged, skipping: {metadata['title']}")
                     return existing_content
 
@@ -109,31 +184,30 @@ class ContentManager:
                 existing_content.subject = metadata['subject']
                 existing_content.grade_level = metadata['grade_level']
                 existing_content.topic = metadata['topic']
-                existing_content.content = metadata['content']
+                existing_content.content = None
                 existing_content.content_hash = metadata['content_hash']
                 existing_content.word_count = metadata['word_count']
+                for column in METADATA_COLUMNS:
+                    setattr(existing_content, column, metadata[column])
+                existing_content.deleted_at = None
                 existing_content.updated_at = datetime.utcnow()
+                await content_store.write_bodies(db, {existing_content.id: metadata['content']})
 
                 await db.commit()
+                self.invalidate_stats()
                 await db.refresh(existing_content)
                 return existing_content
 
             else:
                 # Create new content
                 logger.info(f"Adding new content: {metadata['title']}")
-                new_content = EducationalContent(
-                    title=metadata['title'],
-                    subject=metadata['subject'],
-                    grade_level=metadata['grade_level'],
-                    topic=metadata['topic'],
-                    content=metadata['content'],
-                    content_hash=metadata['content_hash'],
-                    file_path=metadata['file_path'],
-                    word_count=metadata['word_count'],
-                )
+                new_content = EducationalContent(**{**metadata, 'content': None})
 
                 db.add(new_content)
+                await db.flush()
+                await content_store.write_bodies(db, {new_content.id: metadata['content']})
                 await db.commit()
+                self.invalidate_stats()
                 await db.refresh(new_content)
                 return new_content
 
@@ -142,38 +216,160 @@ class ContentManager:
             await db.rollback()
             return None
 
+    def _upsert_statement(self, dialect_name: str):
+        """INSERT ... ON CONFLICT (file_path) DO UPDATE for the session's dialect"""
+        dialect_insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+        statement = dialect_insert(EducationalContent)
+        return statement.on_conflict_do_update(
+            index_elements=[EducationalContent.file_path],
+            set_={column: statement.excluded[column] for column in UPSERT_COLUMNS}
+        )
+
+    async def upsert_documents(self, db: AsyncSession, rows: List[Dict]):
+        """
+        Upsert parsed documents and their compressed bodies in one
+        transaction. The legacy content column is cleared.
+        """
+        upsert = self._upsert_statement(db.get_bind().dialect.name)
+        bodies_by_path = {row['file_path']: row['content'] for row in rows}
+        try:
+            await db.execute(upsert, [{**row, 'content': None} for row in rows])
+            result = await db.execute(
+                select(EducationalContent.id, EducationalContent.file_path)
+                .where(EducationalContent.file_path.in_(list(bodies_by_path)))
+            )
+            await content_store.write_bodies(db, {row.id: bodies_by_path[row.file_path] for row in result.all()})
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        self.invalidate_stats()
+
     async def ingest_all_content(
         self,
         db: AsyncSession,
-        force_update: bool = False
+        force_update: bool = False,
+        workers: Optional[int] = None,
+        chunk_size: int = INGEST_CHUNK_SIZE
     ) -> Dict[str, int]:
-        """Ingest all content files"""
-
+        """
+        Ingest all content files.
+
+        A file whose size and mtime match the manifest from the last run,
+        and which is live in the database, is skipped without being opened.
+        The rest are parsed and hashed on a process pool and compared with
+        the stored hashes, so only new/changed files are written, as batched
+        upserts in one transaction per chunk. Live rows whose file is gone
+        are tombstoned.
+        """
+        start = time.perf_counter()
         files = self.discover_content_files()
         stats = {
             'total': len(files),
             'added': 0,
             'updated': 0,
             'skipped': 0,
+            'deleted': 0,
             'errors': 0
         }
 
-        for file_path in files:
-            result = await self.ingest_content_file(file_path, db, force_update)
+        # Rows from imported corpora have no file on disk and are left alone
+        result = await db.execute(
+            select(EducationalContent.file_path).where(
+                EducationalContent.deleted_at.is_(None),
+                ~EducationalContent.file_path.startswith(f"{CORPUS_PATH_PREFIX}/")
+            )
+        )
+        live_paths = set(result.scalars().all())
 
-            if result:
-                if result.created_at == result.updated_at:
-                    stats['added'] += 1
-                else:
-                    stats['updated'] += 1
+        manifest = {} if force_update else self.load_manifest()
+        new_manifest = {}
+        candidates = []
+        for file_path in files:
+            relative = str(file_path.relative_to(self.content_dir))
+            stat = file_path.stat()
+            entry = manifest.get(relative)
+            if (entry and relative in live_paths
+                    and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns):
+                new_manifest[relative] = entry
+                stats['skipped'] += 1
             else:
-                stats['errors'] += 1
-
-        stats['skipped'] = stats['total'] - stats['added'] - stats['updated'] - stats['errors']
+                candidates.append((file_path, relative, stat))
+
+        parse = partial(parse_content_file, content_dir=self.content_dir)
+        loop = asyncio.get_running_loop()
+
+        if candidates:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                for offset in range(0, len(candidates), chunk_size):
+                    chunk = candidates[offset:offset + chunk_size]
+                    paths = [file_path for file_path, _, _ in chunk]
+                    parsed = await loop.run_in_executor(None, lambda: list(pool.map(parse, paths, chunksize=32)))
+
+                    result = await db.execute(
+                        select(EducationalContent.file_path, EducationalContent.content_hash)
+                        .where(EducationalContent.file_path.in_([relative for _, relative, _ in chunk]))
+                    )
+                    stored_hashes = dict(result.all())
+
+                    now = datetime.utcnow()
+                    rows = []
+                    chunk_manifest = {}
+                    for (_, relative, stat), metadata in zip(chunk, parsed):
+                        if metadata is None:
+                            stats['errors'] += 1
+                            continue
+                        chunk_manifest[relative] = {
+                            'size': stat.st_size,
+                            'mtime_ns': stat.st_mtime_ns,
+                            'hash': metadata['content_hash'],
+                        }
+                        stored_hash = stored_hashes.get(relative)
+                        if stored_hash is None:
+                            stats['added'] += 1
+                        elif stored_hash != metadata['content_hash'] or relative not in live_paths or force_update:
+                            stats['updated'] += 1
+                        else:
+                            stats['skipped'] += 1
+                            continue
+                        rows.append({**metadata, 'deleted_at': None, 'created_at': now, 'updated_at': now})
+
+                    if rows:
+                        await self.upsert_documents(db, rows)
+                    new_manifest.update(chunk_manifest)
+
+        on_disk = set(new_manifest) | {relative for _, relative, _ in candidates}
+        stats['deleted'] = await self.tombstone_files(db, live_paths - on_disk)
+        self.save_manifest(new_manifest)
+
+        elapsed = time.perf_counter() - start
+        stats['elapsed_seconds'] = round(elapsed, 2)
+        stats['files_per_second'] = round(len(files) / elapsed, 1) if elapsed else 0.0
 
         logger.info(f"Content ingestion complete: {stats}")
         return stats
 
+    async def tombstone_files(self, db: AsyncSession, missing_paths) -> int:
+        """Mark the live rows of removed source files (relative paths) as deleted"""
+        missing = sorted(missing_paths)
+        now = datetime.utcnow()
+        tombstoned = 0
+        for offset in range(0, len(missing), INGEST_CHUNK_SIZE):
+            result = await db.execute(
+                update(EducationalContent)
+                .where(
+                    EducationalContent.file_path.in_(missing[offset:offset + INGEST_CHUNK_SIZE]),
+                    EducationalContent.deleted_at.is_(None)
+                )
+                .values(deleted_at=now, updated_at=now)
+            )
+            tombstoned += result.rowcount
+        if missing:
+            await db.commit()
+            self.invalidate_stats()
+            logger.info(f"Tombstoned {tombstoned} content file(s) no longer on disk")
+        return tombstoned
+
     async def search_content(
         self,
         db: AsyncSession,
@@ -181,11 +377,22 @@ class ContentManager:
         subject: str = None,
         grade_level: str = None,
         topic: str = None,
-        limit: int = 10
+        limit: int = 10,
+        grade: Optional[int] = None,
+        language: Optional[str] = None,
+        max_reading_grade: Optional[float] = None,
+        target_reading_grade: Optional[float] = None
     ) -> List[EducationalContent]:
-        """Search educational content with filters"""
+        """
+        Search educational content with filters.
+
+        `grade` keeps documents whose grade range covers it, and
+        `max_reading_grade` caps the precomputed Flesch-Kincaid grade.
+        With `target_reading_grade`, results closest to that reading level
+        come first; unscored documents come last.
+        """
 
-        conditions = []
+        conditions = [EducationalContent.deleted_at.is_(None)]
 
         if subject:
             conditions.append(EducationalContent.subject == subject)
@@ -196,21 +403,42 @@ class ContentManager:
         if topic:
             conditions.append(EducationalContent.topic.ilike(f"%{topic}%"))
 
-        # Only use query filter if no subject/grade filters
-        # Otherwise the subject+grade is enough to find relevant content
-        if query and not (subject or grade_level):
-            conditions.append(
-                EducationalContent.content.ilike(f"%{query}%")
-            )
+        if grade is not None:
+            conditions.append(or_(EducationalContent.grade_min.is_(None), EducationalContent.grade_min <= grade))
+            conditions.append(or_(EducationalContent.grade_max.is_(None), EducationalContent.grade_max >= grade))
 
-        stmt = select(EducationalContent)
+        if language:
+            conditions.append(EducationalContent.language == language)
 
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
+        if max_reading_grade is not None:
+            conditions.append(EducationalContent.reading_grade <= max_reading_grade)
 
-        # If we have subject but no results with filters, try subject only
-        if not conditions and subject:
-            stmt = stmt.where(EducationalContent.subject == subject)
+        # Only use query filter if no subject/grade filters
+        # Otherwise the subject+grade is enough to find relevant content.
+        # Bodies are compressed, so lesson text is matched through the
+        # search_text word list built at ingestion: every query word must
+        # start a word of the lesson
+        if query and not (subject or grade_level):
+            matches = [
+                EducationalContent.title.ilike(f"%{query}%"),
+                EducationalContent.topic.ilike(f"%{query}%"),
+                cast(EducationalContent.keywords, String).ilike(f"%{query.lower()}%")
+            ]
+            terms = search_terms(query).split()
+            if terms:
+                matches.append(and_(*[
+                    EducationalContent.search_text.contains(f" {term}", autoescape=True) for term in terms
+                ]))
+            conditions.append(or_(*matches))
+
+        # Metadata only; bodies are loaded for prompt context via content_store
+        stmt = select(EducationalContent).options(defer(EducationalContent.content)).where(and_(*conditions))
+
+        if target_reading_grade is not None:
+            stmt = stmt.order_by(
+                func.abs(EducationalContent.reading_grade - target_reading_grade).asc().nulls_last(),
+                EducationalContent.id
+            )
 
         stmt = stmt.limit(limit)
 
@@ -222,7 +450,7 @@ class ContentManager:
         db: AsyncSession,
         content_id: int
     ) -> Optional[EducationalContent]:
-        """Get specific content by ID"""
+        """Get specific content by ID (metadata; the body is in content_store)"""
 
         result = await db.execute(
             select(EducationalContent).where(EducationalContent.id == content_id)
@@ -232,7 +460,9 @@ class ContentManager:
     async def get_subjects(self, db: AsyncSession) -> List[str]:
         """Get list of all subjects"""
         result = await db.execute(
-            select(EducationalContent.subject).distinct()
+            select(EducationalContent.subject)
+            .where(EducationalContent.deleted_at.is_(None))
+            .distinct()
         )
         return [row[0] for row in result.all()]
 
@@ -244,37 +474,60 @@ class ContentManager:
         """Get all topics for a subject"""
         result = await db.execute(
             select(EducationalContent.topic)
-            .where(EducationalContent.subject == subject)
+            .where(EducationalContent.subject == subject, EducationalContent.deleted_at.is_(None))
             .distinct()
         )
         return [row[0] for row in result.all()]
 
     async def get_content_stats(self, db: AsyncSession) -> Dict:
-        """Get statistics about content library"""
+        """
+        Get statistics about content library.
+
+        One grouped aggregate query, cached until content is ingested or
+        the TTL runs out (other workers' ingestion is only seen after the TTL).
+        """
+        if self._stats is not None and time.monotonic() < self._stats_expires_at:
+            return self._stats
 
-        # Total content count
-        total_result = await db.execute(
-            select(EducationalContent)
+        result = await db.execute(
+            select(
+                EducationalContent.subject,
+                EducationalContent.grade_level,
+                func.count().label('documents'),
+                func.coalesce(func.sum(EducationalContent.word_count), 0).label('words')
+            )
+            .where(EducationalContent.deleted_at.is_(None))
+            .group_by(EducationalContent.subject, EducationalContent.grade_level)
+            .order_by(EducationalContent.subject, EducationalContent.grade_level)
         )
-        total = len(total_result.scalars().all())
 
-        # By subject
-        subjects = await self.get_subjects(db)
         by_subject = {}
+        by_grade_level = {}
+        total = 0
+        total_words = 0
+        for row in result.all():
+            by_subject[row.subject] = by_subject.get(row.subject, 0) + row.documents
+            by_grade_level.setdefault(row.subject, {})[row.grade_level] = {
+                'documents': row.documents,
+                'words': int(row.words),
+            }
+            total += row.documents
+            total_words += int(row.words)
 
-        for subject in subjects:
-            result = await db.execute(
-                select(EducationalContent)
-                .where(EducationalContent.subject == subject)
-            )
-            by_subject[subject] = len(result.scalars().all())
-
-        return {
+        self._stats = {
             'total_documents': total,
-            'subjects': subjects,
+            'total_words': total_words,
+            'subjects': list(by_subject),
             'by_subject': by_subject,
+            'by_subject_and_grade': by_grade_level,
+            'generated_at': datetime.utcnow().isoformat(),
         }
+        self._stats_expires_at = time.monotonic() + self.stats_ttl_seconds
+        return self._stats
 
 
 # Singleton instance
-content_manager = ContentManager()
+content_manager = ContentManager(
+    stats_ttl_seconds=settings.content_stats_ttl_seconds,
+    manifest_path=settings.content_manifest_path
+)
@@ -0,0 +1,184 @@
+"""
+Content Store
+zstd-compressed storage for educational content bodies. Bodies sit in their
+own table, compressed with a dictionary trained on the library, so listing
+and searching content never reads them; they are decompressed only when a
+prompt's context is built
+"""
+import logging
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+import zstandard
+from sqlalchemy import select, insert, delete, func, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import ContentBody, ContentDictionary, EducationalContent
+from model.content_metadata import search_terms
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_LEVEL = 9
+
+# Dictionary size and the bodies sampled to train it; zstd wants roughly
+# 100x the dictionary size in samples
+DICTIONARY_SIZE = 64 * 1024
+DICTIONARY_SAMPLES = 2000
+
+
+class ContentStore:
+    """
+    Compresses and decompresses content bodies.
+
+    Compressors and decompressors are cached per dictionary id. Bodies keep
+    the id of the dictionary they were written with, so training a new
+    dictionary never invalidates stored rows.
+    """
+
+    def __init__(self, level: int = COMPRESSION_LEVEL):
+        self.level = level
+        self._current: Optional[Tuple[Optional[int], zstandard.ZstdCompressor]] = None
+        self._decompressors: Dict[Optional[int], zstandard.ZstdDecompressor] = {
+            None: zstandard.ZstdDecompressor()
+        }
+
+    async def _compressor(self, db: AsyncSession) -> Tuple[Optional[int], zstandard.ZstdCompressor]:
+        """The newest dictionary's compressor, or a plain one before any is trained"""
+        if self._current is None:
+            result = await db.execute(
+                select(ContentDictionary.id, ContentDictionary.data).order_by(ContentDictionary.id.desc()).limit(1)
+            )
+            row = result.one_or_none()
+            if row is None:
+                self._current = (None, zstandard.ZstdCompressor(level=self.level))
+            else:
+                dictionary = zstandard.ZstdCompressionDict(row.data)
+                self._current = (row.id, zstandard.ZstdCompressor(level=self.level, dict_data=dictionary))
+                self._decompressors[row.id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return self._current
+
+    async def _decompressor(self, db: AsyncSession, dictionary_id: Optional[int]) -> zstandard.ZstdDecompressor:
+        if dictionary_id not in self._decompressors:
+            result = await db.execute(
+                select(ContentDictionary.data).where(ContentDictionary.id == dictionary_id)
+            )
+            dictionary = zstandard.ZstdCompressionDict(result.scalar_one())
+            self._decompressors[dictionary_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return self._decompressors[dictionary_id]
+
+    def reset(self):
+        """Forget the cached current dictionary (after another process trained one)"""
+        self._current = None
+
+    async def write_bodies(self, db: AsyncSession, bodies: Dict[int, str]):
+        """Replace the stored bodies of content ids; the caller commits"""
+        if not bodies:
+            return
+        dictionary_id, compressor = await self._compressor(db)
+        rows = []
+        for content_id, text in bodies.items():
+            raw = text.encode('utf-8')
+            rows.append({
+                'content_id': content_id,
+                'dictionary_id': dictionary_id,
+                'body': compressor.compress(raw),
+                'raw_size': len(raw),
+            })
+        await db.execute(delete(ContentBody).where(ContentBody.content_id.in_(list(bodies))))
+        await db.execute(insert(ContentBody), rows)
+
+    async def load_bodies(self, db: AsyncSession, content_ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Decompressed bodies by content id. Rows written before compression
+        was introduced fall back to the legacy content column.
+        """
+        ids = list(dict.fromkeys(content_ids))
+        if not ids:
+            return {}
+        result = await db.execute(
+            select(EducationalContent.id, EducationalContent.content, ContentBody.dictionary_id, ContentBody.body)
+            .outerjoin(ContentBody, ContentBody.content_id == EducationalContent.id)
+            .where(EducationalContent.id.in_(ids))
+        )
+        bodies = {}
+        for row in result.all():
+            if row.body is None:
+                bodies[row.id] = row.content or ""
+                continue
+            decompressor = await self._decompressor(db, row.dictionary_id)
+            bodies[row.id] = decompressor.decompress(row.body).decode('utf-8')
+        return bodies
+
+    async def train_dictionary(
+        self,
+        db: AsyncSession,
+        samples: int = DICTIONARY_SAMPLES,
+        dict_size: int = DICTIONARY_SIZE
+    ) -> Optional[int]:
+        """
+        Train a dictionary on a random sample of live bodies and make it
+        current. Returns its id, or None when there is too little content.
+        """
+        result = await db.execute(
+            select(EducationalContent.id).where(EducationalContent.deleted_at.is_(None))
+        )
+        ids = result.scalars().all()
+        sample_ids = random.sample(ids, min(samples, len(ids)))
+        texts = [text.encode('utf-8') for text in (await self.load_bodies(db, sample_ids)).values() if text]
+        if len(texts) < 10:
+            logger.warning(f"Only {len(texts)} content bodies; not training a dictionary")
+            return None
+
+        dictionary = zstandard.train_dictionary(dict_size, texts, level=self.level)
+        result = await db.execute(
+            insert(ContentDictionary)
+            .values(data=dictionary.as_bytes(), sample_count=len(texts))
+            .returning(ContentDictionary.id)
+        )
+        dictionary_id = result.scalar_one()
+        await db.commit()
+        self.reset()
+        logger.info(f"Trained content dictionary {dictionary_id} ({len(dictionary.as_bytes())} bytes, {len(texts)} samples)")
+        return dictionary_id
+
+    async def recompress(self, db: AsyncSession, batch_size: int = 500) -> Dict:
+        """
+        Rewrite every body with the current dictionary, moving legacy
+        uncompressed content into the bodies table as it goes and refreshing
+        each document's search_text from its body.
+        """
+        table = EducationalContent.__table__
+        clear_content = (
+            table.update()
+            .where(table.c.id == bindparam('content_id'))
+            .values(content=None, search_text=bindparam('terms'))
+        )
+        stats = {'documents': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(EducationalContent.id)
+                .where(EducationalContent.id > last_id)
+                .order_by(EducationalContent.id)
+                .limit(batch_size)
+            )
+            ids: List[int] = result.scalars().all()
+            if not ids:
+                break
+            bodies = await self.load_bodies(db, ids)
+            await self.write_bodies(db, bodies)
+            await db.execute(clear_content, [
+                {'content_id': content_id, 'terms': search_terms(body)} for content_id, body in bodies.items()
+            ])
+            await db.commit()
+            stats['documents'] += len(ids)
+            last_id = ids[-1]
+
+        sizes = await db.execute(select(
+            func.coalesce(func.sum(ContentBody.raw_size), 0),
+            func.coalesce(func.sum(func.length(ContentBody.body)), 0)
+        ))
+        stats['raw_bytes'], stats['stored_bytes'] = (int(value) for value in sizes.one())
+        return stats
+
+
+# Singleton instance
+content_store = ContentStore()
@@ -0,0 +1,225 @@
+"""
+Content Watcher
+Optional background task that picks up added, changed and removed lesson
+files under the content directory and applies them to the database while the
+app is running
+"""
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Set
+from sqlalchemy import text
+from config import settings
+from database import AsyncSessionLocal, async_engine, IS_SQLITE
+from services.content_manager import content_manager
+
+try:
+    # Ships with uvicorn[standard]; uses inotify on Linux
+    import watchfiles
+except ImportError:
+    watchfiles = None
+
+logger = logging.getLogger(__name__)
+
+# Only one worker process watches; the others wait on this advisory lock
+WATCHER_LOCK_ID = 727_002
+LEADER_RETRY_SECONDS = 30
+
+# Pause before restarting a watch loop that failed
+RESTART_DELAY_SECONDS = 10
+
+
+class ContentWatcher:
+    """
+    Debounces file changes and ingests them one file per transaction.
+
+    Retrieval reads curated content from the database, so a committed file
+    is visible to every worker on its next query; there is no per-worker
+    index to rebuild and no restart is needed.
+    """
+
+    def __init__(self, content_dir: Path, debounce_ms: int = 500, poll_seconds: float = 2.0):
+        self.content_dir = Path(content_dir)
+        self.debounce_ms = debounce_ms
+        self.poll_seconds = poll_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._lock_conn = None
+        self.mode = None
+        self.metrics = {
+            'batches': 0, 'ingested': 0, 'deleted': 0, 'errors': 0, 'restarts': 0,
+            'last_change_at': None, 'last_failure': None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+    async def _become_leader(self) -> bool:
+        """Hold the watcher lock on a dedicated connection; False once stopped"""
+        if IS_SQLITE:
+            return True
+        while not self._stop.is_set():
+            conn = await async_engine.connect()
+            result = await conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": WATCHER_LOCK_ID})
+            if result.scalar():
+                await conn.commit()
+                self._lock_conn = conn
+                return True
+            await conn.close()
+            try:
+                await asyncio.wait_for(self._stop.wait(), LEADER_RETRY_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        return False
+
+    async def _release_leadership(self):
+        if self._lock_conn is not None:
+            try:
+                await self._lock_conn.close()
+            except Exception as e:
+                logger.warning(f"Could not close the content watcher lock connection: {e}")
+            self._lock_conn = None
+
+    async def _run(self):
+        """
+        Watch until stopped. A failed watch loop releases the leader lock,
+        so another worker can take over, and restarts after a pause.
+        """
+        while not self._stop.is_set():
+            try:
+                if not await self._become_leader():
+                    return
+                self.mode = "inotify" if watchfiles else "polling"
+                logger.info(f"Watching {self.content_dir} for content changes ({self.mode})")
+                async for paths in self._changes():
+                    await self._apply(paths)
+                return
+            except Exception as e:
+                self.metrics['restarts'] += 1
+                self.metrics['last_failure'] = f"{datetime.utcnow().isoformat()}: {e}"
+                logger.exception(f"Content watcher failed; restarting in {RESTART_DELAY_SECONDS}s")
+            finally:
+                await self._release_leadership()
+
+            try:
+                await asyncio.wait_for(self._stop.wait(), RESTART_DELAY_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _changes(self) -> AsyncIterator[Set[Path]]:
+        """Debounced sets of changed markdown files"""
+        if watchfiles:
+            async for changes in watchfiles.awatch(
+                self.content_dir,
+                debounce=self.debounce_ms,
+                stop_event=self._stop,
+                watch_filter=lambda change, path: path.endswith(".md")
+            ):
+                yield {Path(path) for _, path in changes}
+        else:
+            async for paths in self._poll():
+                yield paths
+
+    def _snapshot(self) -> Dict[Path, tuple]:
+        snapshot = {}
+        for path in self.content_dir.rglob("*.md"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    async def _poll(self) -> AsyncIterator[Set[Path]]:
+        """Polling fallback: diff directory snapshots every poll_seconds"""
+        previous = await asyncio.to_thread(self._snapshot)
+        while True:
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.poll_seconds)
+                return
+            except asyncio.TimeoutError:
+                pass
+            current = await asyncio.to_thread(self._snapshot)
+            changed = {path for path in previous.keys() | current.keys() if previous.get(path) != current.get(path)}
+            previous = current
+            if changed:
+                yield changed
+
+    async def _apply(self, paths: Set[Path]):
+        """
+        Ingest changed files and tombstone removed ones, then record them in
+        the ingestion manifest so the next full ingestion skips them
+        """
+        self.metrics['batches'] += 1
+        self.metrics['last_change_at'] = datetime.utcnow().isoformat()
+        entries: Dict[str, Optional[Dict]] = {}
+
+        async with AsyncSessionLocal() as db:
+            for path in sorted(paths):
+                relative = str(path.relative_to(self.content_dir))
+                try:
+                    # Stat before parsing: if the file changes again in
+                    # between, the manifest is stale and it is re-read later
+                    stat = path.stat() if path.exists() else None
+                    if stat is not None:
+                        content = await content_manager.ingest_content_file(path, db)
+                        if content:
+                            self.metrics['ingested'] += 1
+                            entries[relative] = {
+                                'size': stat.st_size,
+                                'mtime_ns': stat.st_mtime_ns,
+                                'hash': content.content_hash,
+                            }
+                        else:
+                            self.metrics['errors'] += 1
+                    else:
+                        self.metrics['deleted'] += await content_manager.tombstone_files(db, [relative])
+                        entries[relative] = None
+                except Exception as e:
+                    self.metrics['errors'] += 1
+                    logger.error(f"Failed to reload {path}: {e}")
+                    await db.rollback()
+
+        if entries:
+            try:
+                await asyncio.to_thread(self._update_manifest, entries)
+            except OSError as e:
+                logger.warning(f"Could not update the content manifest: {e}")
+        content_manager.invalidate_stats()
+        logger.info(f"Reloaded {len(paths)} content file(s)")
+
+    def _update_manifest(self, entries: Dict[str, Optional[Dict]]):
+        """Set reloaded files' manifest entries and drop removed ones (blocking)"""
+        manifest = content_manager.load_manifest()
+        for relative, entry in entries.items():
+            if entry is None:
+                manifest.pop(relative, None)
+            else:
+                manifest[relative] = entry
+        content_manager.save_manifest(manifest)
+
+    def get_metrics(self) -> Dict:
+        return {'enabled': self.running, 'mode': self.mode, **self.metrics}
+
+
+# Singleton instance
+content_watcher = ContentWatcher(
+    content_dir=content_manager.content_dir,
+    debounce_ms=settings.content_watch_debounce_ms,
+    poll_seconds=settings.content_watch_poll_seconds
+)
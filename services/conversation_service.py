@@ -1,12 +1,80 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, insert, delete, case, tuple_, func, literal_column
 from models import Conversation, Message, Child
+from config import settings
+from services.history_cache import history_cache
+from services.message_archive import message_archive
 from datetime import datetime
+import base64
+import html
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Keyset pagination directions, relative to the cursor
+OLDER = "older"
+NEWER = "newer"
+
+# Text search configurations by language code; each has a GIN index on
+# to_tsvector('<config>'::regconfig, content), which queries must match
+SEARCH_CONFIGS = {'en': 'english', 'es': 'spanish'}
+
+# ts_headline marks matches with these control characters (stripped from the
+# content first); the snippet is HTML-escaped and then they become <mark> tags
+HEADLINE_START = "\x02"
+HEADLINE_STOP = "\x03"
+SEARCH_HEADLINE_OPTIONS = f"StartSel={HEADLINE_START}, StopSel={HEADLINE_STOP}, MaxFragments=2, MaxWords=20, MinWords=5"
+
+# Conversations deleted per transaction, bounding how long row locks are held
+DELETE_CHUNK_SIZE = 200
+
+
+def _headline_to_html(headline: str) -> str:
+    """Escape a ts_headline snippet and turn its match delimiters into <mark> tags"""
+    return html.escape(headline).replace(HEADLINE_START, "<mark>").replace(HEADLINE_STOP, "</mark>")
+
+
+def _substring_snippet(content: str, terms: List[str], width: int = 120) -> str:
+    """
+    A window of text around the first term, HTML-escaped, with the terms
+    marked like ts_headline. Matches are found on the raw text in one pass,
+    so a term never matches inside a tag or entity the marking produced.
+    """
+    lowered = content.lower()
+    position = min((lowered.find(term.lower()) for term in terms if term.lower() in lowered), default=0)
+    start = max(position - width // 2, 0)
+    snippet = content[start:start + width]
+
+    # Longest terms first, so "fractions" wins over "fraction"
+    pattern = re.compile(
+        "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE
+    )
+    parts, last = [], 0
+    for match in pattern.finditer(snippet):
+        parts.append(html.escape(snippet[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        last = match.end()
+    parts.append(html.escape(snippet[last:]))
+    return "".join(parts)
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Encode a (timestamp, id) keyset position as an opaque cursor"""
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, row_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
 
 class ConversationService:
     def __init__(self, db: AsyncSession):
@@ -29,9 +97,26 @@ class ConversationService:
         self.db.add(conversation)
         await self.db.commit()
         await self.db.refresh(conversation)
+        if settings.history_cache_enabled:
+            history_cache.put(conversation.id, conversation.version, [])
         logger.info(f"Created conversation {conversation.id} for child {child_id}")
         return conversation
 
+    async def child_belongs_to_parent(self, child_id: int, parent_id: int) -> bool:
+        result = await self.db.execute(
+            select(Child.id).where(Child.id == child_id, Child.parent_id == parent_id)
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def conversation_child_id(self, conversation_id: int, parent_id: int) -> Optional[int]:
+        """The child a conversation belongs to, if that child is the parent's"""
+        result = await self.db.execute(
+            select(Conversation.child_id)
+            .join(Child, Child.id == Conversation.child_id)
+            .where(Conversation.id == conversation_id, Child.parent_id == parent_id)
+        )
+        return result.scalar_one_or_none()
+
     async def get_conversation(self, conversation_id: int) -> Optional[Conversation]:
         """Get a conversation by ID"""
         result = await self.db.execute(
@@ -42,18 +127,41 @@ class ConversationService:
     async def get_child_conversations(
         self,
         child_id: int,
-        folder: Optional[str] = None
+        folder: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        direction: str = OLDER
     ) -> List[Conversation]:
-        """Get all conversations for a child, optionally filtered by folder"""
+        """
+        Get a child's conversations, most recently updated first.
+
+        With a cursor, returns the conversations older or newer than it,
+        paging by (updated_at, id) so each page is an index range scan.
+        """
         query = select(Conversation).where(Conversation.child_id == child_id)
 
         if folder:
             query = query.where(Conversation.folder == folder)
 
-        query = query.order_by(Conversation.updated_at.desc())
+        key = tuple_(Conversation.updated_at, Conversation.id)
+        if cursor:
+            position = tuple_(*decode_cursor(cursor))
+            query = query.where(key > position if direction == NEWER else key < position)
+
+        if direction == NEWER:
+            # Walk forward from the cursor, then flip back to newest-first
+            query = query.order_by(Conversation.updated_at.asc(), Conversation.id.asc())
+        else:
+            query = query.order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+
+        if limit:
+            query = query.limit(limit)
 
         result = await self.db.execute(query)
-        return list(result.scalars().all())
+        conversations = list(result.scalars().all())
+        if direction == NEWER:
+            conversations.reverse()
+        return conversations
 
     async def add_message(
         self,
@@ -66,46 +174,353 @@ class ConversationService:
         model_used: Optional[str] = None
     ) -> Message:
         """Add a message to a conversation"""
-        message = Message(
-            conversation_id=conversation_id,
-            role=role,
-            content=content,
-            source_type=source_type,
-            sources=sources,
-            depth_level=depth_level,
-            model_used=model_used
-        )
-        self.db.add(message)
+        messages = await self.add_messages(conversation_id, [{
+            'role': role,
+            'content': content,
+            'source_type': source_type,
+            'sources': sources,
+            'depth_level': depth_level,
+            'model_used': model_used,
+        }])
+        return messages[0]
 
-        # Update conversation metadata
-        conversation = await self.get_conversation(conversation_id)
-        if conversation:
-            conversation.message_count += 1
-            conversation.updated_at = datetime.utcnow()
-            if depth_level > conversation.total_depth_reached:
-                conversation.total_depth_reached = depth_level
+    async def add_messages(
+        self,
+        conversation_id: int,
+        messages: List[Dict]
+    ) -> List[Message]:
+        """Append messages (e.g. a user/assistant pair) in one transaction"""
+        if not messages:
+            return []
 
-        await self.db.commit()
-        await self.db.refresh(message)
+        created = (await self.append_batch([(conversation_id, messages)]))[0]
+        if created is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
+        return created
+
+    async def append_batch(
+        self,
+        entries: List[Tuple[int, List[Dict]]]
+    ) -> List[Optional[List[Message]]]:
+        """
+        Append messages to one or more conversations in one transaction.
+
+        Each conversation's counters are bumped with a single atomic UPDATE,
+        so concurrent appends cannot lose increments, and every message goes
+        in one multi-row INSERT ... RETURNING, so no refresh is needed.
+        Returns the created messages per entry, or None for an entry whose
+        conversation does not exist (nothing is written for it).
+        """
+        now = datetime.utcnow()
+
+        # Aggregate per conversation, updating in id order to avoid deadlocks
+        counters: Dict[int, Tuple[int, int]] = {}
+        for conversation_id, messages in entries:
+            count, max_depth = counters.get(conversation_id, (0, 1))
+            counters[conversation_id] = (
+                count + len(messages),
+                max([max_depth] + [msg.get('depth_level', 1) for msg in messages])
+            )
+
+        try:
+            versions: Dict[int, int] = {}
+            for conversation_id in sorted(counters):
+                count, max_depth = counters[conversation_id]
+                result = await self.db.execute(
+                    update(Conversation)
+                    .where(Conversation.id == conversation_id)
+                    .values(
+                        message_count=Conversation.message_count + count,
+                        updated_at=now,
+                        total_depth_reached=case(
+                            (Conversation.total_depth_reached < max_depth, max_depth),
+                            else_=Conversation.total_depth_reached
+                        ),
+                        version=Conversation.version + 1
+                    )
+                    .returning(Conversation.version)
+                    .execution_options(synchronize_session="fetch")
+                )
+                version = result.scalar_one_or_none()
+                if version is not None:
+                    versions[conversation_id] = version
+
+            rows = [
+                {
+                    'conversation_id': conversation_id,
+                    'role': msg['role'],
+                    'content': msg['content'],
+                    'source_type': msg.get('source_type'),
+                    'sources': msg.get('sources'),
+                    'depth_level': msg.get('depth_level', 1),
+                    'model_used': msg.get('model_used'),
+                    'created_at': msg.get('created_at', now),
+                }
+                for conversation_id, messages in entries
+                if conversation_id in versions
+                for msg in messages
+            ]
+            created = []
+            if rows:
+                result = await self.db.scalars(
+                    insert(Message).returning(Message, sort_by_parameter_order=True),
+                    rows
+                )
+                created = list(result.all())
+
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
 
-        logger.info(f"Added {role} message to conversation {conversation_id}")
-        return message
+        # Split the returned rows back into their entries
+        results: List[Optional[List[Message]]] = []
+        position = 0
+        for conversation_id, messages in entries:
+            if conversation_id not in versions:
+                results.append(None)
+                continue
+            results.append(created[position:position + len(messages)])
+            position += len(messages)
+
+        if settings.history_cache_enabled:
+            self._update_history_cache(entries, results, versions)
+
+        missing = set(counters) - set(versions)
+        if missing:
+            logger.warning(f"Skipped messages for missing conversations: {sorted(missing)}")
+        logger.info(f"Added {len(rows)} message(s) to {len(versions)} conversation(s)")
+        return results
+
+    def _update_history_cache(
+        self,
+        entries: List[Tuple[int, List[Dict]]],
+        results: List[Optional[List[Message]]],
+        versions: Dict[int, int]
+    ):
+        """Push committed messages into the history cache, one append per conversation"""
+        appended: Dict[int, List[Dict]] = {}
+        for (conversation_id, _), created in zip(entries, results):
+            if created:
+                appended.setdefault(conversation_id, []).extend(
+                    {'id': msg.id, 'role': msg.role, 'content': msg.content} for msg in created
+                )
+
+        for conversation_id, messages in appended.items():
+            history_cache.append(conversation_id, versions[conversation_id], messages)
 
     async def get_conversation_messages(
         self,
         conversation_id: int,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        direction: str = OLDER,
+        include_archived: bool = False
     ) -> List[Message]:
-        """Get all messages in a conversation"""
-        query = select(Message).where(
-            Message.conversation_id == conversation_id
-        ).order_by(Message.created_at.asc())
+        """
+        Get messages in a conversation in chronological order.
+
+        With a limit, returns the newest window of messages (or the window
+        just older/newer than the cursor), paging by (created_at, id).
+        With include_archived, a page of older history that runs past the
+        live partitions is filled from the cold-storage archive.
+        """
+        query = select(Message).where(Message.conversation_id == conversation_id)
+
+        key = tuple_(Message.created_at, Message.id)
+        position = decode_cursor(cursor) if cursor else None
+        if position:
+            query = query.where(key > tuple_(*position) if direction == NEWER else key < tuple_(*position))
+
+        if direction == NEWER:
+            query = query.order_by(Message.created_at.asc(), Message.id.asc())
+        else:
+            # Take the window from the newest end, then flip to chronological
+            query = query.order_by(Message.created_at.desc(), Message.id.desc())
 
         if limit:
             query = query.limit(limit)
 
         result = await self.db.execute(query)
-        return list(result.scalars().all())
+        messages = list(result.scalars().all())
+        if direction == NEWER:
+            return messages
+
+        messages.reverse()
+        if include_archived and (not limit or len(messages) < limit):
+            before = (messages[0].created_at, messages[0].id) if messages else position
+            archived = await message_archive.read_conversation(
+                self.db,
+                conversation_id,
+                before=before,
+                limit=limit - len(messages) if limit else None
+            )
+            messages = archived + messages
+        return messages
+
+    async def get_recent_history(self, conversation_id: int, limit: int) -> List[Dict]:
+        """
+        Get the last `limit` messages (role/content) for a prompt.
+
+        Served from the history cache when possible. Unless version checks
+        are disabled, the conversation's version is read by primary key so
+        writes from other workers are never missed.
+        """
+        if not settings.history_cache_enabled or limit > history_cache.messages_per_conversation:
+            messages = await self.get_conversation_messages(conversation_id, limit=limit)
+            return [{'role': msg.role, 'content': msg.content} for msg in messages]
+
+        version = None
+        if settings.history_cache_verify_version:
+            result = await self.db.execute(
+                select(Conversation.version).where(Conversation.id == conversation_id)
+            )
+            version = result.scalar_one_or_none()
+            if version is None:
+                return []
+
+        cached = history_cache.get(conversation_id, version)
+        if cached is None:
+            if version is None:
+                result = await self.db.execute(
+                    select(Conversation.version).where(Conversation.id == conversation_id)
+                )
+                version = result.scalar_one_or_none()
+                if version is None:
+                    return []
+
+            # Read after the version so the entry can only be newer than its tag
+            messages = await self.get_conversation_messages(
+                conversation_id,
+                limit=history_cache.messages_per_conversation
+            )
+            cached = [{'id': msg.id, 'role': msg.role, 'content': msg.content} for msg in messages]
+            history_cache.put(conversation_id, version, cached)
+
+        return [{'role': msg['role'], 'content': msg['content']} for msg in cached[-limit:]]
+
+    async def search_messages(
+        self,
+        child_id: int,
+        query: str,
+        folder: Optional[str] = None,
+        language: Optional[str] = None,
+        limit: int = 20
+    ) -> List[Dict]:
+        """
+        Full-text search over a child's messages, best matches first.
+
+        The child's conversation ids come from the (child_id, ...) index;
+        messages are then matched through the language's GIN index combined
+        with the conversation_id index, so only matching rows are read.
+        Ranking happens before snippets are built, so ts_headline only runs
+        on the returned page. Archived partitions are not searched. Other
+        databases (SQLite) fall back to substring matching.
+        """
+        if language is None:
+            result = await self.db.execute(
+                select(Child.preferred_language).where(Child.id == child_id)
+            )
+            language = result.scalar_one_or_none()
+        config = SEARCH_CONFIGS.get(language, 'english')
+
+        conversations = select(Conversation.id).where(Conversation.child_id == child_id)
+        if folder:
+            conversations = conversations.where(Conversation.folder == folder)
+        conversation_ids = list((await self.db.execute(conversations)).scalars().all())
+        if not conversation_ids:
+            return []
+
+        if self.db.get_bind().dialect.name != "postgresql":
+            return await self._search_messages_substring(conversation_ids, query, limit)
+
+        # A literal (not bound) config, so the expression matches the index
+        # even under a generic prepared plan; config only ever comes from the
+        # SEARCH_CONFIGS whitelist above
+        ts_config = literal_column(f"'{config}'::regconfig")
+        vector = func.to_tsvector(ts_config, Message.content)
+        ts_query = func.websearch_to_tsquery(ts_config, query)
+
+        ranked = (
+            select(
+                Message.id,
+                Message.conversation_id,
+                Message.role,
+                Message.content,
+                Message.created_at,
+                func.ts_rank(vector, ts_query).label('rank')
+            )
+            .where(Message.conversation_id.in_(conversation_ids))
+            .where(vector.op('@@')(ts_query))
+            .order_by(literal_column('rank').desc(), Message.id.desc())
+            .limit(limit)
+            .subquery()
+        )
+
+        result = await self.db.execute(
+            select(
+                ranked.c.id,
+                ranked.c.conversation_id,
+                ranked.c.role,
+                ranked.c.created_at,
+                ranked.c.rank,
+                func.ts_headline(
+                    ts_config,
+                    func.translate(ranked.c.content, HEADLINE_START + HEADLINE_STOP, ''),
+                    ts_query,
+                    SEARCH_HEADLINE_OPTIONS
+                ).label('snippet'),
+                Conversation.title,
+                Conversation.folder
+            )
+            .join(Conversation, Conversation.id == ranked.c.conversation_id)
+            .order_by(ranked.c.rank.desc(), ranked.c.id.desc())
+        )
+
+        return [
+            {
+                'message_id': row.id,
+                'conversation_id': row.conversation_id,
+                'conversation_title': row.title,
+                'folder': row.folder,
+                'role': row.role,
+                'snippet': _headline_to_html(row.snippet),
+                'rank': round(float(row.rank), 4),
+                'created_at': row.created_at,
+            }
+            for row in result.all()
+        ]
+
+    async def _search_messages_substring(self, conversation_ids: List[int], query: str, limit: int) -> List[Dict]:
+        """Search fallback without full-text support: every term must appear, newest first"""
+        terms = query.split()[:5]
+        if not terms:
+            return []
+
+        statement = (
+            select(Message, Conversation.title, Conversation.folder)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(Message.conversation_id.in_(conversation_ids))
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(limit)
+        )
+        for term in terms:
+            statement = statement.where(Message.content.icontains(term, autoescape=True))
+
+        result = await self.db.execute(statement)
+        return [
+            {
+                'message_id': message.id,
+                'conversation_id': message.conversation_id,
+                'conversation_title': title,
+                'folder': folder,
+                'role': message.role,
+                'snippet': _substring_snippet(message.content, terms),
+                'rank': float(sum(message.content.lower().count(term.lower()) for term in terms)),
+                'created_at': message.created_at,
+            }
+            for message, title, folder in result.all()
+        ]
 
     async def update_conversation_title(
         self,
@@ -124,10 +539,62 @@ class ConversationService:
 
     async def delete_conversation(self, conversation_id: int) -> bool:
         """Delete a conversation and all its messages"""
-        conversation = await self.get_conversation(conversation_id)
-        if conversation:
-            await self.db.delete(conversation)
+        return await self.delete_conversations([conversation_id]) > 0
+
+    async def delete_conversations(self, conversation_ids: List[int], chunk_size: int = DELETE_CHUNK_SIZE) -> int:
+        """
+        Delete conversations by id, returning how many existed.
+
+        Each chunk is one set-based DELETE in its own transaction; messages go
+        with it through the foreign key's ON DELETE CASCADE, so no rows are
+        loaded into the session.
+        """
+        ids = sorted(set(conversation_ids))
+        deleted = 0
+        for offset in range(0, len(ids), chunk_size):
+            deleted += await self._delete_chunk(ids[offset:offset + chunk_size])
+        return deleted
+
+    async def delete_child_conversations(self, child_id: int, chunk_size: int = DELETE_CHUNK_SIZE) -> int:
+        """Delete all of a child's conversations, a chunk at a time"""
+        deleted = 0
+        while True:
+            result = await self.db.execute(
+                select(Conversation.id)
+                .where(Conversation.child_id == child_id)
+                .order_by(Conversation.id)
+                .limit(chunk_size)
+            )
+            ids = list(result.scalars().all())
+            if not ids:
+                break
+            deleted += await self._delete_chunk(ids)
+
+        logger.info(f"Deleted {deleted} conversation(s) of child {child_id}")
+        return deleted
+
+    async def _delete_chunk(self, conversation_ids: List[int]) -> int:
+        """
+        Delete one chunk of conversations and their archive catalog rows in
+        one transaction. Archived messages become unreachable at once; the
+        archive job's purge_deleted sweep rewrites the files later.
+        """
+        try:
+            result = await self.db.execute(
+                delete(Conversation)
+                .where(Conversation.id.in_(conversation_ids))
+                .returning(Conversation.id)
+                .execution_options(synchronize_session=False)
+            )
+            removed = list(result.scalars().all())
+            await message_archive.forget_conversations(self.db, removed)
             await self.db.commit()
-            logger.info(f"Deleted conversation {conversation_id}")
-            return True
-        return False
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        for conversation_id in removed:
+            history_cache.invalidate(conversation_id)
+        if removed:
+            logger.info(f"Deleted conversation(s) {removed[0]}..{removed[-1]} ({len(removed)})")
+        return len(removed)
@@ -0,0 +1,180 @@
+"""
+Export Service
+Streams a child's full learning history as NDJSON or CSV, optionally gzipped,
+reading through a server-side cursor so memory stays flat however long the
+history is
+"""
+import csv
+import io
+import json
+import logging
+import zlib
+from contextlib import aclosing
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List
+from sqlalchemy import select
+from database import async_engine, replica_engine, AsyncSessionLocal
+from models import Child, Conversation, Message
+from services.message_archive import message_archive
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+MEDIA_TYPES = {
+    NDJSON: "application/x-ndjson",
+    CSV: "text/csv",
+}
+
+EXPORT_COLUMNS = [
+    'conversation_id', 'conversation_title', 'folder', 'message_id', 'role',
+    'content', 'source_type', 'sources', 'depth_level', 'created_at',
+]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _csv_value(value):
+    """Flatten a column value into a CSV cell"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class ExportService:
+    """Streaming exports of conversation history for parents"""
+
+    def __init__(self, batch_size: int = 1000, compression_level: int = 6):
+        self.batch_size = batch_size
+        self.compression_level = compression_level
+
+    async def child_belongs_to_parent(self, child_id: int, parent_id: int) -> bool:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Child.id).where(Child.id == child_id, Child.parent_id == parent_id)
+            )
+            return result.scalar_one_or_none() is not None
+
+    def filename(self, child_id: int, fmt: str, gzip: bool) -> str:
+        stamp = datetime.utcnow().strftime("%Y%m%d")
+        return f"child-{child_id}-history-{stamp}.{fmt}{'.gz' if gzip else ''}"
+
+    def _query(self, child_id: int):
+        """Messages of every conversation of the child, oldest first"""
+        return (
+            select(
+                Conversation.id.label('conversation_id'),
+                Conversation.title.label('conversation_title'),
+                Conversation.folder,
+                Message.id.label('message_id'),
+                Message.role,
+                Message.content,
+                Message.source_type,
+                Message.sources,
+                Message.depth_level,
+                Message.created_at,
+            )
+            .join(Message, Message.conversation_id == Conversation.id)
+            .where(Conversation.child_id == child_id)
+            .order_by(Message.created_at, Message.id)
+        )
+
+    def _archived_rows(self, conversations: Dict[int, Any], rows: List[dict]) -> List[dict]:
+        """Archive records in the export's row shape"""
+        return [
+            {
+                'conversation_id': row['conversation_id'],
+                'conversation_title': conversations[row['conversation_id']].title,
+                'folder': conversations[row['conversation_id']].folder,
+                'message_id': row['id'],
+                'role': row['role'],
+                'content': row['content'],
+                'source_type': row.get('source_type'),
+                'sources': row.get('sources'),
+                'depth_level': row.get('depth_level'),
+                'created_at': row['created_at'],
+            }
+            for row in rows
+        ]
+
+    async def _batches(self, child_id: int) -> AsyncIterator[List[dict]]:
+        """
+        Row mappings in batches, oldest first: archived messages streamed
+        from the archive files, then live ones fetched through a
+        server-side cursor (on the replica if any).
+
+        Archived partitions all end before the first live one starts, so
+        the two streams concatenate into one (created_at, id) order and
+        neither is ever held in memory whole.
+        """
+        async with (replica_engine or async_engine).connect() as conn:
+            result = await conn.execute(
+                select(Conversation.id, Conversation.title, Conversation.folder)
+                .where(Conversation.child_id == child_id)
+            )
+            conversations = {row.id: row for row in result.all()}
+
+            archived = message_archive.iter_conversations(conn, list(conversations), self.batch_size)
+            async with aclosing(archived) as batches:
+                async for rows in batches:
+                    yield self._archived_rows(conversations, rows)
+
+            result = await conn.stream(
+                self._query(child_id).execution_options(yield_per=self.batch_size)
+            )
+            async for partition in result.mappings().partitions():
+                yield partition
+
+    def _encode_ndjson(self, rows: Iterable[dict]) -> bytes:
+        return "".join(
+            json.dumps(dict(row), ensure_ascii=False, default=_json_default) + "\n"
+            for row in rows
+        ).encode()
+
+    def _encode_csv(self, rows: Iterable[dict], header: bool) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow([_csv_value(row[column]) for column in EXPORT_COLUMNS])
+        return buffer.getvalue().encode()
+
+    async def stream_history(self, child_id: int, fmt: str = NDJSON, gzip: bool = True) -> AsyncIterator[bytes]:
+        """
+        Yield the export body chunk by chunk.
+
+        Each batch is encoded and, when gzipping, sync-flushed through one
+        compressor, so every chunk is decodable as it arrives and the
+        concatenation is a single valid gzip stream.
+        """
+        compressor = zlib.compressobj(self.compression_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzip else None
+        rows_written = 0
+
+        if fmt == CSV:
+            chunk = self._encode_csv([], header=True)
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else chunk
+
+        async for batch in self._batches(child_id):
+            chunk = self._encode_csv(batch, header=False) if fmt == CSV else self._encode_ndjson(batch)
+            rows_written += len(batch)
+            if compressor:
+                chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if chunk:
+                yield chunk
+
+        if compressor:
+            yield compressor.flush()
+
+        logger.info(f"Exported {rows_written} messages for child {child_id} as {fmt}")
+
+
+# Singleton instance
+export_service = ExportService()
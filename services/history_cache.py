@@ -0,0 +1,131 @@
+"""
+Conversation History Cache
+Keeps the most recent messages of active conversations in memory so prompt
+history can be assembled without reloading it from the database
+"""
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message bookkeeping cost on top of the content itself
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+class HistoryCache:
+    """
+    Per-conversation ring buffers of recent messages, evicted LRU under a
+    total memory cap.
+
+    Every entry is tagged with the conversation's `version` column, which is
+    bumped on each append. A reader holding the current database version can
+    tell whether another worker has written to the conversation since the
+    entry was filled.
+    """
+
+    def __init__(self, messages_per_conversation: int = 20, max_bytes: int = 32 * 1024 * 1024):
+        self.messages_per_conversation = messages_per_conversation
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _message_size(self, message: Dict) -> int:
+        return len(message['content']) + MESSAGE_OVERHEAD_BYTES
+
+    def get(self, conversation_id: int, version: Optional[int] = None) -> Optional[List[Dict]]:
+        """
+        Return the cached recent messages, oldest first, or None on a miss.
+
+        When `version` is given, an entry tagged with any other version is
+        treated as stale and dropped.
+        """
+        entry = self.entries.get(conversation_id)
+
+        if entry is not None and version is not None and entry['version'] != version:
+            self.invalidate(conversation_id)
+            entry = None
+
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+
+        self.entries.move_to_end(conversation_id)
+        self.stats['hits'] += 1
+        return list(entry['messages'])
+
+    def put(self, conversation_id: int, version: int, messages: List[Dict]):
+        """Replace a conversation's entry with its newest messages"""
+        self.invalidate(conversation_id, count=False)
+
+        buffer = deque(messages[-self.messages_per_conversation:], maxlen=self.messages_per_conversation)
+        size = sum(self._message_size(message) for message in buffer)
+
+        self.entries[conversation_id] = {'version': version, 'messages': buffer, 'size': size}
+        self.total_bytes += size
+        self._evict()
+
+    def append(self, conversation_id: int, version: int, messages: List[Dict]):
+        """
+        Add newly written messages to a cached conversation.
+
+        `version` is the value the append's UPDATE returned. Unless the entry
+        is exactly one version behind, some write was missed, so the entry is
+        dropped rather than patched.
+        """
+        entry = self.entries.get(conversation_id)
+        if entry is None:
+            return
+
+        if entry['version'] != version - 1:
+            self.invalidate(conversation_id)
+            return
+
+        buffer = entry['messages']
+        for message in messages:
+            if len(buffer) == buffer.maxlen:
+                removed = self._message_size(buffer[0])
+                entry['size'] -= removed
+                self.total_bytes -= removed
+            buffer.append(message)
+            added = self._message_size(message)
+            entry['size'] += added
+            self.total_bytes += added
+
+        entry['version'] = version
+        self.entries.move_to_end(conversation_id)
+        self._evict()
+
+    def invalidate(self, conversation_id: int, count: bool = True):
+        """Drop a conversation's entry if present"""
+        entry = self.entries.pop(conversation_id, None)
+        if entry is not None:
+            self.total_bytes -= entry['size']
+            if count:
+                self.stats['invalidations'] += 1
+
+    def _evict(self):
+        """Evict least recently used entries until under the memory cap"""
+        while self.total_bytes > self.max_bytes and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry['size']
+            self.stats['evictions'] += 1
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_ratio': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+            'conversations': len(self.entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+
+# Singleton instance
+history_cache = HistoryCache(
+    messages_per_conversation=settings.history_cache_messages,
+    max_bytes=settings.history_cache_max_bytes
+)
@@ -0,0 +1,420 @@
+"""
+Message Archive Service
+Maintains monthly partitions of the messages table and moves partitions past
+the retention window into compressed cold storage (zstd NDJSON files), with
+read-through and rehydration
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+from collections import deque
+from contextlib import aclosing
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import zstandard
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from config import settings
+from models import Conversation, Message, MessageArchive, MessageArchiveConversation
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PATTERN = re.compile(r"^messages_y(\d{4})m(\d{2})$")
+
+# Archived rows decompressed, filtered or inserted at a time
+READ_BATCH_SIZE = 5000
+
+MESSAGE_COLUMNS = [
+    'id', 'conversation_id', 'role', 'content', 'source_type',
+    'sources', 'depth_level', 'model_used', 'created_at',
+]
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the month containing `value`"""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Shift a month start by a number of months"""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"messages_y{start.year:04d}m{start.month:02d}"
+
+
+def partition_range(name: str) -> Optional[Tuple[datetime, datetime]]:
+    """The [start, end) range of a monthly partition, from its name"""
+    match = PARTITION_PATTERN.match(name)
+    if not match:
+        return None
+    start = datetime(int(match.group(1)), int(match.group(2)), 1)
+    return start, add_months(start, 1)
+
+
+async def create_month_partition(conn: AsyncConnection, start: datetime, parent: str = "messages"):
+    """Create the monthly partition starting at `start` if it does not exist"""
+    start = month_start(start)
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {parent} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')"
+    ))
+
+
+def _serialize(row: Dict) -> bytes:
+    record = dict(row)
+    record['created_at'] = record['created_at'].isoformat()
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode()
+
+
+def _deserialize(line: str) -> Dict:
+    record = json.loads(line)
+    record['created_at'] = datetime.fromisoformat(record['created_at'])
+    return record
+
+
+class MessageArchiveService:
+    """Partition maintenance, archival and read-through for old messages"""
+
+    def __init__(self, archive_dir: str = "data/message_archive", retention_months: int = 12):
+        self.archive_dir = Path(archive_dir)
+        self.retention_months = retention_months
+
+    async def ensure_partitions(self, conn: AsyncConnection, months_ahead: int = 2):
+        """Create partitions for the current month and the next few"""
+        current = month_start(datetime.utcnow())
+        for offset in range(months_ahead + 1):
+            await create_month_partition(conn, add_months(current, offset))
+
+    async def list_partitions(self, conn: AsyncConnection) -> List[str]:
+        """Names of the monthly partitions currently attached to messages"""
+        result = await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'messages'"
+        ))
+        return sorted(row[0] for row in result if PARTITION_PATTERN.match(row[0]))
+
+    def expired_partitions(self, partitions: List[str], now: Optional[datetime] = None) -> List[str]:
+        """Partitions that end before the retention window starts"""
+        cutoff = add_months(month_start(now or datetime.utcnow()), -self.retention_months)
+        return [name for name in partitions if partition_range(name)[1] <= cutoff]
+
+    def archive_path(self, name: str) -> Path:
+        return self.archive_dir / f"{name}.ndjson.zst"
+
+    async def archive_partition(self, engine, name: str) -> int:
+        """
+        Copy a partition to a compressed NDJSON file, then drop it.
+
+        The file is written and fsynced under a temporary name first. The
+        catalog rows, DETACH and DROP then commit together, so a crash never
+        leaves rows both live and archived.
+        """
+        start, end = partition_range(name)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        path = self.archive_path(name)
+        tmp_path = path.with_suffix(".tmp")
+
+        row_count = 0
+        compressor = zstandard.ZstdCompressor(level=10)
+        async with engine.connect() as conn:
+            with open(tmp_path, "wb") as raw:
+                writer = compressor.stream_writer(raw, closefd=False)
+                result = await conn.stream(
+                    text(f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM {name} ORDER BY created_at, id")
+                    .execution_options(yield_per=5000)
+                )
+                async for row in result.mappings():
+                    writer.write(_serialize(row))
+                    row_count += 1
+                writer.close()
+                raw.flush()
+                os.fsync(raw.fileno())
+            await conn.rollback()
+
+        os.replace(tmp_path, path)
+
+        async with engine.begin() as conn:
+            result = await conn.execute(text(f"SELECT count(*) FROM {name}"))
+            if result.scalar_one() != row_count:
+                raise RuntimeError(f"Partition {name} changed while archiving; aborting")
+
+            await conn.execute(insert(MessageArchive).values(
+                partition_name=name,
+                range_start=start,
+                range_end=end,
+                path=str(path),
+                row_count=row_count,
+                archived_at=datetime.utcnow()
+            ))
+            await conn.execute(text(
+                "INSERT INTO message_archive_conversations "
+                "(partition_name, conversation_id, message_count, first_created_at, last_created_at) "
+                "SELECT :name, conversation_id, count(*), min(created_at), max(created_at) "
+                f"FROM {name} GROUP BY conversation_id"
+            ), {"name": name})
+            await conn.execute(text(f"ALTER TABLE messages DETACH PARTITION {name}"))
+            await conn.execute(text(f"DROP TABLE {name}"))
+
+        logger.info(f"Archived {row_count} messages from {name} to {path}")
+        return row_count
+
+    async def archive_expired(self, engine, dry_run: bool = False) -> Dict[str, int]:
+        """Archive every partition older than the retention window"""
+        async with engine.connect() as conn:
+            expired = self.expired_partitions(await self.list_partitions(conn))
+
+        archived = {}
+        for name in expired:
+            if dry_run:
+                logger.info(f"Would archive {name}")
+                continue
+            archived[name] = await self.archive_partition(engine, name)
+        return archived
+
+    def _read_rows(self, path: str) -> Iterator[Dict]:
+        """Decompress and parse an archive file a row at a time (blocking)"""
+        with open(path, "rb") as raw:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                if line.strip():
+                    yield _deserialize(line)
+
+    async def iter_rows(self, path: str, batch_size: int = READ_BATCH_SIZE) -> AsyncIterator[List[Dict]]:
+        """An archive file's rows in batches, decompressed off the event loop"""
+        rows = self._read_rows(path)
+        try:
+            while True:
+                batch = await asyncio.to_thread(lambda: list(islice(rows, batch_size)))
+                if not batch:
+                    break
+                yield batch
+        finally:
+            rows.close()
+
+    def _read_conversation_rows(
+        self,
+        path: str,
+        conversation_id: int,
+        before: Optional[Tuple[datetime, int]],
+        limit: Optional[int]
+    ) -> List[Dict]:
+        """
+        The newest `limit` rows of one conversation older than `before` in
+        an archive file (blocking). Files are in (created_at, id) order, so
+        reading stops at `before` and only `limit` rows are held.
+        """
+        matches = deque(maxlen=limit)
+        rows = self._read_rows(path)
+        try:
+            for row in rows:
+                if before is not None and (row['created_at'], row['id']) >= before:
+                    break
+                if row['conversation_id'] == conversation_id:
+                    matches.append(row)
+        finally:
+            rows.close()
+        return list(matches)
+
+    def _rewrite_keeping(self, path: str, conversation_ids: set) -> int:
+        """
+        Rewrite an archive file with only the given conversations' rows
+        (blocking). Written and fsynced under a temporary name, then swapped
+        in; returns the rows kept.
+        """
+        kept = 0
+        tmp_path = Path(path).with_suffix(".tmp")
+        with open(tmp_path, "wb") as raw:
+            writer = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+            for row in self._read_rows(path):
+                if row['conversation_id'] in conversation_ids:
+                    writer.write(_serialize(row))
+                    kept += 1
+            writer.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+        return kept
+
+    async def forget_conversations(self, db: AsyncSession, conversation_ids: List[int]):
+        """
+        Drop deleted conversations from the archive catalog, making their
+        archived messages unreachable. The files are left alone for
+        purge_deleted to rewrite; the caller commits.
+        """
+        if conversation_ids:
+            await db.execute(
+                delete(MessageArchiveConversation)
+                .where(MessageArchiveConversation.conversation_id.in_(conversation_ids))
+            )
+
+    async def purge_deleted(self, db: AsyncSession) -> int:
+        """
+        Rewrite archive files still holding messages of deleted
+        conversations. Catalog rows of conversations that no longer exist
+        are dropped first; a file then needs rewriting when its row_count
+        exceeds the messages its catalog rows account for. Each archive row
+        is locked while its file is rewritten, so purges and rehydration do
+        not interleave. Returns the number of files rewritten.
+        """
+        try:
+            await db.execute(
+                delete(MessageArchiveConversation)
+                .where(~select(Conversation.id).where(
+                    Conversation.id == MessageArchiveConversation.conversation_id
+                ).exists())
+            )
+            await db.commit()
+
+            cataloged = (
+                select(func.coalesce(func.sum(MessageArchiveConversation.message_count), 0))
+                .where(MessageArchiveConversation.partition_name == MessageArchive.partition_name)
+                .scalar_subquery()
+            )
+            result = await db.execute(select(MessageArchive.partition_name).where(MessageArchive.row_count > cataloged))
+            names = list(result.scalars().all())
+
+            for name in names:
+                result = await db.execute(
+                    select(MessageArchive.path).where(MessageArchive.partition_name == name).with_for_update()
+                )
+                path = result.scalar_one_or_none()
+                if path is None:
+                    await db.rollback()
+                    continue
+                result = await db.execute(
+                    select(MessageArchiveConversation.conversation_id)
+                    .where(MessageArchiveConversation.partition_name == name)
+                )
+                kept = await asyncio.to_thread(self._rewrite_keeping, path, set(result.scalars().all()))
+                await db.execute(
+                    update(MessageArchive).where(MessageArchive.partition_name == name).values(row_count=kept)
+                )
+                await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+        if names:
+            logger.info(f"Purged deleted conversations from {len(names)} archive file(s)")
+        return len(names)
+
+    async def rehydrate_partition(self, engine, name: str) -> int:
+        """
+        Load an archived partition back into the messages table a batch at
+        a time, skipping rows of conversations deleted since it was archived
+        """
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                select(MessageArchive).where(MessageArchive.partition_name == name)
+            )
+            archive = result.one_or_none()
+            if archive is None:
+                raise ValueError(f"Partition {name} is not archived")
+
+            await create_month_partition(conn, archive.range_start)
+            existing: Dict[int, bool] = {}
+            loaded = orphaned = 0
+            async with aclosing(self.iter_rows(archive.path)) as batches:
+                async for batch in batches:
+                    unknown = list({row['conversation_id'] for row in batch} - existing.keys())
+                    if unknown:
+                        result = await conn.execute(select(Conversation.id).where(Conversation.id.in_(unknown)))
+                        found = set(result.scalars().all())
+                        existing.update((conversation_id, conversation_id in found) for conversation_id in unknown)
+                    rows = [row for row in batch if existing[row['conversation_id']]]
+                    orphaned += len(batch) - len(rows)
+                    if rows:
+                        await conn.execute(insert(Message), rows)
+                        loaded += len(rows)
+            if orphaned:
+                logger.warning(f"Skipped {orphaned} archived message(s) of deleted conversations in {name}")
+
+            await conn.execute(delete(MessageArchive).where(MessageArchive.partition_name == name))
+
+        logger.info(f"Rehydrated {loaded} messages into {name}")
+        return loaded
+
+    async def read_conversation(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        before: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[Message]:
+        """
+        Read archived messages of a conversation, chronological.
+
+        Returns the newest `limit` archived messages older than `before`,
+        opening only the archive files the catalog lists for the
+        conversation, newest first.
+        """
+        query = (
+            select(MessageArchive.path, MessageArchiveConversation.first_created_at)
+            .join(MessageArchiveConversation,
+                  MessageArchiveConversation.partition_name == MessageArchive.partition_name)
+            .where(MessageArchiveConversation.conversation_id == conversation_id)
+            .order_by(MessageArchive.range_start.desc())
+        )
+        if before:
+            query = query.where(MessageArchiveConversation.first_created_at < before[0])
+
+        result = await db.execute(query)
+        collected: List[Dict] = []
+
+        for path, _ in result.all():
+            wanted = limit - len(collected) if limit else None
+            matches = await asyncio.to_thread(self._read_conversation_rows, path, conversation_id, before, wanted)
+            collected = matches + collected
+            if limit and len(collected) >= limit:
+                break
+
+        if limit:
+            collected = collected[-limit:]
+        return [Message(**row) for row in collected]
+
+    async def iter_conversations(
+        self,
+        db,
+        conversation_ids: List[int],
+        batch_size: int = READ_BATCH_SIZE
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Archived message rows of several conversations in batches, in
+        (created_at, id) order. Each archive file holding any of them is
+        streamed once, oldest first. `db` is a session or connection.
+        """
+        if not conversation_ids:
+            return
+        result = await db.execute(
+            select(MessageArchive.path)
+            .join(MessageArchiveConversation,
+                  MessageArchiveConversation.partition_name == MessageArchive.partition_name)
+            .where(MessageArchiveConversation.conversation_id.in_(conversation_ids))
+            .group_by(MessageArchive.path, MessageArchive.range_start)
+            .order_by(MessageArchive.range_start)
+        )
+
+        wanted = set(conversation_ids)
+        for (path,) in result.all():
+            async with aclosing(self.iter_rows(path, batch_size)) as batches:
+                async for batch in batches:
+                    rows = [row for row in batch if row['conversation_id'] in wanted]
+                    if rows:
+                        yield rows
+
+
+# Singleton instance
+message_archive = MessageArchiveService(
+    archive_dir=settings.message_archive_dir,
+    retention_months=settings.message_retention_months
+)
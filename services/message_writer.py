@@ -0,0 +1,276 @@
+"""
+Write-Behind Message Writer
+Buffers chat messages in a bounded in-process queue and persists them in
+batches, so a chat turn does not wait on its own commit
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import settings
+from database import AsyncSessionLocal
+from services.conversation_service import ConversationService
+
+logger = logging.getLogger(__name__)
+
+# Durability modes
+ACK_ON_ENQUEUE = "enqueue"  # return as soon as the messages are queued
+ACK_ON_FLUSH = "flush"      # return once the batch holding them is committed
+
+# Delay before the first retry of a failed flush, doubled on each further attempt
+RETRY_BACKOFF_SECONDS = 0.1
+
+# Queued by stop() so the flush loop finishes its batch and exits
+_STOP = object()
+
+
+class MessageWriter:
+    """Batches message appends from many chat turns into few transactions"""
+
+    def __init__(
+        self,
+        max_queue_size: int = 1000,
+        batch_size: int = 100,
+        flush_interval_ms: int = 50,
+        ack: str = ACK_ON_FLUSH,
+        max_retries: int = 3,
+        dead_letter_path: Optional[str] = None
+    ):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.ack = ack
+        self.max_retries = max_retries
+        self.dead_letter_path = Path(dead_letter_path) if dead_letter_path else None
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            'enqueued': 0,
+            'flushed': 0,
+            'failed': 0,
+            'retries': 0,
+            'failed_flushes': 0,
+            'dead_lettered': 0,
+            'flushes': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the background flush task (call from the running event loop)"""
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Message writer started (batch {self.batch_size}, "
+            f"interval {self.flush_interval * 1000:.0f}ms, ack on {self.ack})"
+        )
+
+    async def stop(self):
+        """Flush everything still queued, then stop the background task"""
+        if not self.running:
+            return
+        await self.queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info("Message writer stopped and flushed")
+
+    async def submit(self, conversation_id: int, messages: List[Dict]) -> Optional[List]:
+        """
+        Queue messages for a conversation.
+
+        Blocks while the queue is full. With ack on flush, waits for the
+        commit and returns the created messages; with ack on enqueue,
+        returns None straight away.
+        """
+        now = datetime.utcnow()
+        stamped = [{**msg, 'created_at': msg.get('created_at', now)} for msg in messages]
+
+        future = asyncio.get_running_loop().create_future() if self.ack == ACK_ON_FLUSH else None
+        await self.queue.put((conversation_id, stamped, future))
+        self.metrics['enqueued'] += len(stamped)
+
+        if future is None:
+            return None
+
+        created = await future
+        if created is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
+        return created
+
+    def _drain(self, limit: int) -> List:
+        """Take up to `limit` queued entries without waiting"""
+        batch = []
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        """Flush when a batch fills up or the interval elapses, whichever first"""
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await self.queue.get()
+            stopping = entry is _STOP
+            batch = [] if stopping else [entry]
+            deadline = loop.time() + self.flush_interval
+
+            while not stopping and len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                else:
+                    batch.append(entry)
+
+            await self._flush_safely(batch)
+
+            if stopping:
+                while not self.queue.empty():
+                    await self._flush_safely([e for e in self._drain(self.batch_size) if e is not _STOP])
+                return
+
+    async def _flush_safely(self, batch: List):
+        """
+        Flush a batch; an unexpected error fails the batch's waiters rather
+        than ending the loop and leaving every later submit hanging
+        """
+        try:
+            await self._flush(batch)
+        except Exception as e:
+            logger.exception(f"Message writer flush of {len(batch)} append(s) failed unexpectedly")
+            for _, _, future in batch:
+                if future and not future.done():
+                    future.set_exception(e)
+
+    async def _flush(self, batch: List):
+        """Write a batch in one transaction and resolve its waiters"""
+        if not batch:
+            return
+
+        message_count = sum(len(messages) for _, messages, _ in batch)
+        start = time.perf_counter()
+
+        # append_batch is one transaction, so a failed attempt wrote nothing
+        # and the whole batch can be retried
+        attempt = 0
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    results = await ConversationService(db).append_batch(
+                        [(conversation_id, messages) for conversation_id, messages, _ in batch]
+                    )
+                break
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    self._fail(batch, message_count, e)
+                    return
+                self.metrics['retries'] += 1
+                logger.warning(
+                    f"Message writer flush of {message_count} message(s) failed "
+                    f"(attempt {attempt}/{self.max_retries + 1}): {e}"
+                )
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.metrics['flushes'] += 1
+        self.metrics['flushed'] += message_count
+        self.metrics['last_flush_ms'] = round(elapsed_ms, 2)
+        self.metrics['max_flush_ms'] = round(max(self.metrics['max_flush_ms'], elapsed_ms), 2)
+        self.metrics['total_flush_ms'] += elapsed_ms
+
+        for (_, _, future), created in zip(batch, results):
+            if future and not future.done():
+                future.set_result(created)
+
+    def _fail(self, batch: List, message_count: int, error: Exception):
+        """
+        Give up on a batch. Waiters get the error; entries already
+        acknowledged on enqueue have no one to tell, so they are spilled to
+        the dead-letter file for replay instead of being dropped.
+        """
+        self.metrics['failed'] += message_count
+        self.metrics['failed_flushes'] += 1
+        logger.error(f"Message writer gave up on {message_count} message(s): {error}")
+
+        orphaned = []
+        for conversation_id, messages, future in batch:
+            if future is None:
+                orphaned.append((conversation_id, messages))
+            elif not future.done():
+                future.set_exception(error)
+        if orphaned:
+            self._dead_letter(orphaned)
+
+    def _dead_letter(self, entries: List):
+        if self.dead_letter_path is None:
+            logger.error(f"No dead-letter file configured; {len(entries)} acknowledged append(s) lost")
+            return
+        # Serialized up front and one entry at a time, so a bad value loses
+        # only its own entry and never leaves half a line behind
+        lines, written = [], 0
+        for conversation_id, messages in entries:
+            try:
+                lines.append(json.dumps(
+                    {'conversation_id': conversation_id, 'messages': messages},
+                    default=lambda value: value.isoformat()
+                ) + "\n")
+                written += len(messages)
+            except (TypeError, ValueError, AttributeError) as e:
+                logger.error(f"Could not serialize an append to conversation {conversation_id}; lost: {e}")
+        if not lines:
+            return
+        try:
+            self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.dead_letter_path, "a") as f:
+                f.write("".join(lines))
+        except OSError as e:
+            logger.error(f"Could not write dead-letter file {self.dead_letter_path}: {e}")
+            return
+        self.metrics['dead_lettered'] += written
+        logger.error(f"Spilled {len(lines)} acknowledged append(s) to {self.dead_letter_path}")
+
+    def get_metrics(self) -> Dict:
+        """Queue depth and flush latency figures"""
+        flushes = self.metrics['flushes']
+        return {
+            'enabled': self.running,
+            'ack': self.ack,
+            'queue_depth': self.queue.qsize() if self.queue else 0,
+            'queue_capacity': self.max_queue_size,
+            'enqueued': self.metrics['enqueued'],
+            'flushed': self.metrics['flushed'],
+            'failed': self.metrics['failed'],
+            'retries': self.metrics['retries'],
+            'failed_flushes': self.metrics['failed_flushes'],
+            'dead_lettered': self.metrics['dead_lettered'],
+            'flushes': flushes,
+            'last_flush_ms': self.metrics['last_flush_ms'],
+            'max_flush_ms': self.metrics['max_flush_ms'],
+            'avg_flush_ms': round(self.metrics['total_flush_ms'] / flushes, 2) if flushes else 0.0,
+        }
+
+
+# Singleton instance
+message_writer = MessageWriter(
+    max_queue_size=settings.message_queue_size,
+    batch_size=settings.message_flush_batch_size,
+    flush_interval_ms=settings.message_flush_interval_ms,
+    ack=settings.message_write_ack,
+    max_retries=settings.message_flush_retries,
+    dead_letter_path=settings.message_dead_letter_path
+)
@@ -0,0 +1,229 @@
+"""
+Model Routing
+Chooses the model tier and output cap for a question from a routing table
+"""
+import json
+import logging
+import re
+from typing import Dict, List, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Rules are checked in order and the first match wins. A rule matches when
+# every condition it lists matches; conditions it leaves out match anything.
+#   depths, grade_bands, question_types: lists of allowed values
+#   has_curated_content: True/False
+DEFAULT_ROUTING_TABLE = [
+    {
+        'name': 'simple_definition',
+        'depths': [1],
+        'grade_bands': ['elementary'],
+        'question_types': ['definition'],
+        'tier': 'fast',
+        'max_tokens': 500,
+    },
+    {
+        'name': 'curated_intro',
+        'depths': [1],
+        'question_types': ['definition', 'general'],
+        'has_curated_content': True,
+        'tier': 'fast',
+        'max_tokens': 700,
+    },
+    {
+        'name': 'intro',
+        'depths': [1],
+        'tier': 'standard',
+        'max_tokens': 1000,
+    },
+    {
+        'name': 'deeper',
+        'depths': [2],
+        'tier': 'standard',
+        'max_tokens': 1500,
+    },
+    {
+        'name': 'default',
+        'tier': 'standard',
+        'max_tokens': 2000,
+    },
+]
+
+QUESTION_TYPES = {'definition', 'explanation', 'general'}
+
+# Condition keys and the type of each allowed value
+RULE_CONDITIONS = {'depths': int, 'grade_bands': str, 'question_types': str}
+RULE_KEYS = {'name', 'tier', 'max_tokens', 'has_curated_content', *RULE_CONDITIONS}
+
+
+def validate_routing_table(table, tiers) -> List[Dict]:
+    """
+    Check a routing table's shape and value types, raising ValueError with
+    the offending rule, so a bad table is rejected when it is loaded rather
+    than when a question first hits it.
+    """
+    if not isinstance(table, list) or not table:
+        raise ValueError("routing table must be a non-empty list")
+
+    for index, rule in enumerate(table):
+        where = f"rule {index}"
+        if not isinstance(rule, dict):
+            raise ValueError(f"{where} must be an object")
+        where = f"rule {index} ({rule.get('name', 'unnamed')})"
+
+        unknown = set(rule) - RULE_KEYS
+        if unknown:
+            raise ValueError(f"{where} has unknown keys {sorted(unknown)}")
+
+        for key, value_type in RULE_CONDITIONS.items():
+            if key not in rule:
+                continue
+            values = rule[key]
+            if not isinstance(values, list) or not all(
+                isinstance(value, value_type) and not isinstance(value, bool) for value in values
+            ):
+                raise ValueError(f"{where}: {key} must be a list of {value_type.__name__}")
+
+        unknown_types = set(rule.get('question_types', [])) - QUESTION_TYPES
+        if unknown_types:
+            raise ValueError(f"{where}: unknown question_types {sorted(unknown_types)}")
+
+        if 'has_curated_content' in rule and not isinstance(rule['has_curated_content'], bool):
+            raise ValueError(f"{where}: has_curated_content must be true or false")
+
+        if rule.get('tier', 'standard') not in tiers:
+            raise ValueError(f"{where}: tier must be one of {sorted(tiers)}")
+
+        max_tokens = rule.get('max_tokens', 2000)
+        if not isinstance(max_tokens, int) or isinstance(max_tokens, bool) or max_tokens <= 0:
+            raise ValueError(f"{where}: max_tokens must be a positive integer")
+
+    return table
+
+
+DEFINITION_PATTERN = re.compile(
+    r"^\s*(what\s+(is|are|was|were)\b|what\s+does\b.*\bmean|define\b|meaning\s+of\b|"
+    r"¿?\s*qu[eé]\s+(es|son|significa)\b)"
+)
+EXPLANATION_PATTERN = re.compile(
+    r"\b(why|how|explain|compare|difference|por\s+qu[eé]|c[oó]mo|explica)\b"
+)
+
+
+def classify_question(question: str) -> str:
+    """Classify a question as 'definition', 'explanation' or 'general'"""
+    question_lower = question.lower()
+
+    if DEFINITION_PATTERN.search(question_lower) and len(question_lower.split()) <= 12:
+        return 'definition'
+
+    if EXPLANATION_PATTERN.search(question_lower):
+        return 'explanation'
+
+    return 'general'
+
+
+class ModelRouter:
+    """Routes each question to a model tier using a configurable table"""
+
+    def __init__(self, routing_table: Optional[List[Dict]] = None):
+        self.tiers = {
+            'fast': settings.fast_model,
+            'standard': settings.standard_model,
+        }
+        # An explicitly passed table must be valid; see _load_routing_table for config
+        self.routing_table = (
+            validate_routing_table(routing_table, self.tiers) if routing_table is not None
+            else self._load_routing_table()
+        )
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def _load_routing_table(self) -> List[Dict]:
+        """
+        Read and validate the routing table from settings at startup. An
+        invalid table is logged and the default used, so a config typo
+        cannot take chat down.
+        """
+        if not settings.routing_table:
+            return DEFAULT_ROUTING_TABLE
+
+        try:
+            return validate_routing_table(json.loads(settings.routing_table), self.tiers)
+        except ValueError as e:
+            logger.error(f"Invalid MODEL_ROUTING_TABLE, using default: {e}")
+            return DEFAULT_ROUTING_TABLE
+
+    def _matches(self, rule: Dict, features: Dict) -> bool:
+        """Check whether a rule's conditions all hold for the features"""
+        for key, feature in (
+            ('depths', 'depth'),
+            ('grade_bands', 'grade_band'),
+            ('question_types', 'question_type'),
+        ):
+            if key in rule and features[feature] not in rule[key]:
+                return False
+
+        if 'has_curated_content' in rule and rule['has_curated_content'] != features['has_curated_content']:
+            return False
+
+        return True
+
+    def route(
+        self,
+        question: str,
+        current_depth: int,
+        grade_band: str,
+        has_curated_content: bool
+    ) -> Dict:
+        """Pick the model and max_tokens for a question"""
+        features = {
+            'depth': current_depth,
+            'grade_band': grade_band,
+            'question_type': classify_question(question),
+            'has_curated_content': has_curated_content,
+        }
+
+        rule = next(
+            (rule for rule in self.routing_table if self._matches(rule, features)),
+            DEFAULT_ROUTING_TABLE[-1]
+        )
+        tier = rule.get('tier', 'standard')
+
+        return {
+            'rule': rule.get('name', 'unnamed'),
+            'tier': tier,
+            'model': self.tiers.get(tier, self.tiers['standard']),
+            'max_tokens': rule.get('max_tokens', 2000),
+            **features,
+        }
+
+    def record(self, decision: Dict, latency_ms: float, output_tokens: int):
+        """Log a routing decision with its observed latency"""
+        rule_stats = self.stats.setdefault(
+            decision['rule'],
+            {'count': 0, 'total_latency_ms': 0.0, 'total_output_tokens': 0}
+        )
+        rule_stats['count'] += 1
+        rule_stats['total_latency_ms'] += latency_ms
+        rule_stats['total_output_tokens'] += output_tokens
+
+        logger.info(
+            f"Model route - rule: {decision['rule']}, model: {decision['model']}, "
+            f"max_tokens: {decision['max_tokens']}, depth: {decision['depth']}, "
+            f"grade: {decision['grade_band']}, type: {decision['question_type']}, "
+            f"curated: {decision['has_curated_content']}, latency_ms: {latency_ms:.0f}, "
+            f"output_tokens: {output_tokens}"
+        )
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-rule request count, average latency and average output size"""
+        return {
+            rule: {
+                'count': values['count'],
+                'avg_latency_ms': round(values['total_latency_ms'] / values['count'], 1),
+                'avg_output_tokens': round(values['total_output_tokens'] / values['count'], 1),
+            }
+            for rule, values in self.stats.items()
+        }
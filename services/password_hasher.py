@@ -0,0 +1,154 @@
+"""
+Password Hasher
+Runs bcrypt hashing and verification for parent passwords and child PINs in a
+dedicated, size-limited process pool, so a burst of logins cannot starve the
+request threadpool or block the event loop
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+import bcrypt
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# bcrypt only uses the first 72 bytes of a secret
+MAX_SECRET_BYTES = 72
+
+
+def _encode(secret: str) -> bytes:
+    return secret.encode()[:MAX_SECRET_BYTES]
+
+
+def _hash(secret: str, rounds: int) -> str:
+    """Hash a secret (runs in a worker process)"""
+    return bcrypt.hashpw(_encode(secret), bcrypt.gensalt(rounds)).decode()
+
+
+def _verify(secret: str, hashed: str) -> bool:
+    """Check a secret against a hash (runs in a worker process)"""
+    try:
+        return bcrypt.checkpw(_encode(secret), hashed.encode())
+    except ValueError:
+        return False
+
+
+def hash_rounds(hashed: str) -> Optional[int]:
+    """The cost factor of a bcrypt hash such as $2b$12$..., or None if unparseable"""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """
+    bcrypt on a process pool, with at most `workers` jobs in flight.
+
+    Callers beyond that wait on a semaphore in the event loop; the time spent
+    there is reported as queue wait.
+    """
+
+    def __init__(self, workers: int = 2, rounds: int = 12):
+        self.workers = workers
+        self.rounds = rounds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.metrics = {
+            'hashes': 0,
+            'verifications': 0,
+            'rehashes': 0,
+            'waiting': 0,
+            'jobs': 0,
+            'total_queue_wait_ms': 0.0,
+            'max_queue_wait_ms': 0.0,
+        }
+
+    def start(self):
+        """Create the worker pool (idempotent)"""
+        if self._executor is not None:
+            return
+        # spawn, not fork: forking a process running an event loop is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"Password hasher started ({self.workers} workers, cost {self.rounds})")
+
+    def stop(self):
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        logger.info("Password hasher stopped")
+
+    async def _run(self, fn, *args):
+        self.start()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        queued = time.perf_counter()
+        self.metrics['waiting'] += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.metrics['waiting'] -= 1
+
+        try:
+            wait_ms = (time.perf_counter() - queued) * 1000
+            self.metrics['jobs'] += 1
+            self.metrics['total_queue_wait_ms'] += wait_ms
+            self.metrics['max_queue_wait_ms'] = round(max(self.metrics['max_queue_wait_ms'], wait_ms), 2)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._semaphore.release()
+
+    async def hash(self, secret: str) -> str:
+        """Hash a password or PIN at the configured cost"""
+        self.metrics['hashes'] += 1
+        return await self._run(_hash, secret, self.rounds)
+
+    async def verify(self, secret: str, hashed: str) -> bool:
+        self.metrics['verifications'] += 1
+        return await self._run(_verify, secret, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True if the hash was made at a cost other than the configured one"""
+        return hash_rounds(hashed) != self.rounds
+
+    async def verify_and_update(self, secret: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a secret and, if the stored hash uses an outdated cost,
+        return a fresh hash for the caller to store.
+
+        Returns (valid, new_hash); new_hash is None when no update is needed.
+        """
+        if not await self.verify(secret, hashed):
+            return False, None
+        if not self.needs_rehash(hashed):
+            return True, None
+        self.metrics['rehashes'] += 1
+        return True, await self.hash(secret)
+
+    def get_metrics(self) -> Dict:
+        jobs = self.metrics['jobs']
+        return {
+            'workers': self.workers,
+            'rounds': self.rounds,
+            'hashes': self.metrics['hashes'],
+            'verifications': self.metrics['verifications'],
+            'rehashes': self.metrics['rehashes'],
+            'waiting': self.metrics['waiting'],
+            'avg_queue_wait_ms': round(self.metrics['total_queue_wait_ms'] / jobs, 2) if jobs else 0.0,
+            'max_queue_wait_ms': self.metrics['max_queue_wait_ms'],
+        }
+
+
+# Singleton instance
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    rounds=settings.bcrypt_rounds
+)
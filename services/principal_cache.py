@@ -0,0 +1,77 @@
+"""
+Principal Cache
+Short-lived in-process cache of authenticated principals, so resolving a
+bearer token does not cost a database round trip on every request
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PrincipalCache:
+    """
+    Principals keyed by parent id (the access token's subject), each tagged
+    with the token version it was loaded for.
+
+    A parent's token_version is bumped when they are deactivated or change
+    credentials. The worker that makes the change drops the entry at once;
+    other workers stop serving it within the TTL.
+    """
+
+    def __init__(self, ttl_seconds: float = 30, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidations': 0}
+
+    def get(self, subject: int, version: int) -> Optional[Dict]:
+        """The cached principal for a token, or None on a miss"""
+        entry = self.entries.get(subject)
+
+        if entry is not None and (entry['version'] != version or entry['expires_at'] <= time.monotonic()):
+            self.entries.pop(subject)
+            self.stats['expired'] += 1
+            entry = None
+
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+
+        self.entries.move_to_end(subject)
+        self.stats['hits'] += 1
+        return entry['principal']
+
+    def put(self, subject: int, version: int, principal: Dict):
+        self.entries[subject] = {
+            'version': version,
+            'principal': principal,
+            'expires_at': time.monotonic() + self.ttl_seconds,
+        }
+        self.entries.move_to_end(subject)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, subject: int):
+        """Drop a subject's entry, e.g. after deactivation or a password change"""
+        if self.entries.pop(subject, None) is not None:
+            self.stats['invalidations'] += 1
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_ratio': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+            'entries': len(self.entries),
+            'ttl_seconds': self.ttl_seconds,
+        }
+
+
+# Singleton instance
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+    max_entries=settings.principal_cache_max_entries
+)
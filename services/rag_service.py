@@ -2,20 +2,55 @@
 Enhanced RAG Service with Educational Content Integration
 """
 import logging
+import time
 from typing import List, Dict, Optional
 from anthropic import Anthropic
 from sqlalchemy.ext.asyncio import AsyncSession
 from config import settings
 from services.content_manager import content_manager
+from services.content_store import content_store
+from services.model_router import ModelRouter
 
 logger = logging.getLogger(__name__)
 
+# Map grade levels to content grade categories
+GRADE_LEVEL_CATEGORIES = {
+    'kindergarten': 'elementary',
+    '1st grade': 'elementary',
+    '2nd grade': 'elementary',
+    '3rd grade': 'elementary',
+    '4th grade': 'elementary',
+    '5th grade': 'elementary',
+    '6th grade': 'middle',
+    '7th grade': 'middle',
+    '8th grade': 'middle',
+    '9th grade': 'high',
+    '10th grade': 'high',
+    '11th grade': 'high',
+    '12th grade': 'high',
+}
+
+
+def get_grade_category(grade_level: Optional[str]) -> str:
+    """Map a child's grade level to elementary/middle/high"""
+    return GRADE_LEVEL_CATEGORIES.get(grade_level, 'elementary')
+
+
+def get_grade_number(grade_level: Optional[str]) -> Optional[int]:
+    """A child's grade level as a number (kindergarten is 0), if known"""
+    if grade_level not in GRADE_LEVEL_CATEGORIES:
+        return None
+    if grade_level == 'kindergarten':
+        return 0
+    return int(''.join(filter(str.isdigit, grade_level)))
+
 
 class RAGService:
     """Enhanced RAG service with educational content"""
 
     def __init__(self):
         self.client = Anthropic(api_key=settings.anthropic_api_key)
+        self.router = ModelRouter()
 
     async def search_relevant_content(
         self,
@@ -44,24 +79,8 @@ class RAGService:
                 detected_subject = subject
                 break
 
-        # Map grade levels
-        grade_mapping = {
-            'kindergarten': 'elementary',
-            '1st grade': 'elementary',
-            '2nd grade': 'elementary',
-            '3rd grade': 'elementary',
-            '4th grade': 'elementary',
-            '5th grade': 'elementary',
-            '6th grade': 'middle',
-            '7th grade': 'middle',
-            '8th grade': 'middle',
-            '9th grade': 'high',
-            '10th grade': 'high',
-            '11th grade': 'high',
-            '12th grade': 'high',
-        }
-
-        grade_level_category = grade_mapping.get(child_grade_level, 'elementary')
+        grade_level_category = get_grade_category(child_grade_level)
+        grade_number = get_grade_number(child_grade_level)
 
         # Log search parameters
         logger.info(f"RAG Search - Query: '{query}', Subject: {detected_subject}, Grade: {grade_level_category}")
@@ -72,7 +91,9 @@ class RAGService:
             query=query,
             subject=detected_subject,
             grade_level=grade_level_category,
-            limit=limit
+            limit=limit,
+            # Prefer texts written at the child's own reading level
+            target_reading_grade=grade_number
         )
 
         # Format results
@@ -84,7 +105,7 @@ class RAGService:
                 'subject': content.subject,
                 'grade_level': content.grade_level,
                 'topic': content.topic,
-                'content': content.content,
+                'reading_grade': content.reading_grade,
                 'relevance': 'high' if detected_subject == content.subject else 'medium'
             })
 
@@ -93,9 +114,10 @@ class RAGService:
     def build_context_from_content(
         self,
         search_results: List[Dict],
+        bodies: Dict[int, str],
         max_tokens: int = 3000
     ) -> str:
-        """Build context string from search results"""
+        """Build context string from search results and their decompressed bodies"""
 
         if not search_results:
             return ""
@@ -104,7 +126,7 @@ class RAGService:
         current_tokens = 0
 
         for i, result in enumerate(search_results, 1):
-            content_preview = result['content'][:1500]  # Limit each piece
+            content_preview = bodies.get(result['id'], '')[:1500]  # Limit each piece
 
             section = f"\n--- Source {i}: {result['title']} ({result['subject']} - {result['grade_level']}) ---\n{content_preview}\n"
 
@@ -125,20 +147,23 @@ class RAGService:
         question: str,
         child_profile: Dict,
         conversation_history: List[Dict] = None,
-        current_depth: int = 1
+        current_depth: int = 1,
+        search_results: Optional[List[Dict]] = None
     ) -> Dict:
         """Generate response using RAG with educational content"""
 
-        # Search for relevant content
-        search_results = await self.search_relevant_content(
-            db=db,
-            query=question,
-            child_grade_level=child_profile.get('grade_level'),
-            limit=3
-        )
+        # Search for relevant content unless the caller already retrieved it
+        if search_results is None:
+            search_results = await self.search_relevant_content(
+                db=db,
+                query=question,
+                child_grade_level=child_profile.get('grade_level'),
+                limit=3
+            )
 
-        # Build context from search results
-        context = self.build_context_from_content(search_results)
+        # Build context from search results; bodies are only decompressed here
+        bodies = await content_store.load_bodies(db, [result['id'] for result in search_results])
+        context = self.build_context_from_content(search_results, bodies)
 
         # Determine if we have curated content
         has_curated_content = len(search_results) > 0
@@ -173,15 +198,29 @@ class RAGService:
             "content": user_message
         })
 
+        # Pick model tier and output cap for this question
+        route = self.router.route(
+            question=question,
+            current_depth=current_depth,
+            grade_band=get_grade_category(child_profile.get('grade_level')),
+            has_curated_content=has_curated_content
+        )
+
         try:
             # Call Claude API
+            start = time.perf_counter()
             response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=2000,
+                model=route['model'],
+                max_tokens=route['max_tokens'],
                 temperature=0.7,
                 system=system_prompt,
                 messages=messages
             )
+            self.router.record(
+                route,
+                latency_ms=(time.perf_counter() - start) * 1000,
+                output_tokens=response.usage.output_tokens
+            )
 
             answer_text = response.content[0].text
 
@@ -199,7 +238,8 @@ class RAGService:
                 'source_label': source_label,
                 'has_curated_content': has_curated_content,
                 'sources': search_results,
-                'model_used': 'claude-sonnet-4-20250514',
+                'model_used': route['model'],
+                'route': route['rule'],
                 'tokens_used': response.usage.input_tokens + response.usage.output_tokens
             }
 
@@ -0,0 +1,74 @@
+"""
+Child Safety Filter
+Keyword and pattern checks applied to student questions and AI answers
+"""
+import re
+import logging
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ChildSafetyFilter:
+    """Multi-layer content safety system for child interactions"""
+
+    def __init__(self):
+        # Strict input filtering - what users can ask
+        self.blocked_input_keywords = [
+            "sexual", "porn", "nude", "sex",
+            "drug", "alcohol", "cigarette", "tobacco",
+            "suicide", "self-harm", "cutting",
+            "hate speech", "racist",
+        ]
+
+        # More lenient output filtering - allows educational content
+        self.blocked_output_keywords = [
+            "pornography", "sexual content", "explicit",
+            "how to make drugs", "how to hurt",
+        ]
+
+        self.warning_patterns = [
+            re.compile(r'\b(how to make|build a)\s+(bomb|weapon)'),
+            re.compile(r'\b(buy|purchase)\s+(drugs|alcohol)'),
+            re.compile(r'\bhurt\s+(myself|yourself|someone)'),
+        ]
+
+        self.distress_keywords = ["hurt myself", "kill myself", "suicide"]
+
+    def check_input_safety(self, user_input: str) -> Tuple[bool, str]:
+        """Check if user input is safe - STRICT filtering"""
+        user_input_lower = user_input.lower()
+
+        for keyword in self.blocked_input_keywords:
+            if keyword in user_input_lower:
+                return False, f"inappropriate_content:{keyword}"
+
+        for pattern in self.warning_patterns:
+            if pattern.search(user_input_lower):
+                return False, "suspicious_pattern"
+
+        return True, "safe"
+
+    def unsafe_input_response(self, message: str) -> Dict:
+        """Build the reply shown to a child whose question was blocked"""
+        needs_intervention = any(kw in message.lower() for kw in self.distress_keywords)
+
+        if needs_intervention:
+            return {
+                'text': """I'm worried about you. Please talk to a trusted adult right away.
+
+National Suicide Prevention Lifeline: 988
+Crisis Text Line: Text HOME to 741741
+
+You matter.""",
+                'needs_intervention': True,
+            }
+
+        return {
+            'text': "I can't help with that topic, but I'd love to help you learn! What are you studying?",
+            'needs_intervention': False,
+        }
+
+
+# Singleton instance
+safety_filter = ChildSafetyFilter()
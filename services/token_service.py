@@ -0,0 +1,159 @@
+"""
+Token Service
+Short-lived access tokens plus rotating refresh tokens with reuse
+detection. Access tokens carry the parent's token_version, which auth checks
+against the (briefly cached) parent row, so revocation applies at once.
+"""
+import hashlib
+import logging
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from jose import JWTError, jwt
+from sqlalchemy import select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+from models import Parent, RefreshToken
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+ACCESS_TOKEN_TYPE = "access"
+
+
+def _digest(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+class TokenService:
+    """Issues, verifies and rotates parent tokens"""
+
+    def __init__(self, secret_key: str, access_minutes: int = 15, refresh_days: int = 7):
+        self.secret_key = secret_key
+        self.access_ttl = timedelta(minutes=access_minutes)
+        self.refresh_ttl = timedelta(days=refresh_days)
+
+    def create_access_token(self, parent_id: int, token_version: int) -> str:
+        now = datetime.utcnow()
+        return jwt.encode(
+            {
+                "sub": str(parent_id), "ver": token_version, "typ": ACCESS_TOKEN_TYPE,
+                "iat": now, "exp": now + self.access_ttl,
+            },
+            self.secret_key,
+            algorithm=ALGORITHM
+        )
+
+    def decode_access_token(self, token: str) -> Optional[Tuple[int, int]]:
+        """The (parent id, token version) of a valid, unexpired access token, else None"""
+        try:
+            payload = jwt.decode(token, self.secret_key, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        if payload.get("typ") != ACCESS_TOKEN_TYPE:
+            return None
+        return int(payload["sub"]), payload.get("ver", 0)
+
+    async def issue_refresh_token(self, db: AsyncSession, parent_id: int, family_id: Optional[str] = None) -> str:
+        """Store a new refresh token and return it; the caller commits"""
+        refresh_token = secrets.token_urlsafe(32)
+        await db.execute(insert(RefreshToken).values(
+            parent_id=parent_id,
+            token_hash=_digest(refresh_token),
+            family_id=family_id or uuid.uuid4().hex,
+            expires_at=datetime.utcnow() + self.refresh_ttl
+        ))
+        return refresh_token
+
+    async def issue_tokens(
+        self,
+        db: AsyncSession,
+        parent_id: int,
+        token_version: int,
+        family_id: Optional[str] = None
+    ) -> Dict:
+        """An access/refresh pair, committed"""
+        refresh_token = await self.issue_refresh_token(db, parent_id, family_id)
+        await db.commit()
+        return {
+            "access_token": self.create_access_token(parent_id, token_version),
+            "refresh_token": refresh_token,
+            "token_type": "bearer",
+            "expires_in": int(self.access_ttl.total_seconds()),
+        }
+
+    async def rotate(self, db: AsyncSession, refresh_token: str) -> Optional[Tuple[int, Dict]]:
+        """
+        Exchange a refresh token for a new pair, or return None.
+
+        A token that was already rotated being presented again means it
+        leaked; the whole family is revoked, logging out both the thief and
+        the legitimate client.
+        """
+        now = datetime.utcnow()
+        result = await db.execute(
+            select(RefreshToken)
+            .where(RefreshToken.token_hash == _digest(refresh_token))
+            .with_for_update()
+        )
+        stored = result.scalar_one_or_none()
+        if stored is None or stored.revoked_at is not None:
+            await db.rollback()
+            return None
+
+        if stored.used_at is not None:
+            logger.warning(f"Refresh token reuse for parent {stored.parent_id}; revoking family {stored.family_id}")
+            await self.revoke_family(db, stored.family_id)
+            return None
+
+        if stored.expires_at <= now:
+            await db.rollback()
+            return None
+
+        result = await db.execute(
+            select(Parent.is_active, Parent.token_version).where(Parent.id == stored.parent_id)
+        )
+        parent = result.one_or_none()
+        if parent is None or not parent.is_active:
+            await self.revoke_family(db, stored.family_id)
+            return None
+
+        stored.used_at = now
+        return stored.parent_id, await self.issue_tokens(db, stored.parent_id, parent.token_version, stored.family_id)
+
+    async def revoke_family(self, db: AsyncSession, family_id: str):
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+        )
+        await db.commit()
+
+    async def revoke(self, db: AsyncSession, refresh_token: str) -> bool:
+        """Log out: revoke the family a refresh token belongs to"""
+        result = await db.execute(
+            select(RefreshToken.family_id).where(RefreshToken.token_hash == _digest(refresh_token))
+        )
+        family_id = result.scalar_one_or_none()
+        if family_id is None:
+            return False
+        await self.revoke_family(db, family_id)
+        return True
+
+    async def revoke_all(self, db: AsyncSession, parent_id: int):
+        """Revoke every refresh token of a parent, e.g. after a password change"""
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.parent_id == parent_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+        )
+        await db.commit()
+
+
+# Singleton instance
+token_service = TokenService(
+    secret_key=settings.secret_key,
+    access_minutes=settings.access_token_expire_minutes,
+    refresh_days=settings.refresh_token_expire_days
+)
@@ -0,0 +1,85 @@
+"""
+Test the concurrent pre-LLM chat stages: ownership checks in the profile
+stage and cancellation when a stage fails
+Runs against an in-memory SQLite database
+"""
+import asyncio
+from unittest import mock
+from sqlalchemy import insert
+from database import create_sqlite_database
+from models import Parent, Child, Conversation
+from services.chat_pipeline import ChatPipeline
+
+
+async def test_profile_stage_checks_ownership():
+    engine, Session = await create_sqlite_database()
+    try:
+        async with Session() as db:
+            parent_a, parent_b = [
+                (await db.execute(
+                    insert(Parent).values(email=email, full_name="P", hashed_password="x").returning(Parent.id)
+                )).scalar_one()
+                for email in ("a@test.com", "b@test.com")
+            ]
+            child_a, child_b = [
+                (await db.execute(
+                    insert(Child).values(
+                        parent_id=parent_id, first_name="Kid", date_of_birth="2015-01-01",
+                        grade_level="3rd grade", hashed_pin="x"
+                    ).returning(Child.id)
+                )).scalar_one()
+                for parent_id in (parent_a, parent_b)
+            ]
+            conversation_a, conversation_b = [
+                (await db.execute(
+                    insert(Conversation).values(child_id=child_id, title="Chat", version=0).returning(Conversation.id)
+                )).scalar_one()
+                for child_id in (child_a, child_b)
+            ]
+            await db.commit()
+
+        pipeline = ChatPipeline()
+        with mock.patch("services.chat_pipeline.AsyncSessionLocal", Session):
+            profile = await pipeline.load_child_profile(child_a, parent_a)
+            assert (profile['id'], profile['owns_conversation']) == (child_a, True)
+            assert (await pipeline.load_child_profile(child_a, parent_a, conversation_a))['owns_conversation'] is True
+            assert (await pipeline.load_child_profile(child_a, parent_a, conversation_b))['owns_conversation'] is False
+            assert await pipeline.load_child_profile(child_b, parent_a) is None
+            assert await pipeline.load_child_profile(child_b, parent_a, conversation_b) is None
+    finally:
+        await engine.dispose()
+
+
+async def test_failed_stage_cancels_the_others():
+    cancelled = []
+
+    class Pipeline(ChatPipeline):
+        async def load_child_profile(self, child_id, parent_id=None, conversation_id=None):
+            return {'id': child_id, 'grade_level': "3rd grade", 'owns_conversation': True}
+
+        async def load_history(self, conversation_id):
+            await asyncio.sleep(0)
+            raise ConnectionError("database unavailable")
+
+        async def retrieve_content(self, question, child_profile_task):
+            await child_profile_task
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append('retrieval')
+                raise
+
+        async def check_safety(self, question):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append('safety')
+                raise
+
+    try:
+        await Pipeline().prepare_turn(1, "What is a fraction?", conversation_id=2, parent_id=3)
+        assert False, "prepare_turn should raise"
+    except ConnectionError:
+        pass
+    # Both were cancelled and had finished unwinding before the error surfaced
+    assert sorted(cancelled) == ['retrieval', 'safety']
@@ -0,0 +1,122 @@
+"""
+Test content ingestion bookkeeping: the change manifest, tombstones and
+the library statistics cache
+Runs against an in-memory SQLite database
+"""
+import tempfile
+from pathlib import Path
+from unittest import mock
+from sqlalchemy import select
+from database import create_sqlite_database
+from models import EducationalContent
+from services.content_manager import ContentManager
+from services.content_store import content_store
+
+
+def write_lesson(content_dir: Path, name: str, text: str) -> Path:
+    path = content_dir / "math" / "elementary" / f"{name}.md"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"# {name.title()}\n\n{text}\n", encoding="utf-8")
+    return path
+
+
+async def test_writes_invalidate_cached_stats():
+    engine, Session = await create_sqlite_database()
+    content_store.reset()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            content_dir = Path(tmp) / "content"
+            manager = ContentManager(content_dir=str(content_dir), manifest_path=str(Path(tmp) / "manifest.json"))
+            async with Session() as db:
+                assert (await manager.get_content_stats(db))['total_documents'] == 0
+
+                # Ingest
+                fractions = write_lesson(content_dir, "fractions", "Halves and quarters.")
+                await manager.ingest_content_file(fractions, db)
+                stats = await manager.get_content_stats(db)
+                assert (stats['total_documents'], stats['total_words']) == (1, 5)
+
+                # Served from the cache until something is written
+                assert await manager.get_content_stats(db) is stats
+
+                # Update
+                write_lesson(content_dir, "fractions", "Halves, thirds and quarters of a whole.")
+                await manager.ingest_content_file(fractions, db)
+                stats = await manager.get_content_stats(db)
+                assert (stats['total_documents'], stats['total_words']) == (1, 9)
+
+                # Bulk upsert
+                decimals = write_lesson(content_dir, "decimals", "Tenths.")
+                await manager.upsert_documents(db, [manager.parse_content_file(decimals)])
+                assert (await manager.get_content_stats(db))['total_documents'] == 2
+
+                # Delete
+                assert await manager.tombstone_files(db, ["math/elementary/fractions.md"]) == 1
+                stats = await manager.get_content_stats(db)
+                assert (stats['total_documents'], stats['total_words']) == (1, 3)
+
+                # Ingesting an unchanged file writes nothing and keeps the cache
+                await manager.ingest_content_file(decimals, db)
+                assert await manager.get_content_stats(db) is stats
+    finally:
+        await engine.dispose()
+
+
+async def test_stats_expire_after_ttl():
+    engine, Session = await create_sqlite_database()
+    try:
+        manager = ContentManager(stats_ttl_seconds=0)
+        async with Session() as db:
+            first = await manager.get_content_stats(db)
+            assert await manager.get_content_stats(db) is not first
+    finally:
+        await engine.dispose()
+
+
+async def test_manifest_skips_updates_tombstones_and_restores():
+    engine, Session = await create_sqlite_database()
+    content_store.reset()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            content_dir = Path(tmp) / "content"
+            manager = ContentManager(content_dir=str(content_dir), manifest_path=str(Path(tmp) / "manifest.json"))
+            fractions = write_lesson(content_dir, "fractions", "Halves and quarters.")
+            write_lesson(content_dir, "decimals", "Tenths and hundredths.")
+
+            async def ingest():
+                async with Session() as db:
+                    stats = await manager.ingest_all_content(db, workers=1)
+                    rows = (await db.execute(
+                        select(EducationalContent.file_path, EducationalContent.deleted_at)
+                    )).all()
+                return stats, {path: deleted_at is None for path, deleted_at in rows}
+
+            stats, live = await ingest()
+            assert (stats['added'], stats['skipped']) == (2, 0)
+            assert set(manager.load_manifest()) == {"math/elementary/fractions.md", "math/elementary/decimals.md"}
+
+            # Unchanged files match the manifest and are never parsed
+            with mock.patch("services.content_manager.ProcessPoolExecutor", side_effect=AssertionError):
+                stats, _ = await ingest()
+            assert (stats['added'], stats['updated'], stats['skipped']) == (0, 0, 2)
+
+            # A changed file is re-parsed and updated; the other is still skipped
+            write_lesson(content_dir, "fractions", "Halves, thirds and quarters.")
+            stats, _ = await ingest()
+            assert (stats['updated'], stats['skipped']) == (1, 1)
+            assert manager.load_manifest()["math/elementary/fractions.md"]['size'] == fractions.stat().st_size
+
+            # A removed file is tombstoned and dropped from the manifest
+            fractions.unlink()
+            stats, live = await ingest()
+            assert stats['deleted'] == 1
+            assert live == {"math/elementary/fractions.md": False, "math/elementary/decimals.md": True}
+            assert "math/elementary/fractions.md" not in manager.load_manifest()
+
+            # Restoring the same file brings the row back, even with an unchanged hash
+            write_lesson(content_dir, "fractions", "Halves, thirds and quarters.")
+            stats, live = await ingest()
+            assert (stats['updated'], stats['deleted']) == (1, 0)
+            assert all(live.values())
+    finally:
+        await engine.dispose()
@@ -0,0 +1,84 @@
+"""
+Test frontmatter parsing, grade ranges and readability scoring
+"""
+from model.content_metadata import document_metadata, parse_grade_range, search_terms, split_frontmatter
+from model.readability import count_syllables, readability
+
+
+def test_split_frontmatter():
+    meta, body = split_frontmatter("---\ngrades: 3-5\nkeywords: [Fractions, halves]\n---\n\n# Title\nBody")
+    assert meta == {'grades': "3-5", 'keywords': ["Fractions", "halves"]}
+    assert body == "# Title\nBody"
+
+    # CRLF line endings and frontmatter at end of file
+    meta, body = split_frontmatter("---\r\nlanguage: es\r\n---")
+    assert meta == {'language': "es"} and body == ""
+
+
+def test_invalid_frontmatter_leaves_text_whole():
+    for text in [
+        "# No frontmatter\n---\nnot: meta\n---\n",
+        "---\n- a list\n- not a mapping\n---\nBody",
+        "---\nkey: [unclosed\n---\nBody",
+        "---\nno closing fence\nBody",
+    ]:
+        assert split_frontmatter(text) == ({}, text)
+
+
+def test_parse_grade_range():
+    assert parse_grade_range("3-5") == (3, 5)
+    assert parse_grade_range("K-2") == (0, 2)
+    assert parse_grade_range("k to 2") == (0, 2)
+    assert parse_grade_range("Grades 6–8") == (6, 8)
+    assert parse_grade_range("5-3") == (3, 5)
+    assert parse_grade_range(4) == (4, 4)
+    assert parse_grade_range([3, "5", "K"]) == (0, 5)
+    assert parse_grade_range(None) is None
+    assert parse_grade_range(True) is None
+    assert parse_grade_range("all ages") is None
+
+
+def test_document_metadata_sources_and_fallbacks():
+    meta = {'grade': "K-1", 'lang': "ES", 'standards': "CCSS.1, CCSS.2", 'keywords': ["Suma"]}
+    row = document_metadata(meta, "La suma junta dos números.", "elementary")
+    assert (row['grade_min'], row['grade_max'], row['language']) == (0, 1, "es")
+    assert row['standards'] == ["CCSS.1", "CCSS.2"]
+    assert row['keywords'] == ["suma"]
+
+    # Heading "(Grades 3-5)", then the directory's band
+    assert document_metadata({}, "Text.", "middle", "Ratios (Grades 3-5)")['grade_min'] == 3
+    row = document_metadata({}, "Text.", "middle")
+    assert (row['grade_min'], row['grade_max'], row['language']) == (6, 8, "en")
+    assert document_metadata({}, "Text.", "unknown")['grade_min'] is None
+
+
+def test_search_terms():
+    terms = search_terms("The Denominator and the denominators! Números, ½ and a cat.")
+    assert terms == " denominator denominators números "
+    assert search_terms("a an the") == ""
+
+
+def test_count_syllables():
+    assert count_syllables("cat") == 1
+    assert count_syllables("table") == 2
+    assert count_syllables("make") == 1
+    assert count_syllables("photosynthesis") == 5
+
+
+def test_readability_scores():
+    simple = readability("The cat sat. The dog ran. We like to play.")
+    hard = readability(
+        "Photosynthesis transforms electromagnetic radiation into chemical energy, "
+        "sustaining heterotrophic organisms throughout terrestrial ecosystems."
+    )
+    assert simple['avg_sentence_length'] == 3.33
+    assert simple['reading_grade'] < hard['reading_grade']
+    assert simple['rare_word_ratio'] < hard['rare_word_ratio']
+    assert readability("") == {'reading_grade': 0.0, 'avg_sentence_length': 0.0, 'rare_word_ratio': 0.0}
+
+
+def test_readability_ignores_markdown_and_splits_headings():
+    text = "# Fractions\n\n- Halves\n- Quarters\n\nSee [the chart](http://example.com/chart.png) now.\n```\ncode block here\n```"
+    scores = readability(text)
+    # Heading, two list items and one sentence; link text kept, URL and code dropped
+    assert scores['avg_sentence_length'] == round(7 / 4, 2)
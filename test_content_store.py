@@ -0,0 +1,114 @@
+"""
+Test compressed content bodies: round trips through ingestion, dictionary
+training and recompression, and search over compressed lessons
+Runs against an in-memory SQLite database
+"""
+import tempfile
+from pathlib import Path
+from sqlalchemy import insert, select
+from database import create_sqlite_database
+from models import ContentBody, EducationalContent
+from services.content_manager import content_manager, parse_content_file
+from services.content_store import content_store
+
+LESSON = """---
+grades: 3-5
+keywords: [fractions]
+---
+# Fractions on a Number Line
+
+A fraction names a point between two whole numbers. The denominator says how
+many equal parts each whole is split into; the numerator counts the parts.
+Ünïcode stays intact: ½ and ¾ are fractions too.
+"""
+
+
+def lesson_rows(count: int):
+    """Parsed lessons written under a temporary content directory"""
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = Path(tmp)
+        rows = []
+        for i in range(count):
+            path = content_dir / "math" / "elementary" / f"fractions_{i}.md"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(LESSON.replace("two whole numbers", f"{i} and {i + 1}"), encoding="utf-8")
+            rows.append(parse_content_file(path, content_dir))
+    return rows
+
+
+async def test_bodies_round_trip_compressed():
+    engine, Session = await create_sqlite_database()
+    content_store.reset()
+    try:
+        rows = lesson_rows(3)
+        async with Session() as db:
+            await content_manager.upsert_documents(db, rows)
+            stored = (await db.execute(
+                select(EducationalContent.id, EducationalContent.file_path, EducationalContent.content)
+            )).all()
+            assert all(row.content is None for row in stored)
+
+            bodies = await content_store.load_bodies(db, [row.id for row in stored])
+            expected = {row['file_path']: row['content'] for row in rows}
+            assert {row.id: expected[row.file_path] for row in stored} == bodies
+
+            stored_bodies = (await db.execute(
+                select(ContentBody.content_id, ContentBody.body, ContentBody.raw_size)
+            )).all()
+            assert len(stored_bodies) == 3
+            for content_id, body, raw_size in stored_bodies:
+                assert body[:4] == b"\x28\xb5\x2f\xfd"  # zstd frame magic
+                assert raw_size == len(bodies[content_id].encode('utf-8'))
+    finally:
+        await engine.dispose()
+
+
+async def test_recompress_with_dictionary_keeps_bodies_and_moves_legacy_rows():
+    engine, Session = await create_sqlite_database()
+    content_store.reset()
+    try:
+        rows = lesson_rows(12)
+        async with Session() as db:
+            await content_manager.upsert_documents(db, rows[:11])
+            # A row from before compression: body still in the legacy column
+            legacy = rows[11]
+            await db.execute(insert(EducationalContent).values(**{**legacy, 'search_text': None}))
+            await db.commit()
+
+            dictionary_id = await content_store.train_dictionary(db, dict_size=4096)
+            assert dictionary_id is not None
+            stats = await content_store.recompress(db)
+            assert stats['documents'] == 12
+
+            result = await db.execute(select(EducationalContent.id, EducationalContent.file_path))
+            ids = {row.file_path: row.id for row in result.all()}
+            bodies = await content_store.load_bodies(db, ids.values())
+            assert {path: bodies[content_id] for path, content_id in ids.items()} == {
+                row['file_path']: row['content'] for row in rows
+            }
+
+            dictionaries = (await db.execute(select(ContentBody.dictionary_id).distinct())).scalars().all()
+            assert dictionaries == [dictionary_id]
+            legacy_row = (await db.execute(
+                select(EducationalContent.content, EducationalContent.search_text)
+                .where(EducationalContent.id == ids[legacy['file_path']])
+            )).one()
+            assert legacy_row.content is None
+            assert " denominator " in legacy_row.search_text
+    finally:
+        content_store.reset()
+        await engine.dispose()
+
+
+async def test_search_matches_compressed_lesson_text():
+    engine, Session = await create_sqlite_database()
+    content_store.reset()
+    try:
+        async with Session() as db:
+            await content_manager.upsert_documents(db, lesson_rows(1))
+            # Only in the body, not the title, topic or keywords
+            found = await content_manager.search_content(db, query="what is a denominator")
+            assert [content.title for content in found] == ["Fractions on a Number Line"]
+            assert await content_manager.search_content(db, query="photosynthesis") == []
+    finally:
+        await engine.dispose()
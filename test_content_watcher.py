@@ -0,0 +1,111 @@
+"""
+Test the content watcher in polling mode: added, changed and removed files
+reach the database and the manifest, and a failed watch loop restarts
+Runs against an in-memory SQLite database
+"""
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from unittest import mock
+from sqlalchemy import select
+from database import create_sqlite_database
+from models import EducationalContent
+from services.content_manager import ContentManager
+from services.content_store import content_store
+from services.content_watcher import ContentWatcher
+
+FRACTIONS = "math/elementary/fractions.md"
+
+
+@asynccontextmanager
+async def Watching():
+    """A polling watcher on a temporary content directory and database"""
+    engine, Session = await create_sqlite_database()
+    content_store.reset()
+    with tempfile.TemporaryDirectory() as tmp:
+        content_dir = Path(tmp) / "content"
+        content_dir.mkdir()
+        manager = ContentManager(content_dir=str(content_dir), manifest_path=str(Path(tmp) / "manifest.json"))
+        watcher = ContentWatcher(content_dir, poll_seconds=0.05)
+        try:
+            with mock.patch.multiple(
+                "services.content_watcher",
+                watchfiles=None, IS_SQLITE=True, AsyncSessionLocal=Session, content_manager=manager,
+                RESTART_DELAY_SECONDS=0
+            ):
+                watcher.start()
+                yield watcher, manager, Session, content_dir
+        finally:
+            await watcher.stop()
+            await engine.dispose()
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+async def live_rows(Session):
+    async with Session() as db:
+        rows = (await db.execute(
+            select(EducationalContent.file_path, EducationalContent.word_count)
+            .where(EducationalContent.deleted_at.is_(None))
+        )).all()
+    return dict(rows)
+
+
+async def test_polling_applies_added_changed_and_removed_files():
+    async with Watching() as (watcher, manager, Session, content_dir):
+        await wait_for(lambda: watcher.mode is not None)
+        assert watcher.mode == "polling"
+        lesson = content_dir / FRACTIONS
+        lesson.parent.mkdir(parents=True)
+        (content_dir / "notes.txt").write_text("not a lesson")
+
+        lesson.write_text("# Fractions\n\nHalves and quarters.\n")
+        await wait_for(lambda: watcher.metrics['ingested'] == 1)
+        assert await live_rows(Session) == {FRACTIONS: 5}
+        assert manager.load_manifest()[FRACTIONS]['size'] == lesson.stat().st_size
+
+        lesson.write_text("# Fractions\n\nHalves, thirds and quarters.\n")
+        await wait_for(lambda: watcher.metrics['ingested'] == 2)
+        assert await live_rows(Session) == {FRACTIONS: 6}
+
+        lesson.unlink()
+        await wait_for(lambda: watcher.metrics['deleted'] == 1)
+        assert await live_rows(Session) == {}
+        assert FRACTIONS not in manager.load_manifest()
+        assert watcher.metrics['errors'] == 0
+
+
+async def test_changes_within_one_poll_are_one_batch():
+    async with Watching() as (watcher, manager, Session, content_dir):
+        watcher.poll_seconds = 0.5
+        await wait_for(lambda: watcher.mode is not None)
+        # Let the first snapshot be taken before writing
+        await asyncio.sleep(0.1)
+        lessons = content_dir / "math" / "elementary"
+        lessons.mkdir(parents=True)
+        for name in ["fractions", "decimals", "percents"]:
+            (lessons / f"{name}.md").write_text(f"# {name.title()}\n\nLesson.\n")
+        await wait_for(lambda: watcher.metrics['ingested'] == 3)
+        assert watcher.metrics['batches'] == 1
+        assert len(await live_rows(Session)) == 3
+
+
+async def test_failed_watch_loop_restarts():
+    async with Watching() as (watcher, manager, Session, content_dir):
+        await wait_for(lambda: watcher.mode is not None)
+        with mock.patch.object(watcher, "_apply", side_effect=RuntimeError("disk gone")):
+            (content_dir / "broken.md").write_text("# Broken\n")
+            await wait_for(lambda: watcher.metrics['restarts'] == 1)
+        assert "disk gone" in watcher.metrics['last_failure']
+
+        # The restarted loop picks up later changes
+        (content_dir / "working.md").write_text("# Working\n\nBack again.\n")
+        await wait_for(lambda: watcher.metrics['ingested'] >= 1)
+        assert "working.md" in await live_rows(Session)
+        assert watcher.running
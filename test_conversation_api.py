@@ -0,0 +1,308 @@
+"""
+Test conversation endpoints: ownership checks and paging
+Runs against an in-memory SQLite database
+"""
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+import httpx
+from unittest import mock
+import zstandard
+from fastapi import FastAPI
+from sqlalchemy import insert, select, func
+from auth import get_current_parent_id
+from database import create_sqlite_database, get_async_db, get_read_db
+from models import Parent, Child, Conversation, Message, MessageArchive, MessageArchiveConversation
+from routers import conversation
+from services.message_archive import message_archive, _serialize
+
+API_PREFIX = "/api/v1/conversation"
+
+
+class Family:
+    """Two parents with one child each; requests are made as parent A"""
+
+    async def setup(self):
+        self.engine, self.Session = await create_sqlite_database()
+        async with self.Session() as db:
+            self.parent_a, self.parent_b = [
+                (await db.execute(
+                    insert(Parent).values(email=email, full_name="Test Parent", hashed_password="x").returning(Parent.id)
+                )).scalar_one()
+                for email in ("a@test.com", "b@test.com")
+            ]
+            self.child_a, self.child_b = [
+                (await db.execute(
+                    insert(Child).values(
+                        parent_id=parent_id, first_name="Kid", date_of_birth="2015-01-01",
+                        grade_level="3rd grade", hashed_pin="x"
+                    ).returning(Child.id)
+                )).scalar_one()
+                for parent_id in (self.parent_a, self.parent_b)
+            ]
+            self.conversation_a, self.conversation_b = [
+                (await db.execute(
+                    insert(Conversation).values(child_id=child_id, title="Chat", version=0).returning(Conversation.id)
+                )).scalar_one()
+                for child_id in (self.child_a, self.child_b)
+            ]
+            await db.commit()
+
+        async def session():
+            async with self.Session() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(conversation.router, prefix=API_PREFIX)
+        app.dependency_overrides[get_async_db] = session
+        app.dependency_overrides[get_read_db] = session
+        app.dependency_overrides[get_current_parent_id] = lambda: self.parent_a
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        # The chat pipeline's stages open their own sessions
+        self.patches = [
+            mock.patch("services.chat_pipeline.AsyncSessionLocal", self.Session),
+            mock.patch("services.chat_pipeline.ReplicaSessionLocal", self.Session),
+        ]
+        for patch in self.patches:
+            patch.start()
+        return self
+
+    async def add_messages(self, conversation_id: int, timestamps) -> list:
+        """Insert one message per timestamp; returns ids in insertion order"""
+        async with self.Session() as db:
+            ids = [
+                (await db.execute(
+                    insert(Message).values(
+                        conversation_id=conversation_id, role="user", content=f"Message {i}", created_at=created_at
+                    ).returning(Message.id)
+                )).scalar_one()
+                for i, created_at in enumerate(timestamps)
+            ]
+            await db.commit()
+        return ids
+
+    async def add_conversations(self, child_id: int, timestamps) -> list:
+        async with self.Session() as db:
+            ids = [
+                (await db.execute(
+                    insert(Conversation).values(
+                        child_id=child_id, title="Chat", version=0, created_at=updated_at, updated_at=updated_at
+                    ).returning(Conversation.id)
+                )).scalar_one()
+                for updated_at in timestamps
+            ]
+            await db.commit()
+        return ids
+
+    async def walk(self, path: str, key: str, cursor_field: str, **params) -> list:
+        """Follow cursors until has_more is False; returns each page's ids"""
+        pages, cursor = [], None
+        while True:
+            response = await self.client.get(path, params={**params, **({'cursor': cursor} if cursor else {})})
+            assert response.status_code == 200, response.text
+            body = response.json()
+            pages.append([item['id'] for item in body[key]])
+            if not body['has_more']:
+                return pages
+            cursor = body[cursor_field]
+            assert len(pages) < 50, "paging did not terminate"
+
+    async def message_count(self, conversation_id: int) -> int:
+        async with self.Session() as db:
+            result = await db.execute(select(func.count()).where(Message.conversation_id == conversation_id))
+            return result.scalar_one()
+
+    async def close(self):
+        for patch in self.patches:
+            patch.stop()
+        await self.client.aclose()
+        await self.engine.dispose()
+
+
+async def test_send_message_rejects_other_parents_child():
+    family = await Family().setup()
+    try:
+        response = await family.client.post(f"{API_PREFIX}/message", json={
+            'child_id': family.child_b, 'text': "What is a fraction?"
+        })
+        assert response.status_code == 404
+        assert await family.message_count(family.conversation_b) == 0
+    finally:
+        await family.close()
+
+
+async def test_send_message_rejects_other_childs_conversation():
+    family = await Family().setup()
+    try:
+        # Own child, but another child's conversation: history must not leak
+        response = await family.client.post(f"{API_PREFIX}/message", json={
+            'child_id': family.child_a, 'text': "What is a fraction?",
+            'conversation_id': family.conversation_b
+        })
+        assert response.status_code == 404
+        assert await family.message_count(family.conversation_b) == 0
+    finally:
+        await family.close()
+
+
+async def test_list_endpoints_reject_other_parents_data():
+    family = await Family().setup()
+    try:
+        response = await family.client.get(f"{API_PREFIX}/conversations/{family.child_b}")
+        assert response.status_code == 404
+        response = await family.client.get(f"{API_PREFIX}/messages/{family.conversation_b}")
+        assert response.status_code == 404
+    finally:
+        await family.close()
+
+
+async def test_message_paging_is_stable_across_ties_and_inserts():
+    family = await Family().setup()
+    try:
+        base = datetime(2024, 1, 1, 12, 0)
+        # Pairs share a timestamp so the id tiebreak decides the order
+        timestamps = [base + timedelta(minutes=i // 2) for i in range(7)]
+        ids = await family.add_messages(family.conversation_a, timestamps)
+
+        path = f"{API_PREFIX}/messages/{family.conversation_a}"
+        first = (await family.client.get(path, params={'limit': 3})).json()
+        assert [m['id'] for m in first['messages']] == ids[-3:]
+        assert first['has_more'] is True
+
+        # A message arriving mid-walk must not shift the older pages
+        await family.add_messages(family.conversation_a, [base + timedelta(hours=1)])
+        pages = [[m['id'] for m in first['messages']]]
+        cursor = first['older_cursor']
+        while True:
+            body = (await family.client.get(path, params={'limit': 3, 'cursor': cursor})).json()
+            pages.append([m['id'] for m in body['messages']])
+            if not body['has_more']:
+                break
+            cursor = body['older_cursor']
+
+        assert pages == [ids[4:7], ids[1:4], ids[0:1]]
+        assert len(pages[-1]) < 3
+    finally:
+        await family.close()
+
+
+async def test_message_paging_last_page_exactly_full():
+    family = await Family().setup()
+    try:
+        base = datetime(2024, 1, 1, 12, 0)
+        ids = await family.add_messages(family.conversation_a, [base + timedelta(minutes=i) for i in range(6)])
+        pages = await family.walk(f"{API_PREFIX}/messages/{family.conversation_a}", 'messages', 'older_cursor', limit=3)
+        assert pages == [ids[3:6], ids[0:3]]
+
+        # Walking back newer from the oldest page returns the same windows
+        path = f"{API_PREFIX}/messages/{family.conversation_a}"
+        first = (await family.client.get(path, params={'limit': 3})).json()
+        oldest = (await family.client.get(path, params={'limit': 3, 'cursor': first['older_cursor']})).json()
+        assert oldest['has_more'] is False
+        newer = (await family.client.get(
+            path, params={'limit': 3, 'cursor': oldest['newer_cursor'], 'direction': 'newer'}
+        )).json()
+        assert [m['id'] for m in newer['messages']] == ids[3:6]
+        assert newer['has_more'] is False
+    finally:
+        await family.close()
+
+
+async def test_conversation_paging_newest_first():
+    family = await Family().setup()
+    try:
+        base = datetime(2024, 1, 1, 12, 0)
+        ids = await family.add_conversations(family.child_a, [base + timedelta(minutes=i // 2) for i in range(5)])
+        # The setup conversation has the newest updated_at
+        expected = [family.conversation_a] + ids[::-1]
+        pages = await family.walk(
+            f"{API_PREFIX}/conversations/{family.child_a}", 'conversations', 'older_cursor', limit=2
+        )
+        assert [cid for page in pages for cid in page] == expected
+        assert [len(page) for page in pages] == [2, 2, 2]
+    finally:
+        await family.close()
+
+
+async def test_search_escapes_content_and_marks_once():
+    family = await Family().setup()
+    try:
+        async with family.Session() as db:
+            await db.execute(insert(Message).values(
+                conversation_id=family.conversation_a, role="user",
+                content="<script>alert(1)</script> what is a mark in math?"
+            ))
+            await db.commit()
+
+        response = await family.client.get(f"{API_PREFIX}/search/{family.child_a}", params={'q': "mark script"})
+        assert response.status_code == 200
+        snippet = response.json()['results'][0]['snippet']
+        assert "<script>" not in snippet
+        assert snippet.count("<mark>") == 3
+        assert "&lt;<mark>script</mark>&gt;" in snippet
+
+        response = await family.client.get(f"{API_PREFIX}/search/{family.child_b}", params={'q': "mark"})
+        assert response.status_code == 404
+    finally:
+        await family.close()
+
+
+async def test_delete_endpoints_reject_other_parents_data():
+    family = await Family().setup()
+    try:
+        response = await family.client.delete(f"{API_PREFIX}/conversations/{family.child_b}")
+        assert response.status_code == 404
+        response = await family.client.delete(f"{API_PREFIX}/conversation/{family.conversation_b}")
+        assert response.status_code == 404
+        async with family.Session() as db:
+            remaining = await db.execute(select(func.count()).select_from(Conversation))
+            assert remaining.scalar_one() == 2
+    finally:
+        await family.close()
+
+
+async def test_delete_unlinks_archived_messages_until_sweep():
+    family = await Family().setup()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # An archived partition holding messages of both families
+            created_at = datetime(2023, 1, 15)
+            rows = [
+                {'id': 1, 'conversation_id': family.conversation_a, 'role': "user", 'content': "A's old question",
+                 'source_type': None, 'sources': None, 'depth_level': 1, 'model_used': None, 'created_at': created_at},
+                {'id': 2, 'conversation_id': family.conversation_b, 'role': "user", 'content': "B's old question",
+                 'source_type': None, 'sources': None, 'depth_level': 1, 'model_used': None, 'created_at': created_at},
+            ]
+            path = str(Path(tmp) / "messages_y2023m01.ndjson.zst")
+            Path(path).write_bytes(zstandard.ZstdCompressor().compress(b"".join(_serialize(row) for row in rows)))
+            async with family.Session() as db:
+                await db.execute(insert(MessageArchive).values(
+                    partition_name="messages_y2023m01", range_start=datetime(2023, 1, 1),
+                    range_end=datetime(2023, 2, 1), path=path, row_count=2
+                ))
+                await db.execute(insert(MessageArchiveConversation), [
+                    {'partition_name': "messages_y2023m01", 'conversation_id': row['conversation_id'],
+                     'message_count': 1, 'first_created_at': created_at, 'last_created_at': created_at}
+                    for row in rows
+                ])
+                await db.commit()
+
+            response = await family.client.delete(f"{API_PREFIX}/conversation/{family.conversation_a}")
+            assert response.status_code == 200
+
+            # The delete only drops catalog rows; the file waits for the sweep
+            async with family.Session() as db:
+                catalog = await db.execute(select(MessageArchiveConversation.conversation_id))
+                assert catalog.scalars().all() == [family.conversation_b]
+                assert await message_archive.read_conversation(db, family.conversation_a) == []
+            assert len(list(message_archive._read_rows(path))) == 2
+
+            async with family.Session() as db:
+                assert await message_archive.purge_deleted(db) == 1
+                assert await message_archive.purge_deleted(db) == 0
+                archive = await db.execute(select(MessageArchive.row_count))
+                assert archive.scalar_one() == 1
+            remaining = message_archive._read_rows(path)
+            assert [row['conversation_id'] for row in remaining] == [family.conversation_b]
+    finally:
+        await family.close()
@@ -0,0 +1,114 @@
+"""
+Test ConversationService.append_batch: counters, version bumps and atomicity
+Runs against an in-memory SQLite database
+"""
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import IntegrityError
+from database import create_sqlite_database
+from models import Parent, Child, Conversation, Message
+from services.conversation_service import ConversationService
+
+
+async def setup(conversations: int = 2):
+    engine, Session = await create_sqlite_database()
+    async with Session() as db:
+        parent_id = (await db.execute(
+            insert(Parent).values(email="p@test.com", full_name="Test Parent", hashed_password="x")
+            .returning(Parent.id)
+        )).scalar_one()
+        child_id = (await db.execute(
+            insert(Child).values(
+                parent_id=parent_id, first_name="Kid", date_of_birth="2015-01-01",
+                grade_level="3rd grade", hashed_pin="x"
+            ).returning(Child.id)
+        )).scalar_one()
+        ids = [
+            (await db.execute(
+                insert(Conversation).values(child_id=child_id, title="Chat", version=0, message_count=0)
+                .returning(Conversation.id)
+            )).scalar_one()
+            for _ in range(conversations)
+        ]
+        await db.commit()
+    return engine, Session, ids
+
+
+async def conversation_state(Session, conversation_id: int):
+    async with Session() as db:
+        result = await db.execute(
+            select(Conversation.version, Conversation.message_count, Conversation.total_depth_reached)
+            .where(Conversation.id == conversation_id)
+        )
+        state = result.one()
+        count = await db.execute(select(func.count()).where(Message.conversation_id == conversation_id))
+        return state.version, state.message_count, state.total_depth_reached, count.scalar_one()
+
+
+def turn(text: str, depth: int = 1):
+    return [
+        {'role': "user", 'content': text, 'depth_level': depth},
+        {'role': "assistant", 'content': f"Answer to {text}", 'depth_level': depth},
+    ]
+
+
+async def test_batch_bumps_each_conversation_once():
+    engine, Session, (first, second) = await setup()
+    try:
+        async with Session() as db:
+            results = await ConversationService(db).append_batch([
+                (first, turn("q1")),
+                (second, turn("q2", depth=3)),
+                (first, turn("q3", depth=2)),
+            ])
+
+        assert [[m.content for m in created] for created in results] == [
+            ["q1", "Answer to q1"], ["q2", "Answer to q2"], ["q3", "Answer to q3"]
+        ]
+        # One version bump per conversation per batch, however many entries
+        assert await conversation_state(Session, first) == (1, 4, 2, 4)
+        assert await conversation_state(Session, second) == (1, 2, 3, 2)
+
+        async with Session() as db:
+            await ConversationService(db).add_messages(first, turn("q4"))
+        assert await conversation_state(Session, first) == (2, 6, 2, 6)
+    finally:
+        await engine.dispose()
+
+
+async def test_missing_conversation_is_skipped_without_failing_the_batch():
+    engine, Session, (first, _) = await setup()
+    try:
+        async with Session() as db:
+            results = await ConversationService(db).append_batch([(first, turn("q1")), (99999, turn("lost"))])
+        assert results[1] is None
+        assert len(results[0]) == 2
+        assert await conversation_state(Session, first) == (1, 2, 1, 2)
+
+        async with Session() as db:
+            try:
+                await ConversationService(db).add_messages(99999, turn("lost"))
+                assert False, "expected ValueError"
+            except ValueError:
+                pass
+    finally:
+        await engine.dispose()
+
+
+async def test_failed_insert_rolls_back_counters_and_messages():
+    engine, Session, (first, second) = await setup()
+    try:
+        async with Session() as db:
+            try:
+                # content is NOT NULL: the insert fails after the counter updates ran
+                await ConversationService(db).append_batch([
+                    (first, turn("q1")),
+                    (second, [{'role': "user", 'content': None}]),
+                ])
+                assert False, "expected IntegrityError"
+            except IntegrityError:
+                pass
+
+        assert await conversation_state(Session, first) == (0, 0, 1, 0)
+        assert await conversation_state(Session, second) == (0, 0, 1, 0)
+    finally:
+        await engine.dispose()
@@ -0,0 +1,166 @@
+"""
+Test the streaming corpus reader and importer
+Runs against an in-memory SQLite database
+"""
+import gzip
+import io
+import json
+import tempfile
+from pathlib import Path
+from sqlalchemy import select
+from database import create_sqlite_database
+from models import EducationalContent
+from model.corpus_reader import CorpusReader, CorpusFormatError, _JSONStream, normalize_document
+from services.content_store import content_store
+from services.corpus_importer import corpus_importer
+
+DOCUMENTS = [
+    {'id': "frac-1", 'title': "Fractions", 'subject': "Math", 'grade_level': "Elementary",
+     'content': "A fraction has a numerator and a denominator.", 'grades': "3-5"},
+    {'id': "cells/2", 'title': "Células", 'subject': "Science", 'grade_level': "Middle",
+     'content': "Las células son la unidad básica de la vida.", 'language': "es", 'score': 12345678},
+    {'title': "No id", 'subject': "Math", 'content': "Documents without an id are keyed by content hash."},
+]
+
+
+def write(directory: Path, name: str, text: str) -> Path:
+    path = directory / name
+    if name.endswith(".gz"):
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        path.write_text(text, encoding='utf-8')
+    return path
+
+
+def test_documents_object_streams_across_tiny_buffers():
+    body = json.dumps({'name': "sample", 'documents': DOCUMENTS, 'total': 3}, ensure_ascii=False, indent=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write(Path(tmp), "corpus.json", body)
+        # A 7-character buffer forces values and numbers to span refills
+        assert list(CorpusReader(path, chunk_size=7)) == DOCUMENTS
+        assert list(CorpusReader(path)) == DOCUMENTS
+
+
+def test_bare_array_and_empty_documents():
+    with tempfile.TemporaryDirectory() as tmp:
+        assert list(CorpusReader(write(Path(tmp), "array.json", json.dumps(DOCUMENTS)), chunk_size=5)) == DOCUMENTS
+        assert list(CorpusReader(write(Path(tmp), "empty.json", '{"documents": []}'))) == []
+        assert list(CorpusReader(write(Path(tmp), "nothing.json", '{}'))) == []
+
+
+def test_jsonl_gz_counts_malformed_lines():
+    lines = [json.dumps(doc, ensure_ascii=False) for doc in DOCUMENTS]
+    lines.insert(1, '{"id": "broken", "content": ')
+    with tempfile.TemporaryDirectory() as tmp:
+        reader = CorpusReader(write(Path(tmp), "corpus.jsonl.gz", "\n".join(lines) + "\n\n"))
+        assert list(reader) == DOCUMENTS
+        assert reader.malformed == 1
+
+
+def test_malformed_document_object_raises():
+    with tempfile.TemporaryDirectory() as tmp:
+        reader = CorpusReader(write(Path(tmp), "bad.json", '{"documents": [{"id": 1}, {"id": '))
+        try:
+            list(reader)
+            assert False, "expected CorpusFormatError"
+        except CorpusFormatError:
+            pass
+
+
+def test_syntax_error_raises_without_reading_rest_of_file():
+    # The bad value sits early in a file far larger than the buffer
+    text = '[{"id": 1, "content": "x" oops}, ' + ", ".join(json.dumps(doc) for doc in DOCUMENTS * 2000) + "]"
+    f = io.StringIO(text)
+    stream = _JSONStream(f, chunk_size=64)
+    stream.expect("[")
+    try:
+        stream.value()
+        assert False, "expected CorpusFormatError"
+    except CorpusFormatError as e:
+        assert "at character 26" in str(e)
+    assert f.tell() <= 128
+
+
+def test_values_spanning_many_refills_are_capped():
+    document = json.dumps({'content': "word " * 5000})
+    stream = _JSONStream(io.StringIO(f"[{document}]"), chunk_size=16)
+    stream.expect("[")
+    assert stream.value() == json.loads(document)
+
+    stream = _JSONStream(io.StringIO(f"[{document}]"), chunk_size=16, max_value_size=1000)
+    stream.expect("[")
+    try:
+        stream.value()
+        assert False, "expected CorpusFormatError"
+    except CorpusFormatError as e:
+        assert "larger than 1000 characters" in str(e)
+
+
+def test_normalize_document():
+    row = normalize_document(DOCUMENTS[1], "sample")
+    assert row['file_path'] == "corpus/sample/cells_2"
+    assert (row['subject'], row['grade_level'], row['language']) == ("science", "middle", "es")
+    assert (row['grade_min'], row['grade_max']) == (6, 8)
+
+    row = normalize_document(DOCUMENTS[0], "sample")
+    assert (row['grade_min'], row['grade_max']) == (3, 5)
+
+    unnamed = normalize_document(DOCUMENTS[2], "sample")
+    assert unnamed['file_path'] == f"corpus/sample/{unnamed['content_hash']}"
+
+    assert normalize_document({'id': "x", 'content': "   "}, "sample") is None
+    assert normalize_document({'id': "x"}, "sample") is None
+    assert normalize_document(["not", "a", "dict"], "sample") is None
+
+
+async def test_import_is_batched_and_idempotent():
+    engine, Session = await create_sqlite_database()
+    content_store.reset()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            lines = [json.dumps(doc, ensure_ascii=False) for doc in DOCUMENTS] + ["not json"]
+            path = write(Path(tmp), "sample.jsonl", "\n".join(lines))
+
+            async with Session() as db:
+                stats = await corpus_importer.import_corpus(db, path, batch_size=2)
+            assert (stats['total'], stats['added'], stats['invalid']) == (4, 3, 1)
+
+            async with Session() as db:
+                stats = await corpus_importer.import_corpus(db, path, batch_size=2)
+            assert (stats['added'], stats['updated'], stats['skipped']) == (0, 0, 3)
+
+            # A changed document is rewritten, the rest skipped
+            changed = [{**DOCUMENTS[0], 'content': "Fractions, revised."}] + DOCUMENTS[1:]
+            path.write_text("\n".join(json.dumps(doc, ensure_ascii=False) for doc in changed), encoding='utf-8')
+            async with Session() as db:
+                stats = await corpus_importer.import_corpus(db, path, batch_size=2)
+            assert (stats['added'], stats['updated'], stats['skipped']) == (0, 1, 2)
+
+            async with Session() as db:
+                rows = (await db.execute(
+                    select(EducationalContent.id, EducationalContent.file_path)
+                    .where(EducationalContent.file_path.startswith("corpus/sample/"))
+                )).all()
+                bodies = await content_store.load_bodies(db, [row.id for row in rows])
+            by_path = {row.file_path: bodies[row.id] for row in rows}
+            assert by_path["corpus/sample/frac-1"] == "Fractions, revised."
+            assert by_path["corpus/sample/cells_2"] == "Las células son la unidad básica de la vida."
+    finally:
+        await engine.dispose()
+
+
+async def test_later_duplicate_id_in_a_batch_wins():
+    engine, Session = await create_sqlite_database()
+    content_store.reset()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            documents = [DOCUMENTS[0], {**DOCUMENTS[0], 'content': "The later copy."}]
+            path = write(Path(tmp), "dupes.jsonl", "\n".join(json.dumps(doc) for doc in documents))
+            async with Session() as db:
+                stats = await corpus_importer.import_corpus(db, path)
+                assert (stats['total'], stats['added']) == (2, 1)
+                content_id = (await db.execute(select(EducationalContent.id))).scalar_one()
+                assert (await content_store.load_bodies(db, [content_id]))[content_id] == "The later copy."
+    finally:
+        await engine.dispose()
@@ -0,0 +1,67 @@
+"""
+Test streaming history exports, including messages in archived partitions
+Runs against an in-memory SQLite database
+"""
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+from sqlalchemy import insert
+from database import create_sqlite_database
+from models import Parent, Child, Conversation, Message
+from services.export_service import ExportService
+from services.message_archive import MessageArchiveService
+from test_message_archive import archive_rows, write_archive
+
+
+async def setup(Session, conversations: int = 2):
+    async with Session() as db:
+        parent_id = (await db.execute(
+            insert(Parent).values(email="p@test.com", full_name="Test Parent", hashed_password="x").returning(Parent.id)
+        )).scalar_one()
+        child_id = (await db.execute(
+            insert(Child).values(
+                parent_id=parent_id, first_name="Kid", date_of_birth="2015-01-01",
+                grade_level="3rd grade", hashed_pin="x"
+            ).returning(Child.id)
+        )).scalar_one()
+        ids = [
+            (await db.execute(
+                insert(Conversation).values(child_id=child_id, title=f"Chat {i}", version=0).returning(Conversation.id)
+            )).scalar_one()
+            for i in range(conversations)
+        ]
+        await db.commit()
+    return child_id, ids
+
+
+async def test_export_streams_archived_then_live_rows_in_order():
+    engine, Session = await create_sqlite_database()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            child_id, (first, second) = await setup(Session)
+            archived = archive_rows([first, second, 999], 9)
+            await write_archive(Session, tmp, "messages_y2023m01", archived)
+            async with Session() as db:
+                await db.execute(insert(Message), [
+                    {'id': 100 + i, 'conversation_id': conversation_id, 'role': "user", 'content': "Live",
+                     'created_at': datetime(2024, 6, 1) + timedelta(minutes=i)}
+                    for i, conversation_id in enumerate([second, first, second])
+                ])
+                await db.commit()
+
+            archive = MessageArchiveService(archive_dir=tmp)
+            with mock.patch("services.export_service.async_engine", engine), \
+                    mock.patch("services.export_service.replica_engine", None), \
+                    mock.patch("services.export_service.message_archive", archive):
+                export = ExportService(batch_size=2)
+                body = b"".join([chunk async for chunk in export.stream_history(child_id, gzip=True)])
+
+            rows = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+            expected_archived = [row['id'] for row in archived if row['conversation_id'] != 999]
+            assert [row['message_id'] for row in rows] == expected_archived + [100, 101, 102]
+            assert [row['created_at'] for row in rows] == sorted(row['created_at'] for row in rows)
+            assert {row['conversation_title'] for row in rows if row['conversation_id'] == first} == {"Chat 0"}
+    finally:
+        await engine.dispose()
@@ -0,0 +1,70 @@
+"""
+Test the conversation history cache: ring buffers, LRU eviction under the
+byte cap and version-based invalidation
+"""
+from services.history_cache import HistoryCache, MESSAGE_OVERHEAD_BYTES
+
+
+def messages(*contents):
+    return [{'role': "user", 'content': content} for content in contents]
+
+
+def size(*contents):
+    return sum(len(content) + MESSAGE_OVERHEAD_BYTES for content in contents)
+
+
+def test_ring_buffer_keeps_newest_messages():
+    cache = HistoryCache(messages_per_conversation=3)
+    cache.put(1, version=1, messages=messages("a", "b", "c", "d"))
+    assert [m['content'] for m in cache.get(1)] == ["b", "c", "d"]
+
+    cache.append(1, version=2, messages=messages("eeee", "f"))
+    assert [m['content'] for m in cache.get(1, version=2)] == ["d", "eeee", "f"]
+    # Bytes of truncated messages are given back
+    assert cache.total_bytes == size("d", "eeee", "f")
+
+
+def test_lru_eviction_under_byte_cap():
+    cache = HistoryCache(messages_per_conversation=5, max_bytes=size("x" * 100) * 2)
+    cache.put(1, version=1, messages=messages("x" * 100))
+    cache.put(2, version=1, messages=messages("x" * 100))
+    # Reading 1 makes 2 the least recently used
+    assert cache.get(1) is not None
+    cache.put(3, version=1, messages=messages("x" * 100))
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+    assert cache.stats['evictions'] == 1
+    assert cache.total_bytes <= cache.max_bytes
+
+    # Growing an entry by appends evicts others too, never leaving it over the cap
+    cache.append(3, version=2, messages=messages("y" * 100))
+    assert list(cache.entries) == [3]
+    assert cache.total_bytes == size("x" * 100, "y" * 100)
+
+
+def test_get_with_other_version_invalidates():
+    cache = HistoryCache()
+    cache.put(1, version=4, messages=messages("a"))
+    assert cache.get(1, version=4) is not None
+    # Another worker appended: the database version moved on
+    assert cache.get(1, version=5) is None
+    assert cache.get(1) is None
+    assert cache.stats['invalidations'] == 1
+    assert cache.total_bytes == 0
+
+
+def test_append_that_skips_a_version_invalidates():
+    cache = HistoryCache()
+    cache.put(1, version=1, messages=messages("a"))
+    cache.append(1, version=2, messages=messages("b"))
+    assert [m['content'] for m in cache.get(1, version=2)] == ["a", "b"]
+
+    # Version 3 was written elsewhere; patching with 4 would hide it
+    cache.append(1, version=4, messages=messages("d"))
+    assert cache.get(1) is None
+    assert cache.stats['invalidations'] == 1
+
+    # Appends to uncached conversations are ignored
+    cache.append(2, version=1, messages=messages("z"))
+    assert cache.get(2) is None
@@ -0,0 +1,88 @@
+"""
+Test reading archived messages back from compressed partition files
+Runs against an in-memory SQLite database
+"""
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+import zstandard
+from sqlalchemy import insert
+from database import create_sqlite_database
+from models import MessageArchive, MessageArchiveConversation
+from services.message_archive import MessageArchiveService, _serialize
+
+START = datetime(2023, 1, 1)
+
+
+def archive_rows(conversation_ids, count: int):
+    """`count` messages a minute apart, round-robin over the conversations"""
+    return [
+        {'id': i + 1, 'conversation_id': conversation_ids[i % len(conversation_ids)], 'role': "user",
+         'content': f"Message {i + 1}", 'source_type': None, 'sources': None, 'depth_level': 1,
+         'model_used': None, 'created_at': START + timedelta(minutes=i)}
+        for i in range(count)
+    ]
+
+
+async def write_archive(Session, archive_dir: str, name: str, rows):
+    path = str(Path(archive_dir) / f"{name}.ndjson.zst")
+    Path(path).write_bytes(zstandard.ZstdCompressor().compress(b"".join(_serialize(row) for row in rows)))
+    async with Session() as db:
+        await db.execute(insert(MessageArchive).values(
+            partition_name=name, range_start=START, range_end=datetime(2023, 2, 1), path=path, row_count=len(rows)
+        ))
+        counts = {}
+        for row in rows:
+            counts[row['conversation_id']] = counts.get(row['conversation_id'], 0) + 1
+        await db.execute(insert(MessageArchiveConversation), [
+            {'partition_name': name, 'conversation_id': conversation_id, 'message_count': count,
+             'first_created_at': START, 'last_created_at': START + timedelta(minutes=len(rows))}
+            for conversation_id, count in counts.items()
+        ])
+        await db.commit()
+    return path
+
+
+async def test_read_conversation_pages_newest_first():
+    engine, Session = await create_sqlite_database()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = MessageArchiveService(archive_dir=tmp)
+            rows = archive_rows([1, 2], 20)
+            await write_archive(Session, tmp, "messages_y2023m01", rows)
+            ids = [row['id'] for row in rows if row['conversation_id'] == 1]
+
+            async with Session() as db:
+                newest = await archive.read_conversation(db, 1, limit=3)
+                assert [message.id for message in newest] == ids[-3:]
+                oldest = newest[0]
+                older = await archive.read_conversation(db, 1, before=(oldest.created_at, oldest.id), limit=3)
+                assert [message.id for message in older] == ids[-6:-3]
+                assert [message.id for message in await archive.read_conversation(db, 1)] == ids
+    finally:
+        await engine.dispose()
+
+
+def test_conversation_rows_stop_at_cursor():
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = MessageArchiveService(archive_dir=tmp)
+        rows = archive_rows([1], 10)
+        path = Path(tmp) / "messages_y2023m01.ndjson.zst"
+        path.write_bytes(zstandard.ZstdCompressor().compress(b"".join(_serialize(row) for row in rows)))
+
+        before = (rows[5]['created_at'], rows[5]['id'])
+        matches = archive._read_conversation_rows(str(path), 1, before, 2)
+        assert [row['id'] for row in matches] == [4, 5]
+        assert [row['id'] for row in archive._read_conversation_rows(str(path), 2, None, None)] == []
+
+
+async def test_rows_stream_in_batches():
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = MessageArchiveService(archive_dir=tmp)
+        rows = archive_rows([1, 2, 3], 11)
+        path = Path(tmp) / "messages_y2023m01.ndjson.zst"
+        path.write_bytes(zstandard.ZstdCompressor().compress(b"".join(_serialize(row) for row in rows)))
+
+        batches = [batch async for batch in archive.iter_rows(str(path), batch_size=4)]
+        assert [len(batch) for batch in batches] == [4, 4, 3]
+        assert [row for batch in batches for row in batch] == rows
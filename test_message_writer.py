@@ -0,0 +1,145 @@
+"""
+Test the write-behind message writer: batching, retries, dead-lettering,
+ack modes and the final flush on stop
+Runs against an in-memory SQLite database
+"""
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+from sqlalchemy import select, func
+from models import Message
+from services.conversation_service import ConversationService
+from services.message_writer import MessageWriter, ACK_ON_ENQUEUE, ACK_ON_FLUSH
+from test_conversation_service import setup, turn
+
+
+class Writer:
+    """A started MessageWriter committing to a fresh in-memory database"""
+
+    def __init__(self, **options):
+        self.options = options
+
+    async def __aenter__(self):
+        self.engine, self.Session, self.conversations = await setup()
+        self.patch = mock.patch("services.message_writer.AsyncSessionLocal", self.Session)
+        self.patch.start()
+        self.writer = MessageWriter(**{'flush_interval_ms': 20, **self.options})
+        self.writer.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.writer.stop()
+        self.patch.stop()
+        await self.engine.dispose()
+
+    async def message_count(self) -> int:
+        async with self.Session() as db:
+            return (await db.execute(select(func.count()).select_from(Message))).scalar_one()
+
+
+def failing(times: int):
+    """An append_batch that raises `times` times before writing"""
+    real = ConversationService.append_batch
+    calls = {'count': 0}
+
+    async def append_batch(self, entries):
+        calls['count'] += 1
+        if calls['count'] <= times:
+            raise ConnectionError("database unavailable")
+        return await real(self, entries)
+
+    return append_batch
+
+
+async def test_turns_are_batched_into_few_flushes():
+    async with Writer(batch_size=3) as w:
+        first, second = w.conversations
+        results = await asyncio.gather(*[
+            w.writer.submit(first if i % 2 else second, turn(f"q{i}")) for i in range(6)
+        ])
+        assert [len(created) for created in results] == [2] * 6
+        assert w.writer.metrics['flushes'] == 2
+        assert w.writer.metrics['flushed'] == 12
+        assert await w.message_count() == 12
+
+
+async def test_failed_flush_is_retried_with_backoff():
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay):
+        delays.append(delay)
+        await real_sleep(0)
+
+    async with Writer(max_retries=3) as w:
+        with mock.patch.object(ConversationService, "append_batch", failing(2)), \
+                mock.patch("services.message_writer.asyncio.sleep", sleep):
+            created = await w.writer.submit(w.conversations[0], turn("q"))
+        assert len(created) == 2
+        assert delays == [0.1, 0.2]
+        assert w.writer.metrics['retries'] == 2
+        assert w.writer.metrics['failed_flushes'] == 0
+
+
+async def test_exhausted_retries_fail_waiters():
+    async with Writer(max_retries=1, ack=ACK_ON_FLUSH) as w:
+        with mock.patch.object(ConversationService, "append_batch", failing(2)), \
+                mock.patch("services.message_writer.RETRY_BACKOFF_SECONDS", 0):
+            try:
+                await w.writer.submit(w.conversations[0], turn("q"))
+                assert False, "submit should raise"
+            except ConnectionError:
+                pass
+        assert w.writer.metrics['failed_flushes'] == 1
+        assert await w.message_count() == 0
+
+
+async def test_enqueue_acks_are_dead_lettered_after_retries():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "dead_letter.jsonl"
+        async with Writer(max_retries=1, ack=ACK_ON_ENQUEUE, dead_letter_path=str(path)) as w:
+            with mock.patch.object(ConversationService, "append_batch", failing(10)), \
+                    mock.patch("services.message_writer.RETRY_BACKOFF_SECONDS", 0):
+                assert await w.writer.submit(w.conversations[0], turn("lost?")) is None
+                await w.writer.stop()
+            entries = [json.loads(line) for line in path.read_text().splitlines()]
+            assert [entry['conversation_id'] for entry in entries] == [w.conversations[0]]
+            assert [m['content'] for m in entries[0]['messages']] == ["lost?", "Answer to lost?"]
+            assert w.writer.metrics['dead_lettered'] == 2
+
+
+async def test_stop_flushes_queued_enqueue_acks():
+    async with Writer(ack=ACK_ON_ENQUEUE, batch_size=2, flush_interval_ms=10000) as w:
+        for i in range(5):
+            assert await w.writer.submit(w.conversations[0], turn(f"q{i}")) is None
+        await w.writer.stop()
+        assert not w.writer.running
+        assert await w.message_count() == 10
+
+
+async def test_unexpected_flush_error_keeps_loop_running():
+    async with Writer(ack=ACK_ON_FLUSH) as w:
+        with mock.patch.object(MessageWriter, "_flush", side_effect=RuntimeError("bug")):
+            try:
+                await w.writer.submit(w.conversations[0], turn("q1"))
+                assert False, "submit should raise"
+            except RuntimeError:
+                pass
+        assert w.writer.running
+        assert len(await w.writer.submit(w.conversations[0], turn("q2"))) == 2
+
+
+async def test_unserializable_dead_letter_is_logged_not_raised():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "dead_letter.jsonl"
+        async with Writer(max_retries=0, ack=ACK_ON_ENQUEUE, dead_letter_path=str(path)) as w:
+            with mock.patch.object(ConversationService, "append_batch", failing(10)):
+                await w.writer.submit(w.conversations[0], [{'role': "user", 'content': object()}])
+                await w.writer.submit(w.conversations[0], turn("q"))
+                await asyncio.sleep(0.1)
+            assert w.writer.running
+            entries = [json.loads(line) for line in path.read_text().splitlines()]
+            assert [m['content'] for entry in entries for m in entry['messages']] == ["q", "Answer to q"]
+            assert w.writer.metrics['dead_lettered'] == 2
@@ -0,0 +1,102 @@
+"""
+Test migration helpers that do not need a Postgres server
+"""
+import importlib
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+partition_messages = importlib.import_module("migrations.0004_partition_messages")
+
+
+def test_backfill_ranges_stop_at_target():
+    ranges = list(partition_messages.copy_ranges(0, 120, batch_size=50))
+    assert ranges == [(0, 50), (50, 100), (100, 120)]
+    # The catch-up starts where the last range ended, not a batch past it
+    assert ranges[-1][1] == 120
+
+
+def test_backfill_ranges_resume_and_cover_every_id():
+    copied, target = 37, 1000
+    ranges = list(partition_messages.copy_ranges(copied, target, batch_size=64))
+    covered = [i for after_id, up_to_id in ranges for i in range(after_id + 1, up_to_id + 1)]
+    assert covered == list(range(copied + 1, target + 1))
+
+
+def test_backfill_ranges_empty_when_caught_up():
+    assert list(partition_messages.copy_ranges(500, 500)) == []
+    assert list(partition_messages.copy_ranges(600, 500)) == []
+
+
+def test_legacy_names_do_not_collide():
+    names = ["messages_pkey", "ix_messages_conversation_created", "ix_messages_content_fts_en", "ck_role"]
+    renamed = [partition_messages.legacy_name(name) for name in names]
+    assert renamed == [
+        "messages_legacy_pkey",
+        "ix_messages_legacy_conversation_created",
+        "ix_messages_legacy_content_fts_en",
+        "ck_role_legacy",
+    ]
+    assert not set(renamed) & set(names)
+    assert len(partition_messages.legacy_name("ix_messages_" + "x" * 80)) == partition_messages.MAX_IDENTIFIER_LENGTH
+
+
+async def copy_tables():
+    """messages and messages_partitioned with just the columns the copy reads"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        for table in ("messages", "messages_partitioned"):
+            await conn.execute(text(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, content TEXT, created_at DATETIME)"))
+    return engine
+
+
+async def insert_messages(engine, ids):
+    async with engine.begin() as conn:
+        await conn.execute(text("INSERT INTO messages (id, content, created_at) VALUES (:id, 'hi', :at)"), [
+            {'id': message_id, 'at': datetime(2024, 1, 1)} for message_id in ids
+        ])
+
+
+async def copied_ids(engine):
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT id FROM messages_partitioned ORDER BY id"))
+        return result.scalars().all()
+
+
+async def test_catch_up_copies_late_commit_below_high_water_mark():
+    engine = await copy_tables()
+    columns = ["id", "content", "created_at"]
+    try:
+        # id 4 was taken from the sequence first but commits after the backfill
+        await insert_messages(engine, [1, 2, 3, 5, 6])
+        async with engine.begin() as conn:
+            copied = await partition_messages.backfill(conn, columns, batch_size=2)
+        assert copied == 6
+        await insert_messages(engine, [4, 7])
+
+        async with engine.begin() as conn:
+            await partition_messages.catch_up(conn, columns, copied)
+        assert await copied_ids(engine) == [1, 2, 3, 4, 5, 6, 7]
+
+        # Repeating the copy (a restart, or a second catch-up) adds nothing
+        async with engine.begin() as conn:
+            assert await partition_messages.backfill(conn, columns) == 7
+            await partition_messages.catch_up(conn, columns, 7)
+        assert await copied_ids(engine) == [1, 2, 3, 4, 5, 6, 7]
+    finally:
+        await engine.dispose()
+
+
+async def test_catch_up_without_window_misses_late_commit():
+    engine = await copy_tables()
+    columns = ["id", "content", "created_at"]
+    try:
+        await insert_messages(engine, [1, 3])
+        async with engine.begin() as conn:
+            copied = await partition_messages.backfill(conn, columns)
+        await insert_messages(engine, [2])
+        async with engine.begin() as conn:
+            await partition_messages.catch_up(conn, columns, copied, window=0)
+        assert await copied_ids(engine) == [1, 3]
+    finally:
+        await engine.dispose()
@@ -0,0 +1,56 @@
+"""
+Test routing table validation and routing decisions
+"""
+from unittest import mock
+from services.model_router import DEFAULT_ROUTING_TABLE, ModelRouter, validate_routing_table
+
+BAD_TABLES = [
+    [],
+    {'name': "not a list"},
+    ["not a rule"],
+    [{'tier': "huge"}],
+    [{'depths': 1}],
+    [{'depths': [1, "2"]}],
+    [{'depths': [True]}],
+    [{'question_types': ["why"]}],
+    [{'has_curated_content': "yes"}],
+    [{'max_tokens': 0}],
+    [{'max_tokens': "500"}],
+    [{'tier': "fast", 'maxtokens': 500}],
+]
+
+
+def test_default_table_is_valid():
+    router = ModelRouter()
+    assert validate_routing_table(DEFAULT_ROUTING_TABLE, router.tiers) is DEFAULT_ROUTING_TABLE
+
+
+def test_bad_tables_are_rejected_at_construction():
+    for table in BAD_TABLES:
+        try:
+            ModelRouter(routing_table=table)
+        except ValueError:
+            continue
+        assert False, f"accepted {table!r}"
+
+
+def test_bad_configured_table_falls_back_to_default():
+    with mock.patch("services.model_router.settings.routing_table", '[{"tier": "huge"}]'):
+        assert ModelRouter().routing_table == DEFAULT_ROUTING_TABLE
+    with mock.patch("services.model_router.settings.routing_table", "not json"):
+        assert ModelRouter().routing_table == DEFAULT_ROUTING_TABLE
+
+
+def test_route_and_stats():
+    router = ModelRouter(routing_table=[
+        {'name': "short", 'depths': [1], 'tier': "fast", 'max_tokens': 300},
+        {'name': "rest", 'tier': "standard", 'max_tokens': 1200},
+    ])
+    shallow = router.route("What is a fraction?", 1, "elementary", False)
+    deep = router.route("Why does that work?", 3, "elementary", False)
+    assert (shallow['rule'], shallow['max_tokens']) == ("short", 300)
+    assert (deep['rule'], deep['max_tokens']) == ("rest", 1200)
+
+    router.record(shallow, latency_ms=100, output_tokens=50)
+    router.record(shallow, latency_ms=300, output_tokens=150)
+    assert router.get_stats() == {'short': {'count': 2, 'avg_latency_ms': 200.0, 'avg_output_tokens': 100.0}}
@@ -0,0 +1,97 @@
+"""
+Test password hashing: transparent rehash of outdated hashes on login and
+the bound on concurrent bcrypt jobs
+Runs against an in-memory SQLite database
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import bcrypt
+import httpx
+from sqlalchemy import insert, select
+from database import create_sqlite_database, get_async_db
+from models import Parent
+from services.password_hasher import PasswordHasher, hash_rounds
+
+# Low costs keep the test fast; only their difference matters
+OLD_ROUNDS, CURRENT_ROUNDS = 4, 5
+
+
+async def test_login_replaces_outdated_hash():
+    import main
+
+    engine, Session = await create_sqlite_database()
+    hasher = PasswordHasher(workers=1, rounds=CURRENT_ROUNDS)
+    old_hash = bcrypt.hashpw(b"correct horse", bcrypt.gensalt(OLD_ROUNDS)).decode()
+    try:
+        async with Session() as db:
+            await db.execute(insert(Parent).values(
+                email="p@test.com", full_name="Test Parent", hashed_password=old_hash
+            ))
+            await db.commit()
+
+        async def session():
+            async with Session() as db:
+                yield db
+
+        main.app.dependency_overrides[get_async_db] = session
+        transport = httpx.ASGITransport(app=main.app)
+        with mock.patch("main.password_hasher", hasher):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                wrong = await client.post("/api/v1/auth/parent/login", json={'email': "p@test.com", 'password': "wrong"})
+                assert wrong.status_code == 401
+                async with Session() as db:
+                    assert (await db.execute(select(Parent.hashed_password))).scalar_one() == old_hash
+
+                response = await client.post(
+                    "/api/v1/auth/parent/login", json={'email': "p@test.com", 'password': "correct horse"}
+                )
+                assert response.status_code == 200, response.text
+                async with Session() as db:
+                    new_hash = (await db.execute(select(Parent.hashed_password))).scalar_one()
+                assert hash_rounds(new_hash) == CURRENT_ROUNDS
+                assert bcrypt.checkpw(b"correct horse", new_hash.encode())
+
+                # The upgraded hash still logs in, and is not rehashed again
+                response = await client.post(
+                    "/api/v1/auth/parent/login", json={'email': "p@test.com", 'password': "correct horse"}
+                )
+                assert response.status_code == 200
+        assert hasher.metrics['rehashes'] == 1
+    finally:
+        main.app.dependency_overrides.pop(get_async_db, None)
+        hasher.stop()
+        await engine.dispose()
+
+
+running = 0
+peak = 0
+lock = threading.Lock()
+
+
+def slow_job():
+    global running, peak
+    with lock:
+        running += 1
+        peak = max(peak, running)
+    time.sleep(0.05)
+    with lock:
+        running -= 1
+
+
+async def test_semaphore_bounds_concurrent_jobs():
+    hasher = PasswordHasher(workers=2)
+    # A roomy thread pool stands in for the process pool, so only the
+    # semaphore can hold jobs back
+    hasher._executor = ThreadPoolExecutor(max_workers=10)
+    try:
+        await asyncio.gather(*(hasher._run(slow_job) for _ in range(8)))
+    finally:
+        hasher.stop()
+    assert peak == 2
+    metrics = hasher.get_metrics()
+    assert hasher.metrics['jobs'] == 8
+    assert metrics['waiting'] == 0
+    assert metrics['max_queue_wait_ms'] >= 100
@@ -1,12 +1,12 @@
 """Debug RAG search"""
 import asyncio
-from database import async_session
+from database import AsyncSessionLocal
 from services.content_manager import content_manager
 from models import EducationalContent
 from sqlalchemy import select
 
 async def test_search():
-    async with async_session() as db:
+    async with AsyncSessionLocal() as db:
         print("🔍 Testing content search...")
 
         # Test 1: Search for fractions
@@ -0,0 +1,79 @@
+"""
+Test read routing: replica fallback and read-your-writes stickiness
+Runs against an in-memory SQLite database
+"""
+from types import SimpleNamespace
+from unittest import mock
+from sqlalchemy import insert
+import database
+from database import ReadRouter, create_sqlite_database
+from models import Parent
+from routers import conversation
+
+
+def request(authorization: str = "Bearer token-a"):
+    return SimpleNamespace(headers={'authorization': authorization}, client=SimpleNamespace(host="10.0.0.1"))
+
+
+def test_reads_use_primary_without_replica():
+    router = ReadRouter(has_replica=False)
+    assert router.use_replica("client") is False
+    assert router.get_stats() == {
+        'replica_configured': False, 'replica_reads': 0, 'primary_reads': 1, 'sticky_reads': 0
+    }
+
+
+def test_writer_sticks_to_primary_for_window():
+    router = ReadRouter(sticky_seconds=5, has_replica=True)
+    writer, other = ReadRouter.client_key(request("Bearer a")), ReadRouter.client_key(request("Bearer b"))
+    with mock.patch("database.time.monotonic", return_value=100.0):
+        assert router.use_replica(writer) is True
+        router.mark_write(writer)
+        assert router.use_replica(writer) is False
+        assert router.use_replica(other) is True
+    with mock.patch("database.time.monotonic", return_value=105.5):
+        assert router.use_replica(writer) is True
+    assert router.stats == {'replica_reads': 3, 'primary_reads': 0, 'sticky_reads': 1}
+
+
+async def test_read_session_follows_router():
+    router = ReadRouter(has_replica=True)
+    primary, replica = mock.MagicMock(name="primary"), mock.MagicMock(name="replica")
+    with mock.patch("database.read_router", router), \
+            mock.patch("database.AsyncSessionLocal", primary), \
+            mock.patch("database.ReplicaSessionLocal", replica):
+        async for _ in database.get_read_db(request()):
+            pass
+        router.mark_write(ReadRouter.client_key(request()))
+        async for _ in database.get_read_db(request()):
+            pass
+    assert replica.call_count == 1
+    assert primary.call_count == 1
+
+
+async def test_request_session_commit_marks_client():
+    engine, Session = await create_sqlite_database()
+    router = ReadRouter(has_replica=True)
+    try:
+        key = ReadRouter.client_key(request())
+        with mock.patch("database.read_router", router):
+            async with Session() as db:
+                db.info["client_key"] = key
+                await db.execute(insert(Parent).values(email="p@test.com", full_name="P", hashed_password="x"))
+                await db.commit()
+        assert router.use_replica(key) is False
+    finally:
+        await engine.dispose()
+
+
+async def test_write_behind_turn_marks_client():
+    router = ReadRouter(has_replica=True)
+    key = ReadRouter.client_key(request())
+    writer = mock.MagicMock(running=True, submit=mock.AsyncMock(return_value=[]))
+    with mock.patch("routers.conversation.read_router", router), \
+            mock.patch("routers.conversation.message_writer", writer), \
+            mock.patch("routers.conversation.settings.message_write_behind", True):
+        message_id = await conversation._save_turn(None, 1, {'role': "user"}, {'role': "assistant"}, key)
+    assert message_id is None
+    writer.submit.assert_awaited_once()
+    assert router.use_replica(key) is False
@@ -0,0 +1,104 @@
+"""
+Test refresh-token rotation and reuse detection
+Runs against an in-memory SQLite database
+"""
+from sqlalchemy import insert, select, update
+from database import create_sqlite_database
+from models import Parent, RefreshToken
+from services.token_service import TokenService
+
+
+async def setup():
+    engine, Session = await create_sqlite_database()
+    async with Session() as db:
+        parent_id = (await db.execute(
+            insert(Parent).values(email="p@test.com", full_name="Test Parent", hashed_password="x")
+            .returning(Parent.id)
+        )).scalar_one()
+        await db.commit()
+    return engine, Session, parent_id, TokenService(secret_key="test-secret")
+
+
+async def test_rotation_issues_new_pair_and_spends_old_token():
+    engine, Session, parent_id, tokens = await setup()
+    try:
+        async with Session() as db:
+            first = await tokens.issue_tokens(db, parent_id, 0)
+        assert tokens.decode_access_token(first['access_token']) == (parent_id, 0)
+
+        async with Session() as db:
+            rotated = await tokens.rotate(db, first['refresh_token'])
+        assert rotated is not None
+        rotated_parent, second = rotated
+        assert rotated_parent == parent_id
+        assert second['refresh_token'] != first['refresh_token']
+
+        # The new token rotates in turn
+        async with Session() as db:
+            assert await tokens.rotate(db, second['refresh_token']) is not None
+    finally:
+        await engine.dispose()
+
+
+async def test_reuse_revokes_the_whole_family():
+    engine, Session, parent_id, tokens = await setup()
+    try:
+        async with Session() as db:
+            first = await tokens.issue_tokens(db, parent_id, 0)
+        async with Session() as db:
+            _, second = await tokens.rotate(db, first['refresh_token'])
+
+        # Replaying the spent token is reuse: both it and its successor die
+        async with Session() as db:
+            assert await tokens.rotate(db, first['refresh_token']) is None
+        async with Session() as db:
+            assert await tokens.rotate(db, second['refresh_token']) is None
+            revoked = await db.execute(select(RefreshToken.revoked_at))
+            assert all(revoked_at is not None for revoked_at in revoked.scalars().all())
+    finally:
+        await engine.dispose()
+
+
+async def test_reuse_leaves_other_families_alone():
+    engine, Session, parent_id, tokens = await setup()
+    try:
+        async with Session() as db:
+            laptop = await tokens.issue_tokens(db, parent_id, 0)
+        async with Session() as db:
+            phone = await tokens.issue_tokens(db, parent_id, 0)
+        async with Session() as db:
+            await tokens.rotate(db, laptop['refresh_token'])
+        async with Session() as db:
+            assert await tokens.rotate(db, laptop['refresh_token']) is None
+        async with Session() as db:
+            assert await tokens.rotate(db, phone['refresh_token']) is not None
+    finally:
+        await engine.dispose()
+
+
+async def test_rotation_refused_for_inactive_parent_and_carries_token_version():
+    engine, Session, parent_id, tokens = await setup()
+    try:
+        async with Session() as db:
+            first = await tokens.issue_tokens(db, parent_id, 0)
+            await db.execute(update(Parent).where(Parent.id == parent_id).values(token_version=3))
+            await db.commit()
+        async with Session() as db:
+            _, second = await tokens.rotate(db, first['refresh_token'])
+        assert tokens.decode_access_token(second['access_token']) == (parent_id, 3)
+
+        async with Session() as db:
+            await db.execute(update(Parent).where(Parent.id == parent_id).values(is_active=False))
+            await db.commit()
+        async with Session() as db:
+            assert await tokens.rotate(db, second['refresh_token']) is None
+    finally:
+        await engine.dispose()
+
+
+def test_access_token_rejects_refresh_tokens_and_tampering():
+    tokens = TokenService(secret_key="test-secret")
+    access = tokens.create_access_token(7, 2)
+    assert tokens.decode_access_token(access) == (7, 2)
+    assert tokens.decode_access_token(access[:-2] + "xx") is None
+    assert TokenService(secret_key="other-secret").decode_access_token(access) is None